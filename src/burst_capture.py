@@ -0,0 +1,159 @@
+# burst_capture.py: 笑顔検出時に連写し、良いフレームだけを保存するモジュール
+
+import cv2
+import functools
+import logging
+import os
+import queue
+import threading
+import numpy as np
+
+
+def sharpness(frame, width=320):
+    """
+    画像の鮮鋭度（ラプラシアンの分散）を計算します。
+    計算量を抑えるため、指定幅に縮小したグレースケール画像で計算します。
+    """
+    height, src_width = frame.shape[:2]
+    if src_width > width:
+        frame = cv2.resize(frame, (width, max(1, int(round(height * width / src_width)))), interpolation=cv2.INTER_AREA)
+    gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
+    return float(cv2.Laplacian(gray, cv2.CV_64F).var())
+
+
+class BurstCapture:
+    """
+    連写を行うクラス。処理は次の 3 段階のパイプラインで行い、ライブプレビューを止めません。
+
+    1. 取り込み: キャプチャスレッドから届く連続した frame_count 枚のフレームを事前確保したバッファにコピー
+    2. 評価: 評価スレッドで各フレームの鮮鋭度と笑顔スコアを計算し、上位 keep_count 枚を選択
+    3. 保存: 選択したフレームを CameraHandler.save_photo（PhotoWriter）でエンコード・保存
+    """
+    def __init__(self, camera_handler, frame_count=10, keep_count=3, smile_scorer=None):
+        """
+        :param camera_handler: キャプチャスレッドを持つ CameraHandler
+        :param frame_count: 1 回の連写で取り込むフレーム数
+        :param keep_count: 保存するフレーム数
+        :param smile_scorer: フレームを受け取り笑顔スコアを返す関数（None の場合は鮮鋭度のみで評価）
+        """
+        if frame_count < 1 or keep_count < 1:
+            raise ValueError(f"連写の枚数が不正です: frame_count={frame_count}, keep_count={keep_count}")
+        self.camera_handler = camera_handler
+        self.frame_count = frame_count
+        self.keep_count = min(keep_count, frame_count)
+        self.smile_scorer = smile_scorer
+
+        self._frames = None  # 取り込み用バッファ（最初の連写でフレームサイズに合わせて確保）
+        self._collected = 0
+        self._base_path = None
+        self._busy = False  # 取り込みまたは評価中は次の連写を開始しない
+        self._generation = 0  # 連写ごとに増やし、中止した連写のコールバックを無視する
+        self._listener = None  # 現在の連写のフレームリスナー
+        self._lock = threading.Lock()
+        self._best_frame = None  # 直近の連写で最も評価の高かったフレーム
+
+        self._score_queue = queue.Queue()
+        self._score_thread = None
+
+    @property
+    def busy(self):
+        with self._lock:
+            return self._busy
+
+    def start(self, base_path):
+        """
+        連写を開始します。保存するファイル名は base_path に連番を付けたものになります。
+
+        :param base_path: 拡張子を除いた保存先のパス
+        :return: 開始できた場合は True、前回の連写を処理中の場合は False
+        """
+        with self._lock:
+            if self._busy:
+                logging.warning("前回の連写を処理中のため、連写を開始できません。")
+                return False
+            self._busy = True
+            self._generation += 1
+            self._collected = 0
+            self._base_path = base_path
+            self._best_frame = None
+            self._listener = functools.partial(self._on_frame, self._generation)
+            listener = self._listener
+
+        if self._score_thread is None or not self._score_thread.is_alive():
+            self._score_thread = threading.Thread(target=self._score_loop, name="BurstScoring", daemon=True)
+            self._score_thread.start()
+
+        self.camera_handler.add_frame_listener(listener)
+        logging.info(f"連写を開始しました: {self.frame_count} 枚")
+        return True
+
+    def cancel(self):
+        """
+        取り込み中の連写を中止します（カメラを解放する場合など）。
+        キャプチャスレッドで実行中のコールバックがあっても、中止した連写のフレームは取り込まれません。
+        """
+        with self._lock:
+            listener = self._listener
+            if self._busy and self._collected < self.frame_count:
+                self._busy = False
+                self._generation += 1
+                logging.info("連写を中止しました。")
+        if listener is not None:
+            self.camera_handler.remove_frame_listener(listener)
+
+    def get_best_frame(self):
+        """直近の連写で最も評価の高かったフレームを返します。処理中または未実行の場合は None を返します。"""
+        with self._lock:
+            return self._best_frame
+
+    def _on_frame(self, generation, frame_id, timestamp, frame):
+        """キャプチャスレッドから呼び出され、フレームを連写バッファにコピーします。"""
+        with self._lock:
+            # 中止された連写や、次の連写が始まった後に届いた古いコールバックは無視する
+            if generation != self._generation or not self._busy or self._collected >= self.frame_count:
+                return
+            if self._frames is None or self._frames.shape[1:] != frame.shape:
+                self._frames = np.empty((self.frame_count,) + frame.shape, dtype=frame.dtype)
+            np.copyto(self._frames[self._collected], frame)
+            self._collected += 1
+            if self._collected < self.frame_count:
+                return
+            listener = self._listener
+            base_path = self._base_path
+
+        self.camera_handler.remove_frame_listener(listener)
+        self._score_queue.put(base_path)
+
+    def _score_loop(self):
+        while True:
+            base_path = self._score_queue.get()
+            try:
+                self._score_and_save(base_path)
+            except Exception as e:
+                logging.error(f"連写の評価中にエラーが発生しました: {e}")
+            finally:
+                with self._lock:
+                    self._busy = False
+
+    def _score_and_save(self, base_path):
+        frames = self._frames
+        sharpness_values = [sharpness(frame) for frame in frames]
+        max_sharpness = max(sharpness_values) or 1.0
+        smile_scores = [self.smile_scorer(frame) if self.smile_scorer else 0.0 for frame in frames]
+
+        # 笑顔スコア（笑顔のある顔ごとに 1 以上）を優先し、鮮鋭度（連写内で 0-0.5 に正規化）を加点する
+        scores = [smile + 0.5 * sharp / max_sharpness for smile, sharp in zip(smile_scores, sharpness_values)]
+        ranking = sorted(range(len(frames)), key=lambda i: scores[i], reverse=True)[:self.keep_count]
+
+        for rank, index in enumerate(ranking, start=1):
+            # バッファは次の連写で再利用するため、保存するフレームはコピーする
+            frame = frames[index].copy()
+            if rank == 1:
+                with self._lock:
+                    self._best_frame = frame
+            save_path = f"{base_path}_{rank}.jpg"
+            self.camera_handler.save_photo(frame, save_path)
+            logging.debug(
+                f"連写フレームを保存します: {os.path.basename(save_path)} "
+                f"(フレーム {index + 1}/{len(frames)}, 笑顔={smile_scores[index]:.2f}, 鮮鋭度={sharpness_values[index]:.1f})"
+            )
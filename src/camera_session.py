@@ -0,0 +1,79 @@
+# camera_session.py: モードを切り替えてもカメラを開いたままにするためのセッション管理モジュール
+
+import logging
+import threading
+
+
+class CameraSession:
+    """
+    アプリケーション全体で 1 つのカメラを共有するためのセッション。
+
+    カメラを使うモードは acquire() でカメラを使用中にし、終了時に release() を呼び出します。
+    release() ではカメラを閉じずにキャプチャスレッドをアイドル状態にするだけなので、
+    次に acquire() したときはデバイスを開き直さずにすぐにフレームを受け取れます。
+    idle_timeout 秒以上アイドル状態が続いた場合はカメラデバイスを閉じます（0 の場合は閉じない）。
+    """
+    def __init__(self, camera_handler, idle_timeout=0):
+        self.camera_handler = camera_handler
+        self.idle_timeout = idle_timeout
+        self._lock = threading.Lock()
+        self._active = False
+        self._idle_timer = None
+
+    @property
+    def active(self):
+        with self._lock:
+            return self._active
+
+    def acquire(self):
+        """
+        カメラを使用中にします。カメラが開いていない場合は初期化し、キャプチャスレッドを開始します。
+
+        :return: カメラを使用できる場合は True
+        """
+        with self._lock:
+            self._cancel_idle_timer()
+            handler = self.camera_handler
+            if not handler.is_camera_open():
+                if not handler.initialize_camera():
+                    return False
+            else:
+                logging.debug("開いたままのカメラを再利用します。")
+            handler.set_capture_idle(False)
+            if not handler.start_capture_thread():
+                return False
+            self._active = True
+            return True
+
+    def release(self):
+        """カメラの使用を終了し、カメラを開いたままアイドル状態にします。"""
+        with self._lock:
+            if not self._active:
+                return
+            self._active = False
+            self.camera_handler.set_capture_idle(True)
+            if self.idle_timeout > 0:
+                self._idle_timer = threading.Timer(self.idle_timeout, self._close_idle_device)
+                self._idle_timer.daemon = True
+                self._idle_timer.start()
+        logging.info("カメラをアイドル状態にしました。")
+
+    def close(self):
+        """アプリケーションの終了時にカメラと関連する資源をすべて解放します。"""
+        with self._lock:
+            self._cancel_idle_timer()
+            self._active = False
+            self.camera_handler.release_camera()
+
+    def _cancel_idle_timer(self):
+        if self._idle_timer is not None:
+            self._idle_timer.cancel()
+            self._idle_timer = None
+
+    def _close_idle_device(self):
+        with self._lock:
+            self._idle_timer = None
+            if self._active:
+                return
+            logging.info(f"カメラが {self.idle_timeout} 秒間使用されなかったため、デバイスを閉じます。")
+            self.camera_handler.close_device()
@@ -0,0 +1,291 @@
+# detection_worker.py: 顔・笑顔検出を UI スレッドとは別のワーカーで実行するモジュール
+
+import cv2
+import logging
+import os
+import threading
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor
+
+FACE_CASCADE_FILE = 'haarcascade_frontalface_default.xml'
+SMILE_CASCADE_FILE = 'haarcascade_smile.xml'
+
+# プロセスプール用のカスケード（ワーカープロセスごとに初期化される）
+_process_face_cascade = None
+_process_smile_cascade = None
+
+
+class DetectionResult(namedtuple('DetectionResult', ['frame_id', 'timestamp', 'faces', 'smiles', 'full_scan'],
+                                 defaults=(True,))):
+    """
+    検出結果。
+
+    :param frame_id: 検出に使用したフレームのID
+    :param timestamp: 検出に使用したフレームの取得時刻
+    :param faces: 検出された顔の矩形 (x, y, w, h) のリスト
+    :param smiles: faces と同じ順序で、各顔の中で検出された笑顔の矩形（フレーム座標）のリスト
+    :param full_scan: フレーム全体を検索した結果の場合は True、追跡領域のみを検索した結果の場合は False
+    """
+    __slots__ = ()
+
+    @property
+    def smile_detected(self):
+        return any(len(smiles) > 0 for smiles in self.smiles)
+
+
+def smile_score(result):
+    """
+    検出結果から笑顔の良さを表すスコアを計算します。
+    笑顔が検出された顔ごとに、顔の大きさに対する笑顔の大きさを加点します。笑顔がない場合は 0 を返します。
+    """
+    score = 0.0
+    for (_, _, fw, fh), smiles in zip(result.faces, result.smiles):
+        if not smiles or fw == 0 or fh == 0:
+            continue
+        largest_smile = max(sw * sh for (_, _, sw, sh) in smiles)
+        score += 1.0 + min(1.0, largest_smile / float(fw * fh))
+    return score
+
+
+def _resize_to_width(img, width):
+    """画像を指定幅に縮小し、(縮小後の画像, 縮小率) を返します。指定幅以下の場合はそのまま返します。"""
+    height, src_width = img.shape[:2]
+    if not width or src_width <= width:
+        return img, 1.0
+    scale = width / src_width
+    resized = cv2.resize(img, (width, max(1, int(round(height * scale)))), interpolation=cv2.INTER_AREA)
+    return resized, scale
+
+
+def expand_region(rect, margin, frame_width, frame_height):
+    """
+    矩形を上下左右に margin（矩形サイズに対する比率）だけ広げ、フレーム内に収めて返します。
+    """
+    x, y, w, h = rect
+    dx = int(w * margin)
+    dy = int(h * margin)
+    x0 = max(0, x - dx)
+    y0 = max(0, y - dy)
+    x1 = min(frame_width, x + w + dx)
+    y1 = min(frame_height, y + h + dy)
+    return x0, y0, x1 - x0, y1 - y0
+
+
+def detect_faces_and_smiles(frame, face_cascade, smile_cascade, detection_width=None, smile_roi_width=None,
+                            search_region=None):
+    """
+    フレームから顔と笑顔を検出します。
+
+    :param frame: OpenCV形式の画像（BGR）
+    :param detection_width: 顔検出を行う画像の幅。フレームがこれより大きい場合は縮小して検出する（None で縮小なし）
+    :param smile_roi_width: 笑顔検出を行う顔領域の幅。顔領域がこれより大きい場合は縮小して検出する（None で縮小なし）
+    :param search_region: 顔を検索する領域 (x, y, w, h)。None の場合はフレーム全体を検索する
+    :return: (faces, smiles) のタプル。座標はすべて元のフレームの座標。smiles は faces と同じ順序の矩形リスト
+    """
+    frame_height, frame_width = frame.shape[:2]
+
+    # 縮小率はフレーム全体の幅を基準に決める（検索領域の大きさで顔のサイズが変わらないようにする）
+    scale = 1.0
+    if detection_width and frame_width > detection_width:
+        scale = detection_width / frame_width
+
+    origin_x, origin_y = 0, 0
+    search_frame = frame
+    if search_region is not None:
+        origin_x, origin_y, region_width, region_height = search_region
+        search_frame = frame[origin_y:origin_y + region_height, origin_x:origin_x + region_width]
+
+    # 縮小したコピーで顔検出を行う（BGR のまま縮小してからグレースケール化する）
+    if scale < 1.0:
+        search_height, search_width = search_frame.shape[:2]
+        search_frame = cv2.resize(
+            search_frame,
+            (max(1, int(round(search_width * scale))), max(1, int(round(search_height * scale)))),
+            interpolation=cv2.INTER_AREA
+        )
+    gray_frame = cv2.cvtColor(search_frame, cv2.COLOR_BGR2GRAY)
+    faces = face_cascade.detectMultiScale(gray_frame, 1.3, 5)
+
+    face_list = []
+    smile_list = []
+    for (fx, fy, fw, fh) in faces:
+        # 元の解像度の座標に変換
+        x = min(origin_x + int(round(fx / scale)), frame_width - 1)
+        y = min(origin_y + int(round(fy / scale)), frame_height - 1)
+        w = min(int(round(fw / scale)), frame_width - x)
+        h = min(int(round(fh / scale)), frame_height - y)
+        face_list.append((x, y, w, h))
+
+        # 笑顔検出は元の解像度の顔領域を適切なサイズに縮小して行う
+        if scale == 1.0 and not smile_roi_width:
+            roi_gray = gray_frame[y - origin_y:y - origin_y + h, x - origin_x:x - origin_x + w]
+            roi_scale = 1.0
+        else:
+            roi, roi_scale = _resize_to_width(frame[y:y + h, x:x + w], smile_roi_width)
+            roi_gray = cv2.cvtColor(roi, cv2.COLOR_BGR2GRAY)
+        smiles = smile_cascade.detectMultiScale(roi_gray, 1.8, 20)
+        smile_list.append([
+            (x + int(round(sx / roi_scale)), y + int(round(sy / roi_scale)),
+             int(round(sw / roi_scale)), int(round(sh / roi_scale)))
+            for (sx, sy, sw, sh) in smiles
+        ])
+        if len(smiles) > 0:
+            break  # 笑顔を検出したら残りの顔は調べない
+
+    return face_list, smile_list
+
+
+def _init_process_worker(haarcascades_path):
+    """プロセスプールの各ワーカーでカスケードをロードします。"""
+    global _process_face_cascade, _process_smile_cascade
+    _process_face_cascade = cv2.CascadeClassifier(os.path.join(haarcascades_path, FACE_CASCADE_FILE))
+    _process_smile_cascade = cv2.CascadeClassifier(os.path.join(haarcascades_path, SMILE_CASCADE_FILE))
+
+
+def _detect_in_process(frame_id, timestamp, frame, detection_width, smile_roi_width, search_region):
+    faces, smiles = detect_faces_and_smiles(
+        frame, _process_face_cascade, _process_smile_cascade, detection_width, smile_roi_width, search_region
+    )
+    return DetectionResult(frame_id, timestamp, faces, smiles, search_region is None)
+
+
+class DetectionWorker:
+    """
+    顔・笑顔検出を非同期に実行し、最新の結果を公開するワーカー。
+    検出中に届いたフレームは破棄し、常に最新のフレームだけを処理します。
+
+    tracking_frames が 1 以上の場合、顔を見つけた後は前回の顔の周辺（tracking_margin だけ広げた領域）
+    のみを最大 tracking_frames 回検索し、その後または顔を見失った時点でフレーム全体の検索に戻ります。
+    """
+    EXECUTOR_TYPES = ('thread', 'process')
+
+    def __init__(self, face_cascade, smile_cascade, haarcascades_path, executor_type='thread',
+                 detection_width=None, smile_roi_width=None, tracking_frames=0, tracking_margin=0.5):
+        if executor_type not in self.EXECUTOR_TYPES:
+            raise ValueError(f"未対応の検出ワーカーの種類です: {executor_type}")
+        self.face_cascade = face_cascade
+        self.smile_cascade = smile_cascade
+        self.haarcascades_path = haarcascades_path
+        self.executor_type = executor_type
+        self.detection_width = detection_width  # 顔検出を行う画像の幅
+        self.smile_roi_width = smile_roi_width  # 笑顔検出を行う顔領域の幅
+        self.tracking_frames = tracking_frames  # 追跡領域のみを検索する最大回数（0 で追跡しない）
+        self.tracking_margin = tracking_margin  # 追跡領域を顔の矩形から広げる比率
+        self._tracked_face = None  # 追跡中の顔の矩形
+        self._tracked_scans = 0  # 最後の全体検索以降に追跡領域を検索した回数
+        self.full_scan_count = 0
+        self.tracked_scan_count = 0
+        self._executor = None
+        self._pending = None
+        self._lock = threading.Lock()
+        self._latest_result = None
+        self._result_listeners = []
+
+    def add_result_listener(self, listener):
+        """
+        検出結果が得られるたびに呼び出されるコールバックを登録します。
+        コールバックは listener(DetectionResult) の形式でワーカー側のスレッドから呼び出されます。
+        """
+        if listener not in self._result_listeners:
+            self._result_listeners.append(listener)
+
+    def _create_executor(self):
+        if self.executor_type == 'process':
+            logging.info("検出ワーカーをプロセスプールで起動します。")
+            return ProcessPoolExecutor(
+                max_workers=1,
+                initializer=_init_process_worker,
+                initargs=(self.haarcascades_path,)
+            )
+        logging.info("検出ワーカーをスレッドで起動します。")
+        return ThreadPoolExecutor(max_workers=1, thread_name_prefix="SmileDetection")
+
+    def _detect_in_thread(self, frame_id, timestamp, frame, search_region):
+        faces, smiles = detect_faces_and_smiles(
+            frame, self.face_cascade, self.smile_cascade, self.detection_width, self.smile_roi_width, search_region
+        )
+        return DetectionResult(frame_id, timestamp, faces, smiles, search_region is None)
+
+    def _next_search_region(self, frame):
+        """次の検出で検索する領域を返します。フレーム全体を検索する場合は None を返します。"""
+        with self._lock:
+            tracked_face = self._tracked_face
+            if tracked_face is None or self._tracked_scans >= self.tracking_frames:
+                return None
+        frame_height, frame_width = frame.shape[:2]
+        return expand_region(tracked_face, self.tracking_margin, frame_width, frame_height)
+
+    def _update_tracking(self, result):
+        """検出結果に応じて追跡状態を更新します（ロック取得済みで呼び出すこと）。"""
+        if result.full_scan:
+            self.full_scan_count += 1
+            self._tracked_scans = 0
+        else:
+            self.tracked_scan_count += 1
+            self._tracked_scans += 1
+
+        if result.faces:
+            # 最も大きい顔を追跡対象にする
+            self._tracked_face = max(result.faces, key=lambda face: face[2] * face[3])
+        else:
+            # 顔を見失った場合は次回フレーム全体を検索する
+            self._tracked_face = None
+
+    def submit(self, frame_id, timestamp, frame):
+        """
+        フレームを検出キューに投入します。
+        前回の検出がまだ終わっていない場合はフレームを破棄して False を返します。
+        """
+        if self._pending is not None and not self._pending.done():
+            return False
+
+        if self._executor is None:
+            self._executor = self._create_executor()
+
+        search_region = self._next_search_region(frame) if self.tracking_frames > 0 else None
+        if self.executor_type == 'process':
+            future = self._executor.submit(
+                _detect_in_process, frame_id, timestamp, frame,
+                self.detection_width, self.smile_roi_width, search_region
+            )
+        else:
+            future = self._executor.submit(self._detect_in_thread, frame_id, timestamp, frame, search_region)
+        future.add_done_callback(self._on_done)
+        self._pending = future
+        return True
+
+    def _on_done(self, future):
+        if future.cancelled():
+            return
+        try:
+            result = future.result()
+        except Exception as e:
+            logging.error(f"顔・笑顔検出中にエラーが発生しました: {e}")
+            return
+        with self._lock:
+            self._update_tracking(result)
+            if self._latest_result is None or result.frame_id > self._latest_result.frame_id:
+                self._latest_result = result
+
+        for listener in list(self._result_listeners):
+            try:
+                listener(result)
+            except Exception as e:
+                logging.error(f"検出結果リスナーの実行中にエラーが発生しました: {e}")
+
+    def get_latest_result(self):
+        """最新の検出結果を返します。まだ結果がない場合は None を返します。"""
+        with self._lock:
+            return self._latest_result
+
+    def shutdown(self):
+        """ワーカーを停止します。再度 submit された場合は自動的に再起動します。"""
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+            logging.info("検出ワーカーを停止しました。")
+        self._pending = None
+        with self._lock:
+            self._latest_result = None
+            self._tracked_face = None
+            self._tracked_scans = 0
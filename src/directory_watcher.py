@@ -0,0 +1,156 @@
+# directory_watcher.py: ディレクトリ内のファイルの追加・削除を監視するモジュール
+
+import ctypes
+import ctypes.util
+import logging
+import os
+import select
+import struct
+import threading
+
+# inotify のイベント（linux/inotify.h）
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_FROM = 0x00000040
+IN_MOVED_TO = 0x00000080
+IN_CREATE = 0x00000100
+IN_DELETE = 0x00000200
+IN_DELETE_SELF = 0x00000400
+IN_MOVE_SELF = 0x00000800
+IN_Q_OVERFLOW = 0x00004000
+IN_IGNORED = 0x00008000
+IN_NONBLOCK = 0o4000
+IN_CLOEXEC = 0o2000000
+
+WATCH_MASK = IN_CLOSE_WRITE | IN_MOVED_FROM | IN_MOVED_TO | IN_DELETE | IN_DELETE_SELF | IN_MOVE_SELF
+_EVENT_HEADER = struct.Struct('iIII')
+
+# コールバックに渡すイベントの種類
+EVENT_UPDATED = 'updated'
+EVENT_REMOVED = 'removed'
+EVENT_RESCAN = 'rescan'  # 個別のイベントを追えなかったため、ディレクトリ全体を確認し直す必要がある
+
+
+def _load_inotify():
+    """libc の inotify 関数を読み込みます。使用できない場合は None を返します。"""
+    if not hasattr(os, 'uname') or os.uname().sysname != 'Linux':
+        return None
+    try:
+        libc = ctypes.CDLL(ctypes.util.find_library('c') or 'libc.so.6', use_errno=True)
+        libc.inotify_init1.argtypes = [ctypes.c_int]
+        libc.inotify_add_watch.argtypes = [ctypes.c_int, ctypes.c_char_p, ctypes.c_uint32]
+        return libc
+    except (OSError, AttributeError):
+        return None
+
+
+class DirectoryWatcher:
+    """
+    ディレクトリ直下のファイルの変更を監視し、callback(イベント, パス) を監視スレッドから呼び出します。
+    Linux では inotify を使用し、使用できない場合は poll_interval 秒ごとに EVENT_RESCAN を通知します。
+
+    書き込み途中のファイルを通知しないよう、inotify では書き込みの完了（IN_CLOSE_WRITE）と
+    rename（IN_MOVED_TO）のみを EVENT_UPDATED として扱います。
+    """
+    def __init__(self, directory, callback, poll_interval=10.0, use_inotify=True):
+        self.directory = directory
+        self.callback = callback
+        self.poll_interval = poll_interval
+        self.use_inotify = use_inotify
+        self._thread = None
+        self._stop_event = threading.Event()
+        self.backend = None  # 'inotify' または 'polling'
+
+    def start(self):
+        """監視スレッドを開始します。"""
+        if self._thread is not None and self._thread.is_alive():
+            return
+        self._stop_event.clear()
+        fd = self._open_inotify() if self.use_inotify else None
+        if fd is not None:
+            self.backend = 'inotify'
+            target, args = self._run_inotify, (fd,)
+        else:
+            self.backend = 'polling'
+            target, args = self._run_polling, ()
+        self._thread = threading.Thread(target=target, args=args, name="DirectoryWatcher", daemon=True)
+        self._thread.start()
+        logging.info(f"ディレクトリの監視を開始しました: {self.directory} ({self.backend})")
+
+    def stop(self):
+        """監視スレッドを停止します。"""
+        self._stop_event.set()
+        thread = self._thread
+        self._thread = None
+        if thread is not None:
+            thread.join(timeout=2.0)
+        logging.debug(f"ディレクトリの監視を停止しました: {self.directory}")
+
+    def _notify(self, event, path):
+        try:
+            self.callback(event, path)
+        except Exception as e:
+            logging.error(f"ディレクトリ監視のコールバックでエラーが発生しました: {path}: {e}")
+
+    def _open_inotify(self):
+        libc = _load_inotify()
+        if libc is None:
+            return None
+        fd = libc.inotify_init1(IN_NONBLOCK | IN_CLOEXEC)
+        if fd < 0:
+            logging.warning(f"inotify を初期化できませんでした: {os.strerror(ctypes.get_errno())}")
+            return None
+        wd = libc.inotify_add_watch(fd, os.fsencode(self.directory), WATCH_MASK)
+        if wd < 0:
+            logging.warning(f"inotify で監視できませんでした: {self.directory}: {os.strerror(ctypes.get_errno())}")
+            os.close(fd)
+            return None
+        return fd
+
+    def _run_inotify(self, fd):
+        try:
+            while not self._stop_event.is_set():
+                readable, _, _ = select.select([fd], [], [], 0.5)
+                if not readable:
+                    continue
+                try:
+                    data = os.read(fd, 64 * 1024)
+                except BlockingIOError:
+                    continue
+                if self._handle_events(data):
+                    break
+        finally:
+            os.close(fd)
+
+        # 監視対象のディレクトリがなくなった場合はポーリングで監視を続ける
+        if not self._stop_event.is_set():
+            logging.warning(f"inotify による監視を終了し、ポーリングに切り替えます: {self.directory}")
+            self.backend = 'polling'
+            self._run_polling()
+
+    def _handle_events(self, data):
+        """
+        inotify のイベントを処理します。監視を続けられない場合は True を返します。
+        """
+        offset = 0
+        while offset + _EVENT_HEADER.size <= len(data):
+            _, mask, _, name_length = _EVENT_HEADER.unpack_from(data, offset)
+            offset += _EVENT_HEADER.size
+            name = data[offset:offset + name_length].rstrip(b'\0')
+            offset += name_length
+
+            if mask & IN_Q_OVERFLOW:
+                self._notify(EVENT_RESCAN, self.directory)
+            elif mask & (IN_DELETE_SELF | IN_MOVE_SELF | IN_IGNORED):
+                self._notify(EVENT_RESCAN, self.directory)
+                return True
+            elif name:
+                path = os.path.join(self.directory, os.fsdecode(name))
+                if mask & (IN_CLOSE_WRITE | IN_MOVED_TO):
+                    self._notify(EVENT_UPDATED, path)
+                elif mask & (IN_DELETE | IN_MOVED_FROM):
+                    self._notify(EVENT_REMOVED, path)
+        return False
+
+    def _run_polling(self):
+        while not self._stop_event.wait(self.poll_interval):
+            self._notify(EVENT_RESCAN, self.directory)
@@ -0,0 +1,100 @@
+# display_geometry.py: 画面サイズを一度だけ取得して共有し、変更を通知するモジュール
+
+import logging
+import threading
+from utils import get_screen_sizes
+
+
+class DisplayGeometry:
+    """
+    画面サイズを保持するサービス。
+    サイズは最初に必要になったときに一度だけ取得してキャッシュし、以降は X サーバーに問い合わせません。
+    watch() でウィンドウを監視すると、画面サイズが変わったとき（解像度の変更やディスプレイの差し替え）に
+    登録したリスナーへ新しいサイズを通知します。
+    """
+    def __init__(self, resolver=None):
+        """
+        :param resolver: 画面サイズ (幅, 高さ) を返す関数。省略時は utils.get_screen_sizes
+        """
+        self.resolver = resolver or get_screen_sizes
+        self._lock = threading.Lock()
+        self._size = None
+        self._listeners = []
+        self._watched = set()
+
+    def get_size(self, resolver=None):
+        """
+        画面サイズ (幅, 高さ) を返します。まだ取得していない場合は resolver（省略時は self.resolver）で取得します。
+        """
+        with self._lock:
+            if self._size is not None:
+                return self._size
+        width, height = (resolver or self.resolver)()
+        with self._lock:
+            if self._size is None:
+                self._size = (int(width), int(height))
+                logging.debug(f"画面サイズを取得しました: {width}x{height}")
+            return self._size
+
+    def set_size(self, size):
+        """
+        画面サイズを更新します。サイズが変わった場合はリスナーに通知し、True を返します。
+        """
+        size = (int(size[0]), int(size[1]))
+        with self._lock:
+            if size == self._size:
+                return False
+            previous = self._size
+            self._size = size
+            listeners = list(self._listeners)
+        if previous is not None:
+            logging.info(f"画面サイズが変わりました: {previous[0]}x{previous[1]} -> {size[0]}x{size[1]}")
+        for listener in listeners:
+            try:
+                listener(size)
+            except Exception as e:
+                logging.error(f"画面サイズの変更の通知中にエラーが発生しました: {e}")
+        return True
+
+    def add_listener(self, listener):
+        """画面サイズが変わるたびに listener((幅, 高さ)) を呼び出します。"""
+        with self._lock:
+            if listener not in self._listeners:
+                self._listeners.append(listener)
+
+    def remove_listener(self, listener):
+        with self._lock:
+            if listener in self._listeners:
+                self._listeners.remove(listener)
+
+    def watch(self, top_level):
+        """
+        トップレベルウィンドウの <Configure> イベントで画面サイズを確認します。
+        画面サイズの問い合わせはウィンドウの構成が変わったときだけ行います。
+        リスナーは Tk のスレッドから呼び出されます。
+        """
+        if str(top_level) in self._watched:
+            return
+        self._watched.add(str(top_level))
+
+        def on_configure(event):
+            if event.widget is top_level:
+                self.set_size((top_level.winfo_screenwidth(), top_level.winfo_screenheight()))
+
+        top_level.bind("<Configure>", on_configure, add='+')
+
+
+_shared_geometry = None
+_shared_lock = threading.Lock()
+
+
+def get_display_geometry(resolver=None):
+    """
+    アプリケーション全体で共有する DisplayGeometry を返します。
+    resolver は共有インスタンスを最初に作成するときにのみ使用されます。
+    """
+    global _shared_geometry
+    with _shared_lock:
+        if _shared_geometry is None:
+            _shared_geometry = DisplayGeometry(resolver)
+        return _shared_geometry
@@ -0,0 +1,106 @@
+# frame_buffer.py: 直近のカメラフレームを固定サイズのリングバッファに保持するモジュール
+
+import logging
+import threading
+import numpy as np
+
+
+class FrameRingBuffer:
+    """
+    直近のフレームを事前に確保した NumPy 配列に保持するリングバッファ。
+    各フレームにはスコアを付けることができ、指定した時間範囲で最もスコアの高いフレームを取り出せます。
+    メモリ使用量は capacity 枚分のフレームで固定されます。
+    max_bytes を指定した場合は、capacity 枚分がそれを超えないように保持する枚数を減らします
+    （フル解像度のフレームは 1080p で 1 枚約 6 MB になるため）。
+    """
+    def __init__(self, capacity, max_bytes=None):
+        if capacity < 1:
+            raise ValueError(f"リングバッファの容量は 1 以上にしてください: {capacity}")
+        self.capacity = capacity
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self._frames = None  # 最初のフレームを受け取った時点でサイズを決めて確保する
+        self._slots = capacity  # 実際に保持する枚数（max_bytes によって capacity より少なくなる）
+        self._frame_ids = np.zeros(capacity, dtype=np.int64)
+        self._timestamps = np.zeros(capacity, dtype=np.float64)
+        self._scores = np.full(capacity, -1.0, dtype=np.float64)  # -1 はスコア未設定
+        self._next = 0
+        self._count = 0
+
+    def push(self, frame_id, timestamp, frame):
+        """フレームをバッファにコピーします。バッファが一杯の場合は最も古いフレームを上書きします。"""
+        with self._lock:
+            if self._frames is None or self._frames.shape[1:] != frame.shape or self._frames.dtype != frame.dtype:
+                # フレームサイズが変わった場合は確保し直す
+                self._slots = self._slots_for(frame.nbytes)
+                self._frames = None  # 新しいバッファを確保する前に古いバッファを解放する
+                self._frames = np.empty((self._slots,) + frame.shape, dtype=frame.dtype)
+                self._count = 0
+                self._next = 0
+
+            slot = self._next
+            np.copyto(self._frames[slot], frame)
+            self._frame_ids[slot] = frame_id
+            self._timestamps[slot] = timestamp
+            self._scores[slot] = -1.0
+            self._next = (slot + 1) % self._slots
+            self._count = min(self._count + 1, self._slots)
+
+    def _slots_for(self, frame_bytes):
+        """1 枚のサイズが frame_bytes のときに保持する枚数を返します。"""
+        if self.max_bytes is None or frame_bytes * self.capacity <= self.max_bytes:
+            return self.capacity
+        slots = max(1, int(self.max_bytes // frame_bytes))
+        logging.warning(f"リングバッファのメモリ上限により保持するフレーム数を減らします: "
+                        f"{self.capacity} -> {slots} 枚 (1 枚 {frame_bytes / 1024 / 1024:.1f} MB)")
+        return slots
+
+    @property
+    def nbytes(self):
+        """確保しているフレームのメモリ量（バイト）。"""
+        with self._lock:
+            return 0 if self._frames is None else self._frames.nbytes
+
+    def set_score(self, frame_id, score):
+        """指定したフレームにスコアを設定します。フレームがすでに上書きされている場合は False を返します。"""
+        with self._lock:
+            slots = np.nonzero(self._frame_ids[:self._count] == frame_id)[0]
+            if len(slots) == 0:
+                return False
+            self._scores[slots[0]] = score
+            return True
+
+    def __len__(self):
+        with self._lock:
+            return self._count
+
+    def best_frame(self, start_time, end_time, reference_time=None):
+        """
+        指定した時間範囲で最もスコアの高いフレームのコピーを返します。
+        スコアの付いたフレームがない場合は reference_time（省略時は end_time）に最も近いフレームを返します。
+
+        :return: (フレームID, 取得時刻, フレーム, スコア) のタプル。該当するフレームがない場合は None
+        """
+        with self._lock:
+            if self._count == 0:
+                return None
+            timestamps = self._timestamps[:self._count]
+            candidates = np.nonzero((timestamps >= start_time) & (timestamps <= end_time))[0]
+            if len(candidates) == 0:
+                return None
+
+            scores = self._scores[candidates]
+            if scores.max() >= 0:
+                # 同じスコアの場合は新しいフレームを優先する
+                best = max(candidates, key=lambda slot: (self._scores[slot], self._timestamps[slot]))
+            else:
+                if reference_time is None:
+                    reference_time = end_time
+                best = candidates[np.argmin(np.abs(timestamps[candidates] - reference_time))]
+
+            return (
+                int(self._frame_ids[best]),
+                float(self._timestamps[best]),
+                self._frames[best].copy(),
+                float(self._scores[best])
+            )
@@ -1,7 +1,9 @@
 import tkinter as tk
 import sys
 import os
+import time
 import logging
+import threading
 import tkinter.messagebox as messagebox  # エラーメッセージ表示用
 
 # srcディレクトリをPythonのパスに追加
@@ -10,26 +12,43 @@ parent_dir = os.path.abspath(os.path.join(current_dir, '..'))
 src_dir = os.path.join(parent_dir, 'src')
 sys.path.insert(0, src_dir)
 
-from utils import get_screen_sizes, load_config, setup_logging
-from smile_detection import SmileDetectionFrame, SmileDetectionCameraHandler
-from photoframe_tkinter import PhotoFrame
+from utils import load_config
+from tracing import setup_tracing, shutdown_tracing, StartupTimer
+from camera_session import CameraSession
+from display_geometry import get_display_geometry
+
+# cv2 や numpy を読み込むモジュール（smile_detection, photoframe_tkinter など）は、
+# ウィンドウを表示した後にバックグラウンドで読み込む
 
 class Application(tk.Tk):
-    def __init__(self, camera_handler, photo_directory, interval, *args, **kwargs):
+    def __init__(self, camera_handler_loader, photo_directory, interval, slideshow_options=None, camera_idle_timeout=0,
+                 startup_timer=None, *args, **kwargs):
+        """
+        :param camera_handler_loader: カメラハンドラーを作成して返す関数。
+                                      重いモジュールの読み込みやカスケードのロードを含むため、起動画面の表示中にバックグラウンドで実行する
+        :param startup_timer: 起動時間を記録する StartupTimer
+        """
         super().__init__(*args, **kwargs)
         self.title("Smile Detection App")
         self.fullscreen = True  # フルスクリーン状態を管理
         self.attributes('-fullscreen', self.fullscreen)
-        self.camera_handler = camera_handler
+        # 画面サイズはアプリケーション全体で共有し、ウィンドウの構成が変わったときだけ確認する。
+        # 変更の確認と同じ Tk から最初のサイズも取得し、取得方法の違いで変更が通知されないようにする
+        self.display_geometry = get_display_geometry()
+        self.display_geometry.get_size(lambda: (self.winfo_screenwidth(), self.winfo_screenheight()))
+        self.display_geometry.watch(self)
+        self.camera_handler = None
+        self.camera_session = None
+        self.camera_idle_timeout = camera_idle_timeout
+        self.startup_timer = startup_timer or StartupTimer()
         self.photo_directory = photo_directory
         self.interval = interval
+        self.slideshow_options = slideshow_options or {}  # PhotoFrame に渡す追加の設定
         self.current_frame = None  # 現在のフレームを保持
+        self.frames = {}  # モード名 -> 作成済みのフレーム
 
-        # モードの初期化
-        self.modes = {
-            "smile_detection": SmileDetectionFrame,
-            "photo_slideshow": PhotoFrame
-        }
+        # モードの初期化（フレームのクラスは起動処理の完了後に設定する）
+        self.modes = {}
         self.current_mode = None
 
         # コンテナフレームを作成
@@ -42,68 +61,163 @@ class Application(tk.Tk):
         self.bind("1", lambda e: self.change_mode("smile_detection"))  # '1'キーで撮影モードに変更
         self.bind("2", lambda e: self.change_mode("photo_slideshow"))  # '2'キーでフォトモードに変更
 
-        # デフォルトのモードを設定
+        # 起動画面を表示し、重い初期化はバックグラウンドで行う
+        self.splash = tk.Label(self.container, text="起動しています...", bg='black', fg='white', font=("Arial", 32))
+        self.splash.pack(fill=tk.BOTH, expand=True)
+        self.update_idletasks()
+        self.startup_timer.mark("ウィンドウの表示")
+
+        self._startup_result = None
+        self._startup_thread = threading.Thread(
+            target=self._load_in_background, args=(camera_handler_loader,), name="StartupLoader", daemon=True
+        )
+        self._startup_thread.start()
+        self.after(20, self._check_startup)
+
+    def _load_in_background(self, camera_handler_loader):
+        """起動処理スレッド本体。Tk のウィジェットには触れず、結果だけを保存します。"""
+        try:
+            # モードのフレームのクラスも重いモジュールを読み込むため、ここで読み込んでおく
+            from smile_detection import SmileDetectionFrame
+            from photoframe_tkinter import PhotoFrame
+            self.startup_timer.mark("モジュールの読み込み")
+            camera_handler = camera_handler_loader()
+            modes = {
+                "smile_detection": SmileDetectionFrame,
+                "photo_slideshow": PhotoFrame
+            }
+            self._startup_result = (True, (camera_handler, modes))
+        except Exception as e:
+            self._startup_result = (False, e)
+
+    def _check_startup(self):
+        """起動処理の完了を待ち、完了したらモードのフレームを作成して表示します。"""
+        if self._startup_result is None:
+            self.after(20, self._check_startup)
+            return
+        ok, result = self._startup_result
+        if not ok:
+            logging.error(f"カメラハンドラーの初期化に失敗しました: {result}")
+            messagebox.showerror("エラー", f"カメラハンドラーの初期化に失敗しました: {result}")
+            self.destroy()
+            return
+
+        self.camera_handler, self.modes = result
+        # モードを切り替えてもカメラを開いたままにする（撮影モードに戻るときにデバイスを開き直さない）
+        self.camera_session = CameraSession(self.camera_handler, idle_timeout=self.camera_idle_timeout)
+
+        # 各モードのフレームを事前に作成し、デフォルトのモードを設定
+        self.build_mode_frames()
+        self.splash.destroy()
         self.change_mode("smile_detection")
+        self.startup_timer.mark("モードの表示")
+        self._wait_first_frame()
+
+    def _wait_first_frame(self):
+        """最初のカメラフレームが表示されるのを待ち、起動時間をログに出力します。"""
+        frame = self.current_frame
+        if frame is not None and getattr(frame, 'last_frame_id', 1) == 0 and not getattr(frame, 'paused', True):
+            self.after(10, self._wait_first_frame)
+            return
+        self.startup_timer.mark("最初のフレームの表示")
+        self.startup_timer.report()
 
     def toggle_fullscreen(self, event=None):
         self.fullscreen = not self.fullscreen
         self.attributes('-fullscreen', self.fullscreen)
         logging.info(f"フルスクリーンを {'有効化' if self.fullscreen else '無効化'} しました。")
 
-    def change_mode(self, mode_name):
-        if mode_name not in self.modes:
-            logging.error(f"未対応のモードが選択されました: {mode_name}")
-            messagebox.showerror("エラー", f"未対応のモードが選択されました: {mode_name}")
-            return
-
-        # 現在のフレームを削除
-        if self.current_frame is not None:
-            self.current_frame.destroy()
-            logging.debug(f"前のモード '{self.current_mode}' を終了しました。")
-
-        # 新しいモードのフレームを作成
+    def create_mode_frame(self, mode_name):
+        """モードのフレームを作成します。"""
         FrameClass = self.modes[mode_name]
         if mode_name == "smile_detection":
-            self.current_frame = FrameClass(self.container, self.camera_handler)
+            return FrameClass(self.container, self.camera_handler, camera_session=self.camera_session)
         elif mode_name == "photo_slideshow":
-            self.current_frame = FrameClass(
+            return FrameClass(
                 self.container,
                 photo_directory=self.photo_directory,
                 interval=self.interval,
-                controller=None
+                controller=None,
+                **self.slideshow_options
             )
-        else:
-            logging.error(f"モード '{mode_name}' のフレームを作成できませんでした。")
+        logging.error(f"モード '{mode_name}' のフレームを作成できませんでした。")
+        return None
+
+    def build_mode_frames(self):
+        """
+        すべてのモードのフレームを作成し、一時停止した状態で保持します。
+        モードの切り替えでは表示するフレームを入れ替えるだけにし、フレームを作り直さないようにする。
+        """
+        for mode_name in self.modes:
+            if mode_name in self.frames:
+                continue
+            frame = self.create_mode_frame(mode_name)
+            if frame is None:
+                continue
+            frame.pause()
+            self.frames[mode_name] = frame
+
+    def change_mode(self, mode_name):
+        if not self.modes:
+            logging.debug(f"起動処理中のため、モード '{mode_name}' への切り替えを無視しました。")
             return
+        if mode_name not in self.modes:
+            logging.error(f"未対応のモードが選択されました: {mode_name}")
+            messagebox.showerror("エラー", f"未対応のモードが選択されました: {mode_name}")
+            return
+        if mode_name == self.current_mode:
+            return
+        started = time.monotonic()
+
+        frame = self.frames.get(mode_name)
+        if frame is None:
+            frame = self.create_mode_frame(mode_name)
+            if frame is None:
+                return
+            self.frames[mode_name] = frame
 
-        self.current_frame.pack(fill=tk.BOTH, expand=True)
+        # 現在のフレームを一時停止して非表示にする
+        if self.current_frame is not None:
+            self.current_frame.pause()
+            self.current_frame.pack_forget()
+            logging.debug(f"前のモード '{self.current_mode}' を一時停止しました。")
+
+        frame.pack(fill=tk.BOTH, expand=True)
+        frame.resume()
+        self.current_frame = frame
         self.current_mode = mode_name
-        logging.info(f"モードを '{mode_name}' に切り替えました。")
+        logging.info(f"モードを '{mode_name}' に切り替えました。 ({(time.monotonic() - started) * 1000:.0f} ms)")
 
     def destroy(self):
+        # すべてのモードのフレームを破棄
+        for mode_name, frame in self.frames.items():
+            frame.destroy()
+            logging.debug(f"フレーム '{mode_name}' を破棄しました。")
+        self.frames = {}
+        self.current_frame = None
+
         # リソースのクリーンアップ
-        if self.camera_handler:
-            self.camera_handler.release_camera()
+        if self.camera_session:
+            self.camera_session.close()
             logging.info("カメラをリリースしました。")
 
-        # 現在のフレームを破棄
-        if self.current_frame:
-            self.current_frame.destroy()
-            logging.debug(f"フレーム '{self.current_mode}' を破棄しました。")
-
         # ウィンドウを閉じる
         super().destroy()
 
 def main():
-    # ログ設定を初期化
-    setup_logging(src_dir, log_file='application.log')
-    logging.debug("ログ設定を初期化しました。")
+    startup_timer = StartupTimer()
 
     # config.yaml のパスを指定
     config_path = os.path.join(src_dir, 'config.yaml')
 
     # 設定ファイルを読み込む
     config = load_config(config_path)
+
+    # ログ設定を初期化（ファイルへの書き込みはバックグラウンドで行う）
+    setup_tracing(src_dir, (config or {}).get('logging'), log_file='application.log')
+    logging.debug("ログ設定を初期化しました。")
+    startup_timer.mark("設定の読み込み")
+
     if config is None:
         logging.error("設定ファイルの読み込みに失敗しました。アプリケーションを終了します。")
         messagebox.showerror("エラー", "設定ファイルの読み込みに失敗しました。アプリケーションを終了します。")
@@ -120,6 +234,20 @@ def main():
         messagebox.showerror("エラー", f"設定ファイルに必要なキーが不足しています: {e}")
         sys.exit(1)
 
+    # スライドショーの追加設定
+    slideshow_config = config['slideshow']
+    slideshow_options = {
+        'prefetch_depth': slideshow_config.get('prefetch_depth', 2),
+        'cache_max_mb': slideshow_config.get('cache_max_mb', 64),
+        'rendition_cache_max_mb': slideshow_config.get('rendition_cache_max_mb', 512),
+        'transition': slideshow_config.get('transition', 'none'),
+        'transition_duration': slideshow_config.get('transition_duration', 800),
+        'transition_frames': slideshow_config.get('transition_frames', 24),
+    }
+    rendition_cache_directory = slideshow_config.get('rendition_cache_directory')
+    if rendition_cache_directory:
+        slideshow_options['rendition_cache_directory'] = os.path.join(src_dir, rendition_cache_directory)
+
     # 写真保存ディレクトリを取得
     photo_directory = os.path.join(src_dir, photo_directory)
 
@@ -132,22 +260,56 @@ def main():
         messagebox.showerror("エラー", f"写真保存ディレクトリの作成に失敗しました: {e}")
         sys.exit(1)
 
-    # カメラハンドラーのインスタンスを作成
     camera_config = config.get('camera', {})
-    try:
+    detection_config = config.get('detection', {})
+    burst_config = config.get('burst', {})
+    index_path = os.path.join(src_dir, slideshow_config.get('index_path', 'photo_index.sqlite3'))
+
+    def load_camera_handler():
+        """起動画面の表示中にバックグラウンドで実行する初期化処理。"""
+        from photo_index import PhotoIndex
+        from smile_detection import SmileDetectionCameraHandler
+
+        # 写真のインデックスを開き、ディレクトリの監視を開始
+        try:
+            photo_index = PhotoIndex(photo_directory, index_path, poll_interval=slideshow_config.get('index_poll_interval', 10))
+        except Exception as e:
+            logging.error(f"写真インデックスを開けませんでした。メモリ上に作成します: {e}")
+            photo_index = PhotoIndex(photo_directory)
+        photo_index.start_watching()
+        slideshow_options['photo_index'] = photo_index
+        startup_timer.mark("写真インデックスの読み込み")
+
+        # カメラハンドラーのインスタンスを作成（カスケードとフォントのロードを含む）
         camera_handler = SmileDetectionCameraHandler(
             camera_index=camera_config.get('index', 0),
             countdown_time=camera_config.get('countdown_time', 3),
             preview_time=camera_config.get('preview_time', 3),
-            photo_directory=photo_directory
+            photo_directory=photo_directory,
+            detection_executor=detection_config.get('executor', 'thread'),
+            detection_width=detection_config.get('width'),
+            smile_roi_width=detection_config.get('smile_roi_width'),
+            tracking_frames=detection_config.get('tracking_frames', 0),
+            tracking_margin=detection_config.get('tracking_margin', 0.5),
+            preroll_seconds=camera_config.get('preroll_seconds', 1.0),
+            frame_buffer_max_mb=camera_config.get('frame_buffer_max_mb', 128),
+            camera_fps=camera_config.get('fps', 30),
+            jpeg_quality=camera_config.get('jpeg_quality', 95),
+            write_queue_size=camera_config.get('write_queue_size', 8),
+            burst_frames=burst_config.get('frames', 0) if burst_config.get('enabled', False) else 0,
+            burst_keep=burst_config.get('keep', 3),
+            display_geometry=get_display_geometry()
         )
-    except Exception as e:
-        logging.error(f"カメラハンドラーの初期化に失敗しました: {e}")
-        messagebox.showerror("エラー", f"カメラハンドラーの初期化に失敗しました: {e}")
-        sys.exit(1)
+        startup_timer.mark("カスケード・フォントの読み込み")
+
+        # カメラデバイスも先に開いておく（撮影モードの開始時は開いたままのカメラを再利用する）
+        if camera_handler.initialize_camera():
+            startup_timer.mark("カメラの初期化")
+        return camera_handler
 
-     # アプリケーションを初期化
-    app = Application(camera_handler, photo_directory, interval)
+    # アプリケーションを初期化（ウィンドウを表示してから初期化処理を開始する）
+    app = Application(load_camera_handler, photo_directory, interval, slideshow_options,
+                      camera_idle_timeout=camera_config.get('idle_timeout', 0), startup_timer=startup_timer)
 
     # メインループを開始
     try:
@@ -155,6 +317,11 @@ def main():
     except Exception as e:
         logging.error(f"アプリケーションの実行中にエラーが発生しました: {e}")
         messagebox.showerror("エラー", f"アプリケーションの実行中にエラーが発生しました: {e}")
+    finally:
+        photo_index = slideshow_options.get('photo_index')
+        if photo_index is not None:
+            photo_index.close()
+        shutdown_tracing()
 
 if __name__ == "__main__":
     main()
\ No newline at end of file
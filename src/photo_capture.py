@@ -4,20 +4,50 @@ import threading
 import os
 import sys
 import logging
-from utils import get_screen_sizes, load_config, setup_logging, get_timestamp  # utils.pyからインポート
+from PIL import ImageFont
+from text_overlay import draw_text
+from display_geometry import DisplayGeometry
+from utils import get_screen_sizes, load_config, setup_logging, get_timestamp, FpsCounter  # utils.pyからインポート
 
 class CameraHandler:
-    def __init__(self, camera_index=0, countdown_time=3, preview_time=3, photo_directory='photos'):
+    def __init__(self, camera_index=0, countdown_time=3, preview_time=3, photo_directory='photos', photo_writer=None,
+                 display_geometry=None):
         """
         カメラハンドラーの初期化。
+
+        :param photo_writer: 写真をバックグラウンドで保存する PhotoWriter。None の場合は同期的に保存する
+        :param display_geometry: 画面サイズを共有する DisplayGeometry。None の場合はこのハンドラー専用に作成する
         """
         self.camera_index = camera_index
         self.countdown_time = countdown_time
         self.preview_time = preview_time
         self.photo_directory = photo_directory
         self.cap = None
-        self.screen_width, self.screen_height = get_screen_sizes()
+        self.display_geometry = display_geometry or DisplayGeometry(get_screen_sizes)
+        self.screen_width, self.screen_height = self.display_geometry.get_size()
+        self.display_geometry.add_listener(self.on_display_size_changed)
         self.captured_frame = None
+        self.photo_writer = photo_writer
+        self.overlay_font = None  # カウントダウン表示用のフォント（未指定の場合は get_overlay_font でロード）
+
+        # キャプチャスレッド関連
+        self._capture_thread = None
+        self._capture_stop_event = threading.Event()
+        # キャプチャスレッドごとの状態（{'cap': デバイス, 'release': 終了時に解放するか, 'exited': 終了したか}）
+        self._capture_state = None
+        self._capture_state_lock = threading.Lock()
+        self._capture_idle_event = threading.Event()  # セット中はフレームを読み捨てるだけにする
+        self._frame_lock = threading.Lock()
+        self._latest_frame = None  # 最新フレームのみを保持するシングルスロットバッファ
+        self._latest_frame_id = 0
+        self._latest_frame_time = 0.0
+        self._capture_fps_counter = FpsCounter()
+        self.capture_fps = 0.0  # 実測のカメラ取得FPS
+        self._frame_listeners = []  # 新しいフレームごとにキャプチャスレッドから呼び出されるコールバック
+
+    def on_display_size_changed(self, size):
+        """画面サイズが変わったときに、プレビューウィンドウのサイズを更新します。"""
+        self.screen_width, self.screen_height = size
 
     def initialize_camera(self):
         """カメラデバイスを初期化します。"""
@@ -32,16 +62,168 @@ class CameraHandler:
             logging.error(f"カメラの初期化中にエラーが発生しました: {e}")
             return False
 
+    def start_capture_thread(self):
+        """
+        カメラからフレームを取り込み続けるキャプチャスレッドを開始します。
+        取り込んだフレームは最新の 1 枚だけを保持し、古いフレームは破棄します。
+        """
+        if self.cap is None or not self.cap.isOpened():
+            logging.error("カメラが初期化されていないため、キャプチャスレッドを開始できません。")
+            return False
+        if self._capture_thread is not None and self._capture_thread.is_alive():
+            return True
+
+        # 停止が間に合わなかった前のスレッドを再開させないよう、停止イベントと状態はスレッドごとに作成する
+        self._capture_stop_event = threading.Event()
+        self._capture_state = {'cap': self.cap, 'release': False, 'exited': False}
+        self._capture_thread = threading.Thread(target=self._capture_loop, name="CameraCapture", daemon=True,
+                                                args=(self._capture_stop_event, self._capture_state))
+        self._capture_thread.start()
+        logging.info("キャプチャスレッドを開始しました。")
+        return True
+
+    def stop_capture_thread(self):
+        """キャプチャスレッドを停止します。スレッドが時間内に停止しなかった場合は False を返します。"""
+        thread = self._capture_thread
+        if thread is None:
+            return True
+        self._capture_stop_event.set()
+        thread.join(timeout=1.0)
+        self._capture_thread = None
+        if thread.is_alive():
+            logging.warning("キャプチャスレッドが時間内に停止しませんでした。")
+            return False
+        logging.info("キャプチャスレッドを停止しました。")
+        return True
+
+    def _capture_loop(self, stop_event, state):
+        """キャプチャスレッド本体。カメラのフレームを読み続けます。"""
+        try:
+            self._read_frames(state['cap'], stop_event)
+        finally:
+            with self._capture_state_lock:
+                state['exited'] = True
+                release = state['release']
+            if release:
+                # 停止を待ちきれなかった close_device() から解放を任された場合は、read() を終えたここで解放する
+                state['cap'].release()
+                logging.info("キャプチャスレッドの終了後にカメラをリリースしました。")
+
+    def _read_frames(self, cap, stop_event):
+        while not stop_event.is_set():
+            if self._capture_idle_event.is_set():
+                # アイドル中はデコードせずにドライバーのバッファを空けるだけにし、再開時に古いフレームが残らないようにする
+                if not cap.grab():
+                    stop_event.wait(0.1)
+                continue
+
+            ret, frame = cap.read()
+            if not ret:
+                logging.error("フレームを取得できませんでした。")
+                stop_event.wait(0.1)  # 少し待って再試行
+                continue
+
+            with self._frame_lock:
+                if self._capture_idle_event.is_set():
+                    continue  # 読み込み中にアイドル状態になった場合は破棄する
+                self._latest_frame = frame
+                self._latest_frame_id += 1
+                self._latest_frame_time = time.time()
+                frame_id = self._latest_frame_id
+                frame_time = self._latest_frame_time
+
+            for listener in list(self._frame_listeners):
+                try:
+                    listener(frame_id, frame_time, frame)
+                except Exception as e:
+                    logging.error(f"フレームリスナーの実行中にエラーが発生しました: {e}")
+
+            if self._capture_fps_counter.tick():
+                self.capture_fps = self._capture_fps_counter.fps
+
+    def set_capture_idle(self, idle):
+        """
+        キャプチャスレッドのアイドル状態を切り替えます。
+        アイドル中はカメラを開いたままフレームを読み捨て、最新フレームの更新とリスナーの呼び出しを行いません。
+        """
+        if idle:
+            self._capture_idle_event.set()
+            with self._frame_lock:
+                # アイドルに入る前のフレームを再開後に表示しないようにする
+                self._latest_frame = None
+            logging.debug("キャプチャスレッドをアイドル状態にしました。")
+        else:
+            self._capture_idle_event.clear()
+            logging.debug("キャプチャスレッドのアイドル状態を解除しました。")
+
+    @property
+    def capture_idle(self):
+        return self._capture_idle_event.is_set()
+
+    def is_camera_open(self):
+        return self.cap is not None and self.cap.isOpened()
+
+    def add_frame_listener(self, listener):
+        """
+        新しいフレームを取得するたびに呼び出されるコールバックを登録します。
+        コールバックは listener(フレームID, 取得時刻, フレーム) の形式でキャプチャスレッドから呼び出されるため、
+        短時間で処理を終えてください。
+        """
+        if listener not in self._frame_listeners:
+            self._frame_listeners.append(listener)
+
+    def remove_frame_listener(self, listener):
+        """登録したコールバックを解除します。"""
+        if listener in self._frame_listeners:
+            self._frame_listeners.remove(listener)
+
+    def get_latest_frame(self):
+        """
+        キャプチャスレッドが取得した最新フレームを返します。
+
+        :return: (フレームID, 取得時刻, フレーム) のタプル。フレームが未取得の場合は (0, 0.0, None)
+                 フレームは他の処理と共有されるため、描画などで変更する場合はコピーしてください。
+        """
+        with self._frame_lock:
+            return self._latest_frame_id, self._latest_frame_time, self._latest_frame
+
+    def close_device(self):
+        """
+        キャプチャスレッドを停止し、カメラデバイスを閉じます。
+        スレッドが read() の途中で時間内に停止しなかった場合、デバイスはスレッドの終了時に解放されます。
+        """
+        stopped = self.stop_capture_thread()
+        cap = self.cap
+        self.cap = None
+        if cap is None:
+            return
+        if not stopped:
+            with self._capture_state_lock:
+                state = self._capture_state
+                if state is not None and state['cap'] is cap and not state['exited']:
+                    state['release'] = True
+                    return
+        cap.release()
+        logging.info("カメラをリリースしました。")
+
     def release_camera(self):
-        if self.cap is not None:
-            self.cap.release()
-            self.cap = None
-            logging.info("カメラをリリースしました。")
+        """カメラを解放します。サブクラスではカメラ以外の資源もここで解放します。"""
+        self.close_device()
 
     def start_countdown(self, start_time):
         """カウントダウンの残り時間を計算します。"""
         return int(start_time + self.countdown_time - time.time())
 
+    def get_overlay_font(self):
+        """カウントダウン表示用のフォントを返します。"""
+        if self.overlay_font is None:
+            try:
+                self.overlay_font = ImageFont.load_default(size=64)
+            except TypeError:
+                # 古い Pillow ではサイズを指定できない
+                self.overlay_font = ImageFont.load_default()
+        return self.overlay_font
+
     def show_camera_preview(self, window_name, overlay_text=None):
         """カメラからのフレームを取得して表示します。"""
         ret, frame = self.cap.read()
@@ -49,25 +231,28 @@ class CameraHandler:
             logging.error("フレームを取得できませんでした。")
             return None
         if overlay_text is not None:
-            cv2.putText(
-                frame,
-                overlay_text,
-                (50, 50),
-                cv2.FONT_HERSHEY_SIMPLEX,
-                2,
-                (255, 0, 0),
-                3,
-                cv2.LINE_AA
-            )
+            # キャッシュ済みの文字スプライトをテキスト領域だけに合成する
+            # 位置は cv2.putText と同じく左端・ベースラインを基準にする
+            draw_text(frame, overlay_text, (50, 50), self.get_overlay_font(), color=(255, 0, 0), anchor='ls')
         cv2.imshow(window_name, frame)
         return frame
 
+    def save_photo(self, frame, save_path):
+        """
+        写真を保存します。PhotoWriter が設定されている場合は保存を予約してすぐに戻ります。
+        呼び出し後に frame を変更しないでください。
+        """
+        if self.photo_writer is not None:
+            return self.photo_writer.submit(frame, save_path)
+        cv2.imwrite(save_path, frame)
+        logging.info(f"画像が保存されました: {save_path}")
+        return True
+
     def capture_image(self, save_path):
         """カメラから画像をキャプチャして保存します。"""
         ret, frame = self.cap.read()
         if ret:
-            cv2.imwrite(save_path, frame)
-            logging.info(f"画像が保存されました: {save_path}")
+            self.save_photo(frame, save_path)
             return frame
         else:
             logging.error("画像のキャプチャに失敗しました。")
@@ -0,0 +1,297 @@
+# photo_index.py: 写真ディレクトリの内容を SQLite に記録し、差分だけを更新するモジュール
+
+import datetime
+import logging
+import os
+import sqlite3
+import threading
+from PIL import Image
+
+from directory_watcher import DirectoryWatcher, EVENT_REMOVED, EVENT_RESCAN
+
+SUPPORTED_FORMATS = ('.png', '.jpg', '.jpeg', '.gif', '.bmp')
+
+# EXIF のタグ
+EXIF_IFD_POINTER = 0x8769
+EXIF_DATETIME_ORIGINAL = 0x9003
+EXIF_DATETIME = 0x0132
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS photos (
+    name TEXT PRIMARY KEY,
+    size INTEGER NOT NULL,
+    mtime_ns INTEGER NOT NULL,
+    width INTEGER,
+    height INTEGER,
+    taken_at TEXT,
+    captured_at TEXT
+)
+"""
+
+# 撮影日時順の一覧（ページ単位の取得）に使用するインデックス
+_CAPTURED_AT_INDEX = "CREATE INDEX IF NOT EXISTS photos_by_captured_at ON photos (captured_at, name)"
+
+_COLUMNS = "name, size, mtime_ns, width, height, taken_at, captured_at"
+
+
+def is_photo_file(name):
+    """スライドショーで表示できる写真のファイル名かどうかを返します（隠しファイルや書き込み中の一時ファイルは除く）。"""
+    return not name.startswith('.') and name.lower().endswith(SUPPORTED_FORMATS)
+
+
+def read_photo_info(path):
+    """
+    写真のヘッダーを読み込み、(幅, 高さ, 撮影日時) を返します。
+    撮影日時は EXIF の DateTimeOriginal（なければ DateTime）を 'YYYY-MM-DD HH:MM:SS' 形式にしたもので、ない場合は None です。
+    """
+    with Image.open(path) as img:
+        width, height = img.size
+        taken_at = None
+        try:
+            exif = img.getexif()
+            taken_at = exif.get_ifd(EXIF_IFD_POINTER).get(EXIF_DATETIME_ORIGINAL) or exif.get(EXIF_DATETIME)
+        except Exception:
+            pass
+    if isinstance(taken_at, str) and len(taken_at) >= 19:
+        taken_at = taken_at[:10].replace(':', '-') + taken_at[10:19]
+    else:
+        taken_at = None
+    return width, height, taken_at
+
+
+def captured_at_of(taken_at, mtime_ns):
+    """撮影日時を 'YYYY-MM-DD HH:MM:SS' 形式で返します。EXIF の撮影日時がない場合はファイルの更新時刻（ローカル時刻）を使います。"""
+    if taken_at:
+        return taken_at
+    return datetime.datetime.fromtimestamp(mtime_ns / 1e9).strftime('%Y-%m-%d %H:%M:%S')
+
+
+class PhotoIndex:
+    """
+    写真ディレクトリ内の写真（ファイル名・サイズ・更新時刻・解像度・撮影日時）を SQLite に記録するインデックス。
+    起動時は前回の内容をそのまま使用でき、refresh() ではサイズか更新時刻が変わった写真だけを読み直します。
+    start_watching() を呼び出すとディレクトリを監視し、追加・削除された写真を自動的に反映します。
+    """
+    def __init__(self, photo_directory, database_path=':memory:', poll_interval=10.0):
+        self.photo_directory = photo_directory
+        self.database_path = database_path
+        self.poll_interval = poll_interval
+        self._lock = threading.Lock()
+        self._connection = sqlite3.connect(database_path, check_same_thread=False)
+        self._connection.execute(_SCHEMA)
+        self._migrate()
+        self._connection.execute(_CAPTURED_AT_INDEX)
+        self._connection.commit()
+        self._watcher = None
+        self._listeners = []
+        self.version = 0  # 内容が変わるたびに増える番号（一覧を読み直す必要があるかどうかの判定に使う）
+
+    def _migrate(self):
+        """撮影日時の列がない古いデータベースに列を追加し、記録済みの写真の撮影日時を設定します。"""
+        columns = [row[1] for row in self._connection.execute("PRAGMA table_info(photos)")]
+        if 'captured_at' in columns:
+            return
+        self._connection.execute("ALTER TABLE photos ADD COLUMN captured_at TEXT")
+        rows = self._connection.execute("SELECT name, taken_at, mtime_ns FROM photos").fetchall()
+        self._connection.executemany(
+            "UPDATE photos SET captured_at = ? WHERE name = ?",
+            [(captured_at_of(taken_at, mtime_ns), name) for name, taken_at, mtime_ns in rows]
+        )
+        logging.info(f"写真インデックスに撮影日時の列を追加しました（{len(rows)} 枚）")
+
+    def close(self):
+        """監視を停止し、データベースを閉じます。"""
+        self.stop_watching()
+        with self._lock:
+            self._connection.close()
+
+    def add_listener(self, listener):
+        """インデックスが更新されるたびに listener() を呼び出します（監視スレッドから呼ばれることがあります）。"""
+        if listener not in self._listeners:
+            self._listeners.append(listener)
+
+    def remove_listener(self, listener):
+        if listener in self._listeners:
+            self._listeners.remove(listener)
+
+    def _changed(self):
+        self.version += 1
+        for listener in list(self._listeners):
+            try:
+                listener()
+            except Exception as e:
+                logging.error(f"写真インデックスのリスナーの実行中にエラーが発生しました: {e}")
+
+    def __len__(self):
+        with self._lock:
+            return self._connection.execute("SELECT COUNT(*) FROM photos").fetchone()[0]
+
+    def list_photos(self):
+        """記録されている写真のパスをファイル名順に返します。"""
+        with self._lock:
+            rows = self._connection.execute("SELECT name FROM photos ORDER BY name").fetchall()
+        return [os.path.join(self.photo_directory, name) for name, in rows]
+
+    def list_photo_info(self):
+        """記録されている写真の情報（get_photo と同じ形式の辞書）をファイル名順に返します。"""
+        with self._lock:
+            rows = self._connection.execute(f"SELECT {_COLUMNS} FROM photos ORDER BY name").fetchall()
+        return [self._row_to_info(row) for row in rows]
+
+    def list_page(self, limit, after=None, descending=True, start=None, end=None):
+        """
+        撮影日時順に写真の情報を最大 limit 件返します。
+        前のページの最後の (撮影日時, ファイル名) を after に指定すると、その続きを返します。
+        OFFSET を使わずにインデックスから直接続きを読むため、写真の枚数が増えても応答時間は変わりません。
+
+        :param limit: 返す最大件数
+        :param after: 前のページの最後の写真の (captured_at, ファイル名)
+        :param descending: True の場合は新しい順
+        :param start: この日時（'YYYY-MM-DD HH:MM:SS'）以降の写真に限定する
+        :param end: この日時より前の写真に限定する
+        :return: 写真の情報（get_photo と同じ形式の辞書）のリスト
+        """
+        conditions = []
+        params = []
+        if after is not None:
+            conditions.append("(captured_at, name) < (?, ?)" if descending else "(captured_at, name) > (?, ?)")
+            params.extend(after)
+        if start is not None:
+            conditions.append("captured_at >= ?")
+            params.append(start)
+        if end is not None:
+            conditions.append("captured_at < ?")
+            params.append(end)
+        where = f"WHERE {' AND '.join(conditions)}" if conditions else ""
+        order = "DESC" if descending else "ASC"
+        params.append(limit)
+        with self._lock:
+            rows = self._connection.execute(
+                f"SELECT {_COLUMNS} FROM photos {where} ORDER BY captured_at {order}, name {order} LIMIT ?",
+                params
+            ).fetchall()
+        return [self._row_to_info(row) for row in rows]
+
+    def get_photo(self, path):
+        """
+        写真の情報を辞書で返します。記録されていない場合は None を返します。
+        """
+        with self._lock:
+            row = self._connection.execute(
+                f"SELECT {_COLUMNS} FROM photos WHERE name = ?",
+                (os.path.basename(path),)
+            ).fetchone()
+        if row is None:
+            return None
+        return self._row_to_info(row)
+
+    def _row_to_info(self, row):
+        name, size, mtime_ns, width, height, taken_at, captured_at = row
+        return {
+            'name': name,
+            'path': os.path.join(self.photo_directory, name),
+            'size': size,
+            'mtime_ns': mtime_ns,
+            'width': width,
+            'height': height,
+            'taken_at': taken_at,
+            'captured_at': captured_at,
+        }
+
+    def refresh(self):
+        """
+        ディレクトリを走査し、追加・更新・削除された写真をインデックスに反映します。
+
+        :return: 変更された写真の数
+        """
+        if not os.path.isdir(self.photo_directory):
+            logging.error(f"指定されたフォトディレクトリが存在しません: {self.photo_directory}")
+            return 0
+
+        with self._lock:
+            known = {name: (size, mtime_ns) for name, size, mtime_ns in
+                     self._connection.execute("SELECT name, size, mtime_ns FROM photos")}
+
+        found = set()
+        updates = []
+        with os.scandir(self.photo_directory) as it:
+            for entry in it:
+                if not is_photo_file(entry.name) or not entry.is_file():
+                    continue
+                found.add(entry.name)
+                try:
+                    stat = entry.stat()
+                except OSError:
+                    continue
+                if known.get(entry.name) != (stat.st_size, stat.st_mtime_ns):
+                    updates.append(self._build_row(entry.path, stat))
+        removed = [name for name in known if name not in found]
+
+        self._apply(updates, removed)
+        changed = len(updates) + len(removed)
+        logging.debug(f"写真インデックスを更新しました: 全 {len(found)} 枚（追加・更新 {len(updates)}, 削除 {len(removed)}）")
+        return changed
+
+    def update_path(self, path):
+        """1 枚の写真をインデックスに追加または更新します。写真でないファイルは無視します。"""
+        if os.path.dirname(os.path.abspath(path)) != os.path.abspath(self.photo_directory):
+            return
+        if not is_photo_file(os.path.basename(path)):
+            return
+        try:
+            stat = os.stat(path)
+        except OSError:
+            self.remove_path(path)
+            return
+        self._apply([self._build_row(path, stat)], [])
+
+    def remove_path(self, path):
+        """1 枚の写真をインデックスから削除します。"""
+        self._apply([], [os.path.basename(path)])
+
+    def _build_row(self, path, stat):
+        try:
+            width, height, taken_at = read_photo_info(path)
+        except Exception as e:
+            # 読み込めない写真もスライドショー側でスキップできるよう記録しておく
+            logging.warning(f"写真の情報を読み込めませんでした: {path}: {e}")
+            width = height = taken_at = None
+        captured_at = captured_at_of(taken_at, stat.st_mtime_ns)
+        return os.path.basename(path), stat.st_size, stat.st_mtime_ns, width, height, taken_at, captured_at
+
+    def _apply(self, updates, removed):
+        if not updates and not removed:
+            return
+        with self._lock:
+            with self._connection:
+                self._connection.executemany(
+                    f"INSERT OR REPLACE INTO photos ({_COLUMNS}) VALUES (?, ?, ?, ?, ?, ?, ?)",
+                    updates
+                )
+                cursor = self._connection.executemany("DELETE FROM photos WHERE name = ?", [(name,) for name in removed])
+            if not updates and cursor.rowcount <= 0:
+                return
+        self._changed()
+
+    def start_watching(self, use_inotify=True):
+        """ディレクトリの監視を開始し、開始前に追加・削除された写真を反映します。"""
+        if self._watcher is not None:
+            return
+        self._watcher = DirectoryWatcher(self.photo_directory, self._on_directory_event,
+                                         poll_interval=self.poll_interval, use_inotify=use_inotify)
+        self._watcher.start()
+        # 監視の開始前に変更された分を取り込む（監視開始後に走査するため取りこぼしはない）
+        threading.Thread(target=self.refresh, name="PhotoIndexRefresh", daemon=True).start()
+
+    def stop_watching(self):
+        if self._watcher is not None:
+            self._watcher.stop()
+            self._watcher = None
+
+    def _on_directory_event(self, event, path):
+        if event == EVENT_RESCAN:
+            self.refresh()
+        elif event == EVENT_REMOVED:
+            self.remove_path(path)
+        else:
+            self.update_path(path)
@@ -0,0 +1,234 @@
+# photo_ingest.py: アップロードされた写真の検証・向きの補正・縮小版の作成・公開をバックグラウンドで行うモジュール
+
+import logging
+import os
+import queue
+import threading
+import time
+from PIL import Image, ImageOps
+
+from photo_index import is_photo_file
+from photo_writer import fsync_directory
+from slide_loader import fit_size
+
+# 受け付ける画像の形式（Pillow の format 名）
+ACCEPTED_FORMATS = ('JPEG', 'MPO', 'PNG', 'GIF', 'BMP')
+
+EXIF_ORIENTATION = 0x0112
+
+
+def make_rendition(img, size):
+    """画像を size に収まるように縮小した RGB 画像を返します。"""
+    if img.mode not in ('RGB', 'L'):
+        img = img.convert('RGB')
+    return img.resize(fit_size(img.size, size), Image.LANCZOS)
+
+
+class PhotoIngester:
+    """
+    アップロードされた写真を写真ディレクトリに取り込むワーカースレッド。
+
+    アップロードされたファイルは写真ディレクトリ内の一時ディレクトリに保存された状態で submit() され、
+    ワーカーが画像として読み込めるかを検証し、EXIF の向きを画素に反映し、スライドショー用と
+    サムネイル用の縮小版を作成し、写真ディレクトリにリンクして公開します。
+    ディレクトリの監視に通知するのは縮小版をキャッシュに保存した後のため、スライドショーが元の写真を読み込むことはありません。
+    """
+    def __init__(self, photo_directory, upload_directory, photo_index=None, renditions=None,
+                 jpeg_quality=95, max_queue_size=32):
+        """
+        :param photo_directory: 写真ディレクトリのパス
+        :param upload_directory: アップロード中のファイルを保存するディレクトリ（写真ディレクトリと同じファイルシステム）
+        :param photo_index: PhotoIndex。公開した写真をすぐに反映する
+        :param renditions: 作成する縮小版の (RenditionCache, (幅, 高さ)) のリスト
+        :param jpeg_quality: 向きを補正した写真を保存するときの JPEG の品質
+        :param max_queue_size: 取り込み待ちにできる写真の最大数
+        """
+        self.photo_directory = photo_directory
+        self.upload_directory = upload_directory
+        self.photo_index = photo_index
+        self.renditions = [(cache, size) for cache, size in (renditions or []) if cache is not None and size]
+        self.jpeg_quality = jpeg_quality
+        self.max_queue_size = max_queue_size
+        self._queue = queue.Queue(maxsize=max_queue_size)
+        self._thread = None
+        self._lock = threading.Lock()
+        self._listeners = []
+        os.makedirs(upload_directory, exist_ok=True)
+
+        # 統計情報
+        self.published_count = 0
+        self.rejected_count = 0
+        self.dropped_count = 0
+        self.last_ingest_seconds = 0.0
+
+    def start(self):
+        """ワーカースレッドを開始します。"""
+        with self._lock:
+            if self._thread is not None and self._thread.is_alive():
+                return
+            self._thread = threading.Thread(target=self._run, name="PhotoIngester", daemon=True)
+            self._thread.start()
+        logging.info("写真取り込みスレッドを開始しました。")
+
+    def stop(self, timeout=30.0):
+        """キューに残っている写真をすべて取り込んでからワーカースレッドを停止します。"""
+        with self._lock:
+            thread = self._thread
+            self._thread = None
+        if thread is None:
+            return
+        self._queue.put(None)
+        thread.join(timeout)
+        if thread.is_alive():
+            logging.warning("写真取り込みスレッドが時間内に停止しませんでした。")
+        else:
+            logging.info("写真取り込みスレッドを停止しました。")
+
+    def add_listener(self, listener):
+        """写真を公開するたびに listener(公開したパス) をワーカースレッドから呼び出します。"""
+        if listener not in self._listeners:
+            self._listeners.append(listener)
+
+    def submit(self, upload_path, filename):
+        """
+        アップロードされたファイルの取り込みを予約します。取り込み後（失敗した場合も）upload_path は削除されます。
+
+        :param upload_path: アップロードされたファイルのパス（upload_directory 内）
+        :param filename: 公開するファイル名（secure_filename 済みのもの）
+        :return: 予約できた場合は True、キューが一杯の場合は False（upload_path は呼び出し元で削除すること）
+        """
+        self.start()
+        try:
+            self._queue.put_nowait((upload_path, filename, time.monotonic()))
+        except queue.Full:
+            self.dropped_count += 1
+            logging.error(f"取り込み待ちの写真が多すぎるため受け付けませんでした: {filename}")
+            return False
+        return True
+
+    def join(self):
+        """キューに入っている写真の取り込みがすべて終わるまで待ちます。"""
+        self._queue.join()
+
+    def get_stats(self):
+        return {
+            'queue_depth': self._queue.qsize(),
+            'published': self.published_count,
+            'rejected': self.rejected_count,
+            'dropped': self.dropped_count,
+            'last_ingest_seconds': self.last_ingest_seconds,
+        }
+
+    def cleanup_uploads(self, max_age=3600):
+        """
+        前回の実行で取り込まれずに残ったアップロードファイルを削除します。
+        他のプロセスがアップロード中のファイルを消さないよう、max_age 秒以上更新されていないものだけを削除します。
+        """
+        now = time.time()
+        with os.scandir(self.upload_directory) as it:
+            for entry in it:
+                try:
+                    if entry.is_file() and now - entry.stat().st_mtime >= max_age:
+                        os.remove(entry.path)
+                except OSError:
+                    pass
+
+    def _run(self):
+        while True:
+            item = self._queue.get()
+            try:
+                if item is None:
+                    break
+                upload_path, filename, queued_at = item
+                try:
+                    path = self._ingest(upload_path, filename)
+                except Exception as e:
+                    self.rejected_count += 1
+                    logging.error(f"アップロードされた写真を取り込めませんでした: {filename}: {e}")
+                    continue
+                finally:
+                    if os.path.exists(upload_path):
+                        os.remove(upload_path)
+
+                self.published_count += 1
+                self.last_ingest_seconds = time.monotonic() - queued_at
+                logging.info(f"アップロードされた写真を公開しました: {path} ({self.last_ingest_seconds:.2f}秒)")
+                if self.photo_index is not None:
+                    self.photo_index.update_path(path)
+                for listener in list(self._listeners):
+                    try:
+                        listener(path)
+                    except Exception as e:
+                        logging.error(f"取り込み完了リスナーの実行中にエラーが発生しました: {e}")
+            finally:
+                self._queue.task_done()
+
+    def _ingest(self, upload_path, filename):
+        """写真を検証・補正して縮小版を作成し、写真ディレクトリに公開したパスを返します。"""
+        if not is_photo_file(filename):
+            raise ValueError(f"対応していないファイル名です: {filename}")
+
+        # ヘッダーと構造の検証（verify 後の画像は使えないため開き直す）
+        with Image.open(upload_path) as img:
+            if img.format not in ACCEPTED_FORMATS:
+                raise ValueError(f"対応していない画像形式です: {img.format}")
+            img.verify()
+
+        source_path = upload_path
+        with Image.open(upload_path) as img:
+            img.load()
+            image_format = img.format
+            orientation = img.getexif().get(EXIF_ORIENTATION, 1)
+            if orientation != 1:
+                # 向きを画素に反映し、EXIF の Orientation を取り除いた写真を保存する
+                img = ImageOps.exif_transpose(img)
+                source_path = f"{upload_path}.oriented"
+                self._save_oriented(img, image_format, source_path)
+                logging.debug(f"写真の向きを補正しました: {filename} (Orientation={orientation})")
+            renditions = [(cache, size, make_rendition(img, size)) for cache, size in self.renditions]
+
+        try:
+            return self._publish(source_path, filename, renditions)
+        finally:
+            if source_path != upload_path and os.path.exists(source_path):
+                os.remove(source_path)
+
+    def _save_oriented(self, img, image_format, path):
+        save_format = 'JPEG' if image_format in ('JPEG', 'MPO') else image_format
+        options = {'exif': img.info['exif']} if 'exif' in img.info else {}
+        if save_format == 'JPEG':
+            if img.mode not in ('RGB', 'L'):
+                img = img.convert('RGB')
+            options['quality'] = self.jpeg_quality
+        img.save(path, save_format, **options)
+
+    def _publish(self, source_path, filename, renditions):
+        """
+        写真を写真ディレクトリにリンクして公開し、縮小版をキャッシュに保存します。
+        同じ名前の写真がある場合は末尾に番号を付けます。os.link は既存のファイルを上書きしないため、
+        名前を決めてから公開するまでの間にカメラの撮影などで同じ名前のファイルが作られても上書きしません。
+        リンクの作成は inotify では IN_CREATE しか通知されないため、縮小版を保存した後に書き込みモードで開き直して
+        IN_CLOSE_WRITE を通知し、スライドショー側のインデックスに反映させます（内容と更新時刻は変わりません）。
+        """
+        with open(source_path, 'rb+') as f:
+            os.fsync(f.fileno())
+        stat = os.stat(source_path)
+        base, extension = os.path.splitext(filename)
+        number = 0
+        while True:
+            name = filename if number == 0 else f"{base}_{number}{extension}"
+            path = os.path.join(self.photo_directory, name)
+            number += 1
+            try:
+                os.link(source_path, path)
+                break
+            except FileExistsError:
+                continue
+        os.unlink(source_path)
+        # リンクではファイルサイズと更新時刻が変わらないため、元のファイルの stat でキャッシュを作成できる
+        for cache, size, rendition in renditions:
+            cache.store(path, size, rendition, stat)
+        with open(path, 'ab'):
+            pass
+        fsync_directory(self.photo_directory)
+        return path
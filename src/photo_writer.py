@@ -0,0 +1,157 @@
+# photo_writer.py: 撮影した写真の JPEG エンコードと保存をバックグラウンドで行うモジュール
+
+import cv2
+import logging
+import os
+import queue
+import threading
+import time
+
+
+def write_file_atomically(path, data):
+    """
+    データを一時ファイルに書き込んで fsync した後、rename で目的のパスに置き換えます。
+    書き込み途中のファイルがスライドショーなどから見えることはありません。
+    """
+    directory = os.path.dirname(path) or '.'
+    temp_path = os.path.join(directory, f".{os.path.basename(path)}.tmp")
+    try:
+        with open(temp_path, 'wb') as file:
+            file.write(data)
+            file.flush()
+            os.fsync(file.fileno())
+        os.replace(temp_path, path)
+    except Exception:
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+        raise
+
+    fsync_directory(directory)
+
+
+def fsync_directory(directory):
+    """ディレクトリへの rename やリンクの作成を永続化します（対応していないOSでは無視する）。"""
+    try:
+        dir_fd = os.open(directory, os.O_RDONLY)
+    except OSError:
+        return
+    try:
+        os.fsync(dir_fd)
+    except OSError:
+        pass
+    finally:
+        os.close(dir_fd)
+
+
+class PhotoWriter:
+    """
+    JPEG エンコードとファイル書き込みを行うワーカースレッド。
+    キューの長さには上限があり、一杯の場合は写真を破棄してエラーを記録します。
+    """
+    def __init__(self, jpeg_quality=95, max_queue_size=8):
+        self.jpeg_quality = jpeg_quality
+        self.max_queue_size = max_queue_size
+        self._queue = queue.Queue(maxsize=max_queue_size)
+        self._thread = None
+        self._lock = threading.Lock()
+        self._listeners = []
+
+        # 統計情報
+        self.written_count = 0
+        self.dropped_count = 0
+        self.failed_count = 0
+        self.max_queue_depth = 0
+        self.last_write_seconds = 0.0
+        self.total_write_seconds = 0.0
+
+    def start(self):
+        """ワーカースレッドを開始します。"""
+        with self._lock:
+            if self._thread is not None and self._thread.is_alive():
+                return
+            self._thread = threading.Thread(target=self._run, name="PhotoWriter", daemon=True)
+            self._thread.start()
+        logging.info("写真保存スレッドを開始しました。")
+
+    def stop(self, timeout=10.0):
+        """キューに残っている写真をすべて保存してからワーカースレッドを停止します。"""
+        with self._lock:
+            thread = self._thread
+            self._thread = None
+        if thread is None:
+            return
+        self._queue.put(None)
+        thread.join(timeout)
+        if thread.is_alive():
+            logging.warning("写真保存スレッドが時間内に停止しませんでした。")
+        else:
+            logging.info("写真保存スレッドを停止しました。")
+
+    def add_listener(self, listener):
+        """写真の保存が完了するたびに listener(保存先のパス) をワーカースレッドから呼び出します。"""
+        if listener not in self._listeners:
+            self._listeners.append(listener)
+
+    def submit(self, frame, save_path):
+        """
+        写真の保存を予約します。呼び出し後に frame を変更しないでください。
+
+        :return: 予約できた場合は True、キューが一杯で破棄した場合は False
+        """
+        self.start()
+        try:
+            self._queue.put_nowait((frame, save_path, time.monotonic()))
+        except queue.Full:
+            self.dropped_count += 1
+            logging.error(f"保存待ちの写真が多すぎるため破棄しました: {save_path} (破棄数: {self.dropped_count})")
+            return False
+
+        depth = self._queue.qsize()
+        if depth > self.max_queue_depth:
+            self.max_queue_depth = depth
+        if depth >= self.max_queue_size // 2:
+            logging.warning(f"写真の保存が遅れています: 保存待ち {depth}/{self.max_queue_size}")
+        return True
+
+    def get_stats(self):
+        """キューの状態と保存にかかった時間の統計を返します。"""
+        average = self.total_write_seconds / self.written_count if self.written_count else 0.0
+        return {
+            'queue_depth': self._queue.qsize(),
+            'max_queue_depth': self.max_queue_depth,
+            'written': self.written_count,
+            'dropped': self.dropped_count,
+            'failed': self.failed_count,
+            'last_write_seconds': self.last_write_seconds,
+            'average_write_seconds': average,
+        }
+
+    def _run(self):
+        while True:
+            item = self._queue.get()
+            if item is None:
+                break
+            frame, save_path, queued_at = item
+            try:
+                self._write(frame, save_path)
+            except Exception as e:
+                self.failed_count += 1
+                logging.error(f"写真の保存中にエラーが発生しました: {save_path}: {e}")
+                continue
+
+            self.written_count += 1
+            self.last_write_seconds = time.monotonic() - queued_at
+            self.total_write_seconds += self.last_write_seconds
+            logging.info(f"画像が保存されました: {save_path} ({self.last_write_seconds:.2f}秒)")
+
+            for listener in list(self._listeners):
+                try:
+                    listener(save_path)
+                except Exception as e:
+                    logging.error(f"保存完了リスナーの実行中にエラーが発生しました: {e}")
+
+    def _write(self, frame, save_path):
+        ok, encoded = cv2.imencode('.jpg', frame, [cv2.IMWRITE_JPEG_QUALITY, int(self.jpeg_quality)])
+        if not ok:
+            raise IOError("JPEG エンコードに失敗しました。")
+        write_file_atomically(save_path, memoryview(encoded))
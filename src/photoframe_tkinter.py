@@ -1,27 +1,74 @@
 import tkinter as tk
 from PIL import Image, ImageTk
 import os
+import time
 import logging
 from utils import get_screen_sizes, setup_logging, load_config
+from slide_loader import SlidePrefetcher, load_slide
+from rendition_cache import RenditionCache
+from photo_index import PhotoIndex
+from transitions import TransitionRenderer, TRANSITION_NONE
+from tracing import get_counter
+from display_geometry import get_display_geometry
 
 class PhotoFrame(tk.Frame):
-    def __init__(self, parent, photo_directory, interval=5000, controller=None):
+    def __init__(self, parent, photo_directory, interval=5000, controller=None, prefetch_depth=2, cache_max_mb=64,
+                 rendition_cache_directory=None, rendition_cache_max_mb=512, photo_index=None,
+                 transition=TRANSITION_NONE, transition_duration=800, transition_frames=24, display_geometry=None):
         super().__init__(parent)
         self.parent = parent
         self.controller = controller  # コントローラーを保持
         self.photo_directory = photo_directory
         self.interval = interval  # ミリ秒
+
+        # 写真の一覧はインデックスから取得する（指定されない場合はこのフレーム専用のインデックスを作成する）
+        self._owns_photo_index = photo_index is None
+        if photo_index is None:
+            photo_index = PhotoIndex(photo_directory)
+            photo_index.refresh()
+        self.photo_index = photo_index
+        self._photos_version = self.photo_index.version
         self.photos = self.load_photos()
         self.current = 0
         self.after_id = None  # after_idを初期化
+        # スライドごとのログの代わりに、表示回数と処理時間を一定間隔で集計して記録する
+        self.slide_counter = get_counter("スライド表示")
+        self.sync_load_counter = get_counter("スライドの同期読み込み（先読み未完了）")
+        self._warned_no_photos = False
 
         # トップレベルウィンドウを取得
         self.top_level = self.winfo_toplevel()
 
-        # 実際の画面サイズをTkinterから取得
-        screen_width = self.top_level.winfo_screenwidth()
-        screen_height = self.top_level.winfo_screenheight()
-        logging.debug(f"実際の画面サイズを取得しました: {screen_width}x{screen_height}")
+        # 画面サイズは共有の DisplayGeometry から取得する（未取得の場合のみ Tkinter に問い合わせる）
+        self.display_geometry = display_geometry or get_display_geometry()
+        screen_width, screen_height = self.display_geometry.get_size(
+            lambda: (self.top_level.winfo_screenwidth(), self.top_level.winfo_screenheight())
+        )
+        self.screen_width = screen_width
+        self.screen_height = screen_height
+        logging.debug(f"画面サイズ: {screen_width}x{screen_height}")
+
+        # 画面サイズに縮小した写真のディスクキャッシュ（2 周目以降は小さなファイルから読み込む）
+        self.rendition_cache = None
+        if rendition_cache_directory:
+            try:
+                self.rendition_cache = RenditionCache(
+                    rendition_cache_directory,
+                    max_bytes=int(rendition_cache_max_mb * 1024 * 1024)
+                )
+            except OSError as e:
+                logging.error(f"レンディションキャッシュを作成できませんでした: {e}")
+
+        # 次に表示する写真をバックグラウンドで読み込んでおく
+        self.prefetcher = SlidePrefetcher(
+            (screen_width, screen_height),
+            depth=prefetch_depth,
+            max_bytes=int(cache_max_mb * 1024 * 1024),
+            rendition_cache=self.rendition_cache
+        )
+        self.prefetcher.start()
+        # 先読みの合間に全写真のレンディションを作成する
+        self.prefetcher.warm_up(self.photos)
 
         # フルスクリーン設定
         self.top_level.attributes('-fullscreen', True)
@@ -38,15 +85,59 @@ class PhotoFrame(tk.Frame):
         canvas_height = self.canvas.winfo_height()
         logging.debug(f"Canvasのサイズ: {canvas_width}x{canvas_height}")
 
-        # イベントバインド
-        self.top_level.bind("<Escape>", self.exit_fullscreen)
-        logging.debug("Escapeキーをバインドしました。")
-
-        # 黒い背景画像を作成
+        # 黒い背景画像を作成（背景は最初に一度だけ描画する）
         self.background = self.create_black_background(screen_width, screen_height)
 
+        # 写真を表示するキャンバスアイテム（スライドごとに画像だけを差し替える）
+        self.photo_image = None
+        self.photo_image_mode = None  # photo_image を作成したときの画像のモード
+        self.transition_photo = None  # 切り替え効果の中間フレーム用
+        self._canvas_photo = None  # キャンバスアイテムが現在表示している PhotoImage
+        self.current_image = None  # 表示中のスライド（切り替え効果の開始画像）
+        self.image_item = self.canvas.create_image(screen_width // 2, screen_height // 2, anchor='center')
+
+        # 切り替え効果（中間フレームはバックグラウンドで作成し、タイマーで順に表示する）
+        self.transition_renderer = TransitionRenderer(transition, frame_count=transition_frames)
+        self.transition_duration = transition_duration  # ミリ秒
+        self._transition = None
+        self.transition_after_id = None
+        if self.transition_renderer.enabled:
+            self.transition_renderer.start()
+
+        # 画面サイズの変更に追従する
+        self.display_geometry.add_listener(self.on_display_size_changed)
+        self.display_geometry.watch(self.top_level)
+
         # 写真表示開始
+        self.paused = True
+        self._previous_escape_binding = None
+        self.resume()
+
+    def resume(self):
+        """スライドショーを再開し、次の写真をすぐに表示します。"""
+        if not self.paused:
+            return
+        self.paused = False
+        # イベントバインド（一時停止中は元のバインドに戻す）
+        self._previous_escape_binding = self.top_level.bind("<Escape>")
+        self.top_level.bind("<Escape>", self.exit_fullscreen)
         self.show_photo()
+        logging.debug("スライドショーを再開しました。")
+
+    def pause(self):
+        """
+        スライドショーのタイマーと切り替え効果を止めます。
+        写真の一覧や先読み済みの写真は保持するため、resume() ですぐに再開できます。
+        """
+        if self.paused:
+            return
+        self.paused = True
+        if self.after_id:
+            self.after_cancel(self.after_id)
+            self.after_id = None
+        self.cancel_transition()
+        self.top_level.bind("<Escape>", self._previous_escape_binding or '')
+        logging.debug("スライドショーを一時停止しました。")
 
     def exit_fullscreen(self, event=None):
         self.top_level.attributes('-fullscreen', False)
@@ -57,111 +148,198 @@ class PhotoFrame(tk.Frame):
 
     def destroy(self):
         # スライドショーの更新を停止
-        if self.after_id:
-            self.after_cancel(self.after_id)
-            self.after_id = None
-            logging.debug("スライドショーの更新を停止しました。")
+        self._transition = None
+        self.pause()
+        self.display_geometry.remove_listener(self.on_display_size_changed)
+        self.transition_renderer.stop()
+        # 先読みを停止
+        self.prefetcher.stop()
+        if self._owns_photo_index:
+            self.photo_index.close()
         # スーパークラスの destroy を呼び出す
         super().destroy()
 
     def load_photos(self):
-        supported_formats = ('.png', '.jpg', '.jpeg', '.gif', '.bmp')
-        if not os.path.exists(self.photo_directory):
-            print(f"指定されたフォトディレクトリが存在しません: {self.photo_directory}")
-            logging.error(f"指定されたフォトディレクトリが存在しません: {self.photo_directory}")
-            return []
-        photos = [os.path.join(self.photo_directory, f) for f in os.listdir(self.photo_directory) if f.lower().endswith(supported_formats)]
-        print(f"読み込まれた写真の数: {len(photos)}")
-        logging.debug(f"読み込まれた写真の数: {len(photos)}")
+        photos = self.photo_index.list_photos()
+        logging.info(f"読み込まれた写真の数: {len(photos)}")
         return photos
 
+    def reload_photos_if_changed(self):
+        """
+        インデックスが更新されていれば写真の一覧を読み直します。
+        次に表示する予定だった写真が残っている場合は、その写真から表示を続けます。
+        """
+        version = self.photo_index.version
+        if version == self._photos_version:
+            return
+        self._photos_version = version
+        next_path = self.photos[self.current] if self.photos else None
+        self.photos = self.load_photos()
+        if next_path in self.photos:
+            self.current = self.photos.index(next_path)
+        elif self.current >= len(self.photos):
+            self.current = 0
+        self.prefetcher.warm_up(self.photos)
+
+    def upcoming_photos(self):
+        """次に表示する写真のパスを表示順に返します（現在表示中の写真は含まない）。"""
+        count = min(self.prefetcher.depth, len(self.photos) - 1)
+        return [self.photos[(self.current + i) % len(self.photos)] for i in range(count)]
+
     def create_black_background(self, screen_width, screen_height):
         # 黒い画像を作成
         black_image = Image.new('RGB', (screen_width, screen_height), (0, 0, 0))
         self.background_photo = ImageTk.PhotoImage(black_image)
-        print("黒い背景画像を作成しました。")
-        logging.debug("黒い背景画像を作成しました。")
 
         # Canvasに黒い背景画像を描画
-        self.canvas.create_image(0, 0, anchor='nw', image=self.background_photo)
-        print("Canvasに黒い背景画像を描画しました。")
+        self.background_item = self.canvas.create_image(0, 0, anchor='nw', image=self.background_photo)
         logging.debug("Canvasに黒い背景画像を描画しました。")
 
         return black_image
 
+    def on_display_size_changed(self, size):
+        """
+        画面サイズが変わったときに、キャンバスと背景を作り直し、先読み済みの写真を破棄します。
+        レンディションキャッシュは画面サイズをキーに含むため、新しいサイズのレンディションが作成されます。
+        """
+        screen_width, screen_height = size
+        self.screen_width = screen_width
+        self.screen_height = screen_height
+        self.canvas.config(width=screen_width, height=screen_height)
+        self.background = Image.new('RGB', (screen_width, screen_height), (0, 0, 0))
+        self.background_photo = ImageTk.PhotoImage(self.background)
+        self.canvas.itemconfigure(self.background_item, image=self.background_photo)
+        self.canvas.coords(self.image_item, screen_width // 2, screen_height // 2)
+        self.prefetcher.set_screen_size(size)
+        self.prefetcher.prefetch(self.upcoming_photos())
+        self.prefetcher.warm_up(self.photos)
+        logging.info(f"スライドショーの表示サイズを変更しました: {screen_width}x{screen_height}")
+
+    def display_image(self, img):
+        """
+        画像を画面中央のキャンバスアイテムに表示します。
+        前の写真と同じサイズ・モードであれば PhotoImage に上書きし、違う場合のみ PhotoImage を作り直します。
+        （paste は PhotoImage を作成したときのモードに変換するため、グレースケールの写真の後にカラーの写真を
+        上書きすると白黒で表示されてしまう）
+        """
+        if (self.photo_image is not None and self.photo_image_mode == img.mode
+                and (self.photo_image.width(), self.photo_image.height()) == img.size):
+            self.photo_image.paste(img)
+        else:
+            self.photo_image = ImageTk.PhotoImage(img)
+            self.photo_image_mode = img.mode
+            logging.debug(f"PhotoImageを作成しました: {img.width}x{img.height} ({img.mode})")
+        self.set_canvas_photo(self.photo_image)
+        self.current_image = img
+
+    def set_canvas_photo(self, photo):
+        """キャンバスアイテムに表示する PhotoImage を切り替えます（同じ場合は何もしない）。"""
+        if self._canvas_photo is not photo:
+            self.canvas.itemconfigure(self.image_item, image=photo)
+            self._canvas_photo = photo
+
+    def start_transition(self, img):
+        """表示中のスライドから img への切り替え効果を開始します。"""
+        self.cancel_transition()
+        planned = self.transition_renderer.frame_count
+        job_id = self.transition_renderer.submit(self.current_image, img)
+        self._transition = {
+            'job_id': job_id,
+            'image': img,
+            'planned': planned,
+            'start': time.monotonic(),
+            'index': -1,  # 最後に表示したフレーム
+            'shown': 0,
+        }
+        self.transition_after_id = self.after(0, self.step_transition)
+
+    def step_transition(self):
+        """
+        経過時間に対応する中間フレームを表示します。
+        作成や表示が遅れている場合は途中のフレームを飛ばし、表示できた枚数を次回のフレーム数の調整に使います。
+        """
+        self.transition_after_id = None
+        transition = self._transition
+        if transition is None:
+            return
+        planned = transition['planned']
+        duration = self.transition_duration / 1000.0
+        elapsed = time.monotonic() - transition['start']
+
+        target = min(planned - 1, int(elapsed / duration * planned))
+        ready = self.transition_renderer.frames_ready(transition['job_id'])
+        index = min(target, ready - 1)
+        if index > transition['index']:
+            frame = self.transition_renderer.get_frame(transition['job_id'], index)
+            if frame is not None:
+                self.blit_transition_frame(frame)
+                transition['index'] = index
+                transition['shown'] += 1
+
+        # 最後のフレームまで表示したか、大幅に遅れている場合は次のスライドを表示して終了する
+        if transition['index'] >= planned - 1 or elapsed >= duration * 2:
+            self._transition = None
+            self.transition_renderer.record_result(transition['shown'], planned)
+            self.display_image(transition['image'])
+            return
+        self.transition_after_id = self.after(max(1, int(self.transition_duration / planned)), self.step_transition)
+
+    def blit_transition_frame(self, frame):
+        """中間フレーム（RGB の NumPy 配列）を切り替え効果用の PhotoImage に書き込んで表示します。"""
+        img = Image.fromarray(frame)
+        if self.transition_photo is None or (self.transition_photo.width(), self.transition_photo.height()) != img.size:
+            self.transition_photo = ImageTk.PhotoImage(img)
+        else:
+            self.transition_photo.paste(img)
+        self.set_canvas_photo(self.transition_photo)
+
+    def cancel_transition(self):
+        """実行中の切り替え効果を中止し、次のスライドをそのまま表示します。"""
+        if self.transition_after_id:
+            self.after_cancel(self.transition_after_id)
+            self.transition_after_id = None
+        transition = self._transition
+        self._transition = None
+        if transition is not None and self.winfo_exists():
+            self.display_image(transition['image'])
+
     def show_photo(self):
+        # 撮影やアップロードで追加された写真を反映する
+        self.reload_photos_if_changed()
+
         if not self.photos:
-            print("写真が見つかりません。フォトディレクトリに画像を追加してください。")
-            logging.warning("写真が見つかりません。フォトディレクトリに画像を追加してください。")
-            self.parent.destroy()
+            if not self._warned_no_photos:
+                logging.warning("写真が見つかりません。フォトディレクトリに画像を追加してください。")
+                self._warned_no_photos = True
+            # 写真が追加されるまで待つ
+            self.after_id = self.after(self.interval, self.show_photo)
             return
+        self._warned_no_photos = False
 
         photo_path = self.photos[self.current]
-        print(f"次に表示する写真のパス: {photo_path}")
-        logging.debug(f"次に表示する写真のパス: {photo_path}")
+        started = time.monotonic()
 
         try:
-            img = Image.open(photo_path)
-            print(f"写真を開きました: {photo_path} (元のサイズ: {img.size})")
-            logging.debug(f"写真を開きました: {photo_path} (元のサイズ: {img.size})")
-
-            # 画面サイズを取得（Tkinterから）
-            screen_width = self.parent.winfo_screenwidth()
-            screen_height = self.parent.winfo_screenheight()
-            print(f"再度画面サイズを取得しました: {screen_width}x{screen_height}")
-            logging.debug(f"再度画面サイズを取得しました: {screen_width}x{screen_height}")
-
-            # 画像の元のサイズを取得
-            img_width, img_height = img.size
-
-            # スケーリングファクターを計算
-            scale_w = screen_width / img_width
-            scale_h = screen_height / img_height
-            scale = min(scale_w, scale_h)
-            print(f"スケーリングファクター: 幅={scale_w}, 高さ={scale_h}, 使用スケール={scale}")
-            logging.debug(f"スケーリングファクター: 幅={scale_w}, 高さ={scale_h}, 使用スケール={scale}")
-
-            # 新しいサイズを計算
-            new_width = int(img_width * scale)
-            new_height = int(img_height * scale)
-            print(f"リサイズ後の画像サイズ: {new_width}x{new_height}")
-            logging.debug(f"リサイズ後の画像サイズ: {new_width}x{new_height}")
-
-            # 画像をリサイズ
-            img = img.resize((new_width, new_height), Image.LANCZOS)
-            print("画像をリサイズしました。")
-            logging.debug("画像をリサイズしました。")
-
-            # Tkinter用のPhotoImageに変換
-            photo = ImageTk.PhotoImage(img)
-            print("PhotoImageに変換しました。")
-            logging.debug("PhotoImageに変換しました。")
-
-            # Canvas上の既存の画像を削除
-            self.canvas.delete("all")
-            print("Canvas上の既存の画像を削除しました。")
-            logging.debug("Canvas上の既存の画像を削除しました。")
-
-            # 黒い背景画像を再描画
-            self.canvas.create_image(0, 0, anchor='nw', image=self.background_photo)
-            print("Canvasに黒い背景画像を再描画しました。")
-            logging.debug("Canvasに黒い背景画像を再描画しました。")
-
-            # 画像を中央に配置
-            x_center = screen_width // 2
-            y_center = screen_height // 2
-            self.canvas.create_image(x_center, y_center, image=photo, anchor='center')
-            self.canvas.image = photo  # 参照を保持
-            print(f"画像をCanvasの中央に配置しました: ({x_center}, {y_center})")
-            logging.debug(f"画像をCanvasの中央に配置しました: ({x_center}, {y_center})")
+            # 先読み済みであればそれを使い、まだの場合はその場で読み込む
+            img = self.prefetcher.take(photo_path)
+            if img is None:
+                load_started = time.monotonic()
+                img = load_slide(photo_path, (self.screen_width, self.screen_height), self.rendition_cache)
+                self.sync_load_counter.add(time.monotonic() - load_started)
+
+            if self.transition_renderer.enabled and self.current_image is not None:
+                self.start_transition(img)
+            else:
+                self.display_image(img)
 
         except Exception as e:
-            print(f"写真の読み込み中にエラーが発生しました: {e}")
-            logging.error(f"写真の読み込み中にエラーが発生しました: {e}")
+            logging.error(f"写真の読み込み中にエラーが発生しました: {photo_path}: {e}")
 
         self.current = (self.current + 1) % len(self.photos)
-        print(f"次の写真に切り替えます: インデックス={self.current}")
-        logging.debug(f"次の写真に切り替えます: インデックス={self.current}")
+        self.slide_counter.add(time.monotonic() - started)
+
+        # 表示中に次の写真を先読みする
+        self.prefetcher.prefetch(self.upcoming_photos())
 
         # after_idにタイマーIDを保存
         self.after_id = self.after(self.interval, self.show_photo)
@@ -0,0 +1,117 @@
+# rendition_cache.py: 画面サイズに縮小した写真をディスクにキャッシュするモジュール
+
+import hashlib
+import logging
+import os
+import threading
+from PIL import Image
+
+
+class RenditionCache:
+    """
+    画面表示用に縮小した写真（レンディション）をディレクトリに保存するキャッシュ。
+    キーは (元の写真のパス, 更新時刻, ファイルサイズ, 表示サイズ) で、元の写真が更新されると自動的に別のキーになります。
+    合計サイズが max_bytes を超えた場合は、最後に使用された時刻が古いものから削除します。
+    """
+    def __init__(self, cache_directory, max_bytes=512 * 1024 * 1024, quality=90):
+        self.cache_directory = cache_directory
+        self.max_bytes = max_bytes
+        self.quality = quality
+        self._lock = threading.Lock()
+        os.makedirs(cache_directory, exist_ok=True)
+        self._total_bytes = sum(size for _, size, _ in self._list_entries())
+        logging.debug(f"レンディションキャッシュ: {cache_directory} ({self._total_bytes} バイト)")
+
+    def _list_entries(self):
+        """キャッシュ内のファイルを (パス, サイズ, 最終使用時刻) のリストで返します。"""
+        entries = []
+        with os.scandir(self.cache_directory) as it:
+            for entry in it:
+                if not entry.is_file() or not entry.name.endswith('.jpg'):
+                    continue
+                try:
+                    stat = entry.stat()
+                except OSError:
+                    continue
+                entries.append((entry.path, stat.st_size, stat.st_mtime))
+        return entries
+
+    def cache_path(self, source_path, size, stat=None):
+        """
+        元の写真と表示サイズに対応するキャッシュファイルのパスを返します。
+        元の写真が存在しない場合は None を返します。
+        stat を指定した場合は元の写真を stat せずにその値を使います（写真を配置する前にキャッシュを作成する場合）。
+        """
+        if stat is None:
+            try:
+                stat = os.stat(source_path)
+            except OSError:
+                return None
+        key = f"{os.path.abspath(source_path)}|{stat.st_mtime_ns}|{stat.st_size}|{size[0]}x{size[1]}"
+        return os.path.join(self.cache_directory, hashlib.sha1(key.encode('utf-8')).hexdigest() + '.jpg')
+
+    def contains(self, source_path, size):
+        path = self.cache_path(source_path, size)
+        return path is not None and os.path.exists(path)
+
+    def load(self, source_path, size):
+        """
+        キャッシュされたレンディションを読み込みます。キャッシュにない場合は None を返します。
+        """
+        path = self.cache_path(source_path, size)
+        if path is None:
+            return None
+        try:
+            with Image.open(path) as img:
+                img.load()
+                rendition = img.copy() if img.mode in ('RGB', 'L') else img.convert('RGB')
+        except (OSError, ValueError):
+            return None
+
+        # LRU のために最終使用時刻（mtime）を更新する
+        try:
+            os.utime(path)
+        except OSError:
+            pass
+        return rendition
+
+    def store(self, source_path, size, img, stat=None):
+        """レンディションをキャッシュに保存し、上限を超えた場合は古いものを削除します。"""
+        path = self.cache_path(source_path, size, stat)
+        if path is None:
+            return
+        if img.mode not in ('RGB', 'L'):
+            img = img.convert('RGB')
+
+        temp_path = f"{path}.{threading.get_ident()}.tmp"
+        try:
+            img.save(temp_path, 'JPEG', quality=self.quality)
+            os.replace(temp_path, path)
+        except OSError as e:
+            logging.error(f"レンディションの保存に失敗しました: {source_path}: {e}")
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
+            return
+
+        with self._lock:
+            self._total_bytes += os.path.getsize(path)
+            if self._total_bytes > self.max_bytes:
+                self._evict()
+
+    def _evict(self):
+        """合計サイズが上限の 9 割以下になるまで古いレンディションを削除します（ロック取得済みで呼び出すこと）。"""
+        entries = sorted(self._list_entries(), key=lambda entry: entry[2])
+        total = sum(size for _, size, _ in entries)
+        target = self.max_bytes * 0.9
+        removed = 0
+        for path, size, _ in entries:
+            if total <= target:
+                break
+            try:
+                os.remove(path)
+            except OSError:
+                continue
+            total -= size
+            removed += 1
+        self._total_bytes = total
+        logging.debug(f"レンディションキャッシュから {removed} 件を削除しました ({total} バイト)")
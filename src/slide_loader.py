@@ -0,0 +1,207 @@
+# slide_loader.py: スライドショーの写真をバックグラウンドで先読みするモジュール
+
+import logging
+import threading
+from collections import OrderedDict
+from PIL import Image
+
+
+def fit_size(image_size, screen_size):
+    """画像を画面に収まるように縮小・拡大したときのサイズを返します。"""
+    img_width, img_height = image_size
+    screen_width, screen_height = screen_size
+    scale = min(screen_width / img_width, screen_height / img_height)
+    return max(1, int(img_width * scale)), max(1, int(img_height * scale))
+
+
+def load_slide(photo_path, screen_size, rendition_cache=None):
+    """
+    写真を開いて画面サイズに合わせてリサイズします。
+    JPEG の場合は DCT スケーリングを使い、表示サイズ以上で最も小さい 1/2, 1/4, 1/8 の解像度で
+    直接デコードしてから最終的なリサイズを行います。
+
+    :param photo_path: 写真のパス
+    :param screen_size: 画面サイズ (幅, 高さ)
+    :param rendition_cache: RenditionCache。指定した場合は縮小済みの写真をキャッシュから読み込み、なければ保存する
+    :return: 表示用にリサイズされた PIL.Image
+    """
+    if rendition_cache is not None:
+        img = rendition_cache.load(photo_path, screen_size)
+        if img is not None:
+            return img
+
+    with Image.open(photo_path) as img:
+        new_size = fit_size(img.size, screen_size)
+        if img.format == 'JPEG':
+            # デコード前に縮小率を指定する（フル解像度でのデコードを避け、時間とメモリを節約）
+            img.draft(img.mode, new_size)
+        slide = img.resize(new_size, Image.LANCZOS)
+
+    if rendition_cache is not None:
+        rendition_cache.store(photo_path, screen_size, slide)
+    return slide
+
+
+def image_nbytes(img):
+    """PIL.Image が使用するおおよそのメモリ量（バイト）を返します。"""
+    return img.width * img.height * len(img.getbands())
+
+
+class SlidePrefetcher:
+    """
+    次に表示する写真をバックグラウンドで読み込み、画面サイズにリサイズしてキャッシュします。
+    キャッシュは先読みする枚数（depth）と合計メモリ量（max_bytes）で制限されます。
+
+    rendition_cache を指定した場合、先読みする写真がないときに warm_up で指定された写真の
+    レンディションを順に作成します。
+    """
+    def __init__(self, screen_size, depth=2, max_bytes=64 * 1024 * 1024, loader=None, rendition_cache=None):
+        self.screen_size = screen_size
+        self.depth = depth
+        self.max_bytes = max_bytes
+        self.rendition_cache = rendition_cache
+        self.loader = loader or self._load_slide
+        self._warm_up_paths = []  # レンディションを作成する写真のパス
+
+        self._cache = OrderedDict()  # パス -> リサイズ済みの PIL.Image
+        self._cache_bytes = 0
+        self._wanted = []  # 先読みする写真のパス（表示順）
+        self._condition = threading.Condition()
+        self._thread = None
+        self._stopped = False
+
+    def start(self):
+        """先読みスレッドを開始します。"""
+        with self._condition:
+            if self._thread is not None and self._thread.is_alive():
+                return
+            self._stopped = False
+            self._thread = threading.Thread(target=self._run, name="SlidePrefetcher", daemon=True)
+            self._thread.start()
+        logging.debug("写真の先読みスレッドを開始しました。")
+
+    def stop(self):
+        """先読みスレッドを停止し、キャッシュを破棄します。"""
+        with self._condition:
+            self._stopped = True
+            thread = self._thread
+            self._thread = None
+            self._cache.clear()
+            self._cache_bytes = 0
+            self._condition.notify_all()
+        if thread is not None:
+            thread.join(timeout=2.0)
+        logging.debug("写真の先読みスレッドを停止しました。")
+
+    def prefetch(self, photo_paths):
+        """
+        次に表示する写真を表示順に指定します。先頭から depth 枚を先読みし、
+        リストに含まれない写真はキャッシュから破棄します。
+        """
+        wanted = list(photo_paths)[:self.depth]
+        with self._condition:
+            self._wanted = wanted
+            for path in list(self._cache):
+                if path not in wanted:
+                    self._evict(path)
+            self._condition.notify_all()
+
+    def warm_up(self, photo_paths):
+        """先読みの合間にレンディションを作成する写真を指定します。"""
+        if self.rendition_cache is None:
+            return
+        with self._condition:
+            self._warm_up_paths = list(photo_paths)
+            self._condition.notify_all()
+
+    def _load_slide(self, photo_path, screen_size):
+        return load_slide(photo_path, screen_size, self.rendition_cache)
+
+    def take(self, photo_path):
+        """
+        先読み済みの写真をキャッシュから取り出します。まだ読み込まれていない場合は None を返します。
+        """
+        with self._condition:
+            if photo_path in self._wanted:
+                self._wanted.remove(photo_path)
+            img = self._cache.pop(photo_path, None)
+            if img is not None:
+                self._cache_bytes -= image_nbytes(img)
+                self._condition.notify_all()
+            return img
+
+    def set_screen_size(self, screen_size):
+        """画面サイズを変更し、古いサイズで読み込んだ写真を破棄します。"""
+        with self._condition:
+            if screen_size == self.screen_size:
+                return
+            self.screen_size = screen_size
+            self._cache.clear()
+            self._cache_bytes = 0
+            self._condition.notify_all()
+
+    def _evict(self, path):
+        img = self._cache.pop(path)
+        self._cache_bytes -= image_nbytes(img)
+
+    def _next_path(self):
+        """次に読み込む写真のパスを返します（ロック取得済みで呼び出すこと）。"""
+        if self._cache_bytes >= self.max_bytes:
+            return None
+        for path in self._wanted:
+            if path not in self._cache:
+                return path
+        return None
+
+    def _next_task(self):
+        """
+        次の処理を (種類, パス) で返します（ロック取得済みで呼び出すこと）。
+        先読みを優先し、先読みする写真がない場合はレンディションの作成を行います。
+        """
+        path = self._next_path()
+        if path is not None:
+            return 'prefetch', path
+        if self._warm_up_paths:
+            return 'warm_up', self._warm_up_paths.pop(0)
+        return None
+
+    def _warm_up(self, path, screen_size):
+        if self.rendition_cache.contains(path, screen_size):
+            return
+        try:
+            load_slide(path, screen_size, self.rendition_cache)
+        except Exception as e:
+            logging.debug(f"レンディションを作成できませんでした: {path}: {e}")
+
+    def _run(self):
+        while True:
+            with self._condition:
+                task = self._next_task()
+                while task is None and not self._stopped:
+                    self._condition.wait()
+                    task = self._next_task()
+                if self._stopped:
+                    return
+                kind, path = task
+                screen_size = self.screen_size
+
+            if kind == 'warm_up':
+                self._warm_up(path, screen_size)
+                continue
+
+            try:
+                img = self.loader(path, screen_size)
+            except Exception as e:
+                logging.error(f"写真の先読み中にエラーが発生しました: {path}: {e}")
+                with self._condition:
+                    # 読み込めない写真は先読み対象から外す
+                    if path in self._wanted:
+                        self._wanted.remove(path)
+                continue
+
+            with self._condition:
+                # 読み込み中に不要になった場合や画面サイズが変わった場合は破棄する
+                if self._stopped or path not in self._wanted or screen_size != self.screen_size:
+                    continue
+                self._cache[path] = img
+                self._cache_bytes += image_nbytes(img)
@@ -1,6 +1,7 @@
 # smile_detection.py
 
 import cv2
+import math
 import time
 import logging
 import os
@@ -9,53 +10,125 @@ import numpy as np
 import tkinter as tk
 from tkinter import ttk
 from PIL import Image, ImageFont, ImageTk
-from utils import load_config, setup_logging, get_timestamp
+from utils import load_config, setup_logging, get_timestamp, FpsCounter
 from photo_capture import CameraHandler  # CameraHandler をインポート
+from detection_worker import DetectionWorker, DetectionResult, FACE_CASCADE_FILE, SMILE_CASCADE_FILE
+from detection_worker import detect_faces_and_smiles, smile_score
+from burst_capture import BurstCapture
+from frame_buffer import FrameRingBuffer
+from photo_writer import PhotoWriter
+from camera_session import CameraSession
+from text_overlay import draw_text
+
+# 笑顔を検出してから写真を撮影するまでの待ち時間（ミリ秒）
+CAPTURE_DELAY_MS = 1000
 
 def put_japanese_text(img, text, position, font, color=(0, 255, 0)):
     """
-    Pillowを使用して画像に日本語テキストを描画し、OpenCV形式に変換します。
+    画像に日本語テキストを描画します。
+    テキストは一度だけラスタライズしてキャッシュし、テキストの領域だけをアルファブレンドします。
 
-    :param img: OpenCV形式の画像（BGR）
+    :param img: OpenCV形式の画像（BGR）。この画像に直接描画されます
     :param text: 描画するテキスト（日本語可）
     :param position: テキストの位置（x, y）
     :param font: PIL.ImageFont インスタンス
     :param color: テキストの色（BGR）
-    :return: テキストが描画されたOpenCV形式の画像
+    :return: テキストが描画されたOpenCV形式の画像（img と同じオブジェクト）
     """
-    import numpy as np
-    from PIL import Image, ImageDraw
-
-    # OpenCVの画像をRGBに変換
-    img_rgb = cv2.cvtColor(img, cv2.COLOR_BGR2RGB)
-    pil_img = Image.fromarray(img_rgb)
-    draw = ImageDraw.Draw(pil_img)
-
-    # テキストの描画
-    draw.text(position, text, font=font, fill=color[::-1])  # PillowはRGB、OpenCVはBGRなので色を反転
-
-    # Pillow画像をOpenCV形式に変換
-    img_with_text = cv2.cvtColor(np.array(pil_img), cv2.COLOR_RGB2BGR)
-    return img_with_text
+    return draw_text(img, text, position, font, color)
 
 class SmileDetectionCameraHandler(CameraHandler):
-    def __init__(self, camera_index=0, countdown_time=3, preview_time=3, photo_directory='photos'):
-        super().__init__(camera_index, countdown_time, preview_time, photo_directory)
+    def __init__(self, camera_index=0, countdown_time=3, preview_time=3, photo_directory='photos',
+                 detection_executor='thread', detection_width=None, smile_roi_width=None,
+                 tracking_frames=0, tracking_margin=0.5, preroll_seconds=1.0, camera_fps=30,
+                 jpeg_quality=95, write_queue_size=8, burst_frames=0, burst_keep=3, display_geometry=None,
+                 frame_buffer_max_mb=128):
+        # 撮影時にUIスレッドを止めないよう、写真の保存はバックグラウンドで行う
+        photo_writer = PhotoWriter(jpeg_quality=jpeg_quality, max_queue_size=write_queue_size)
+        super().__init__(camera_index, countdown_time, preview_time, photo_directory, photo_writer=photo_writer,
+                         display_geometry=display_geometry)
 
         # Haar Cascade ディレクトリの取得
         self.haarcascades_path = self.get_haarcascades_path()
 
         # カスケードのロード
-        self.face_cascade = self.load_cascade('haarcascade_frontalface_default.xml')
-        self.smile_cascade = self.load_cascade('haarcascade_smile.xml')
+        self.face_cascade = self.load_cascade(FACE_CASCADE_FILE)
+        self.smile_cascade = self.load_cascade(SMILE_CASCADE_FILE)
+
+        # 検出ワーカー（UIスレッドとは別に検出を実行）
+        self.detection_worker = DetectionWorker(
+            self.face_cascade,
+            self.smile_cascade,
+            self.haarcascades_path,
+            executor_type=detection_executor,
+            detection_width=detection_width,
+            smile_roi_width=smile_roi_width,
+            tracking_frames=tracking_frames,
+            tracking_margin=tracking_margin
+        )
+
+        # 直近のフレームを保持するリングバッファ（撮影時に最も良い笑顔のフレームを選ぶ）
+        self.preroll_seconds = preroll_seconds  # 笑顔検出より前に遡って候補にする秒数
+        buffer_seconds = preroll_seconds + CAPTURE_DELAY_MS / 1000.0 + 0.5
+        # フル解像度のフレームを保持するため、メモリ量の上限を超える場合は保持する枚数（遡れる時間）を減らす
+        self.frame_buffer = FrameRingBuffer(max(1, int(math.ceil(buffer_seconds * camera_fps))),
+                                            max_bytes=frame_buffer_max_mb * 1024 * 1024 if frame_buffer_max_mb else None)
+        self.add_frame_listener(self.frame_buffer.push)
+        self.detection_worker.add_result_listener(self.on_detection_result)
+
+        # 連写（burst_frames が 0 の場合は無効）
+        self.burst = None
+        if burst_frames > 0:
+            # 評価スレッドは検出ワーカーと並行して動くため、専用のカスケードを使用する
+            self.burst_face_cascade = self.load_cascade(FACE_CASCADE_FILE)
+            self.burst_smile_cascade = self.load_cascade(SMILE_CASCADE_FILE)
+            self.burst = BurstCapture(self, burst_frames, burst_keep, smile_scorer=self.score_burst_frame)
 
         # フォントのロード
         self.font_path = self.get_font_path()
         self.font_size = 48  # フォントサイズを調整
         self.font = self.load_font(self.font_path, self.font_size)
+        self.overlay_font = self.font  # カウントダウン表示にも同じフォントを使用
 
         logging.info("SmileDetectionCameraHandler の初期化が完了しました。")
 
+    def release_camera(self):
+        if self.burst is not None:
+            self.burst.cancel()
+        super().release_camera()
+        self.detection_worker.shutdown()
+        self.photo_writer.stop()  # 保存待ちの写真を書き出してから停止
+
+    def on_detection_result(self, result):
+        """検出結果の笑顔スコアをリングバッファのフレームに記録します。"""
+        self.frame_buffer.set_score(result.frame_id, smile_score(result))
+
+    def score_burst_frame(self, frame):
+        """連写したフレームの笑顔スコアを計算します（連写の評価スレッドから呼び出されます）。"""
+        faces, smiles = detect_faces_and_smiles(
+            frame,
+            self.burst_face_cascade,
+            self.burst_smile_cascade,
+            self.detection_worker.detection_width,
+            self.detection_worker.smile_roi_width
+        )
+        return smile_score(DetectionResult(0, 0.0, faces, smiles))
+
+    def select_best_frame(self, trigger_time):
+        """
+        笑顔を検出した時刻の前後から最も笑顔スコアの高いフレームを選びます。
+        リングバッファに候補がない場合は最新のフレームを返します。
+        """
+        best = self.frame_buffer.best_frame(
+            trigger_time - self.preroll_seconds, time.time(), reference_time=trigger_time
+        )
+        if best is None:
+            logging.warning("リングバッファに候補のフレームがないため、最新のフレームを使用します。")
+            return self.get_latest_frame()[2]
+        frame_id, frame_time, frame, score = best
+        logging.info(f"撮影するフレームを選択しました: ID={frame_id}, 検出からの時間={frame_time - trigger_time:+.2f}秒, スコア={score:.2f}")
+        return frame
+
     def get_haarcascades_path(self):
         """
         Haar Cascade のパスを取得します。
@@ -116,20 +189,29 @@ class SmileDetectionCameraHandler(CameraHandler):
 
 
 class SmileDetectionFrame(tk.Frame):
-    def __init__(self, parent, camera_handler: SmileDetectionCameraHandler, *args, **kwargs):
+    def __init__(self, parent, camera_handler: SmileDetectionCameraHandler, camera_session=None, *args, **kwargs):
+        """
+        :param camera_session: アプリケーションが所有する CameraSession。
+                               指定した場合、フレームの破棄時にカメラを閉じずにアイドル状態にする
+        """
         super().__init__(parent, *args, **kwargs)
         self.parent = parent
         self.camera_handler = camera_handler
+        self._owns_camera_session = camera_session is None
+        self.camera_session = camera_session or CameraSession(camera_handler)
 
-        # カメラの初期化
-        if not self.camera_handler.initialize_camera():
-            logging.error("カメラの初期化に失敗しました。アプリケーションを終了します。")
-            parent.destroy()
-            return
+        self.paused = True
+        self.update_after_id = None
+        self.capture_after_id = None
+        self.resume_after_id = None  # 撮影後に笑顔検出を再開するタイマー
 
-        # カスケードの設定
-        self.face_cascade = self.camera_handler.face_cascade
-        self.smile_cascade = self.camera_handler.smile_cascade
+        self.last_frame_id = 0  # 最後に描画したフレームのID
+        self.render_fps_counter = FpsCounter(window=5.0)
+        self.render_fps = 0.0  # 実測の描画FPS
+
+        # 検出ワーカーの設定
+        self.detection_worker = self.camera_handler.detection_worker
+        self.detection_resume_time = 0.0  # この時刻以降のフレームの検出結果のみを使用
 
         # フォント設定
         self.font = self.camera_handler.font
@@ -138,6 +220,11 @@ class SmileDetectionFrame(tk.Frame):
         self.image_label = ttk.Label(self)
         self.image_label.pack(fill=tk.BOTH, expand=True)
 
+        # 表示用バッファ（表示サイズが変わったときだけ作り直す）
+        self.display_buffer = None  # 表示サイズに縮小したフレーム（BGR）
+        self.display_rgb = None  # display_buffer を RGB に変換したもの
+        self.display_image = None  # 使い回す PhotoImage
+
         # ステータス表示ラベル
         self.status_label = ttk.Label(self, text="笑顔を検出しています...", font=("Arial", 16))
         self.status_label.pack(side=tk.BOTTOM, pady=10)
@@ -151,10 +238,59 @@ class SmileDetectionFrame(tk.Frame):
 
         # フラグ: 現在キャプチャ中かどうか
         self.is_capturing = False
+        self.awaiting_capture = False  # 笑顔を検出してから撮影するまでの間かどうか
+        self.trigger_time = 0.0  # 撮影のきっかけとなった笑顔のフレームの取得時刻
         self.stop_preview = False
 
-        # プレビュー更新開始
-        self.after(0, self.update_frame)
+        # カメラを使用中にしてプレビュー更新開始
+        if not self.resume():
+            logging.error("カメラの初期化に失敗しました。アプリケーションを終了します。")
+            parent.destroy()
+
+    def resume(self):
+        """
+        カメラを使用中にし、プレビューと笑顔検出を再開します。
+
+        :return: カメラを使用できた場合は True
+        """
+        if not self.paused:
+            return True
+        # キャプチャスレッドを開始（UIスレッドでは cap.read() を呼ばない）
+        if not self.camera_session.acquire():
+            self.status_label.config(text="カメラを使用できません。")
+            return False
+        self.paused = False
+        self.stop_preview = False
+        self.last_frame_id = 0
+        # 一時停止前のフレームに対する検出結果では撮影しない
+        self.detection_resume_time = time.time()
+        self.status_label.config(text="笑顔を検出しています...")
+        self.update_after_id = self.after(0, self.update_frame)
+        logging.debug("笑顔検出を再開しました。")
+        return True
+
+    def pause(self):
+        """
+        プレビューの更新と撮影の予約を止め、カメラをアイドル状態にします。
+        フレームは破棄されないため、resume() ですぐに再開できます。
+        """
+        if self.paused:
+            return
+        self.paused = True
+        self.stop_preview = True
+        # 撮影後の再開タイマーも止め、一時停止中に is_capturing が戻されないようにする
+        for after_id in (self.update_after_id, self.capture_after_id, self.resume_after_id):
+            if after_id:
+                self.after_cancel(after_id)
+        self.update_after_id = None
+        self.capture_after_id = None
+        self.resume_after_id = None
+        self.is_capturing = False
+        self.awaiting_capture = False
+        if self.camera_handler.burst is not None:
+            self.camera_handler.burst.cancel()
+        self.camera_session.release()
+        logging.debug("笑顔検出を一時停止しました。")
 
     def on_resize(self, event):
         """ウィンドウのサイズ変更に対応"""
@@ -165,63 +301,99 @@ class SmileDetectionFrame(tk.Frame):
         if getattr(self, 'stop_preview', False):
             return
 
+        frame_id, frame_time, frame = self.camera_handler.get_latest_frame()
+        if frame is None or frame_id == self.last_frame_id:
+            # 新しいフレームがまだ届いていないため、少し待って再確認
+            self.update_after_id = self.after(10, self.update_frame)
+            return
+        self.last_frame_id = frame_id
+
         try:
-            ret, frame = self.camera_handler.cap.read()
-            if not ret:
-                logging.error("フレームを取得できませんでした。")
-                self.after(100, self.update_frame)  # 少し待って再試行
-                return
-
-            if not self.is_capturing:
-                gray_frame = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
-                faces = self.face_cascade.detectMultiScale(gray_frame, 1.3, 5)
-
-                smile_detected = False
-
-                for (x, y, w, h) in faces:
-                    cv2.rectangle(frame, (x, y), (x + w, y + h), (255, 0, 0), 2)
-                    roi_gray = gray_frame[y:y + h, x:x + w]
-                    smiles = self.smile_cascade.detectMultiScale(roi_gray, 1.8, 20)
+            if not self.is_capturing or self.awaiting_capture:
+                # 検出ワーカーが空いていれば最新フレームを渡す（混雑時は破棄される）
+                # 撮影待ちの間も検出を続け、撮影候補のフレームにスコアを付ける
+                self.detection_worker.submit(frame_id, frame_time, frame)
+
+            # 表示サイズに縮小してからオーバーレイを描画する（共有フレームは変更しない）
+            display = self.resize_to_display(frame)
+            scale_x = display.shape[1] / frame.shape[1]
+            scale_y = display.shape[0] / frame.shape[0]
+
+            result = self.detection_worker.get_latest_result()
+            if not self.is_capturing and result is not None and result.timestamp >= self.detection_resume_time:
+                # 最新の検出結果を現在のフレームに重ねて描画
+                for (x, y, w, h), smiles in zip(result.faces, result.smiles):
+                    x0, y0 = int(x * scale_x), int(y * scale_y)
+                    x1, y1 = int((x + w) * scale_x), int((y + h) * scale_y)
+                    cv2.rectangle(display, (x0, y0), (x1, y1), (255, 0, 0), 2)
                     if len(smiles) > 0:
-                        smile_detected = True
-                        text_position = (x, y - 10)
+                        text_position = (x0, y0 - 10)
                         text = "笑顔を検出!"
-                        frame = put_japanese_text(frame, text, text_position, self.font, color=(0, 255, 0))
-                        break  # 笑顔を検出したらループを抜ける
+                        put_japanese_text(display, text, text_position, self.font, color=(0, 255, 0))
 
-                if smile_detected:
+                if result.smile_detected:
                     self.is_capturing = True
+                    self.awaiting_capture = True
+                    self.trigger_time = result.timestamp
+                    if self.camera_handler.burst is not None:
+                        # 笑顔を確認した時点から連写を開始する（保存はバックグラウンドで行われる）
+                        base_path = os.path.join(self.camera_handler.photo_directory, get_timestamp())
+                        self.camera_handler.burst.start(base_path)
                     self.status_label.config(text="笑顔が検出されました！写真を撮影します。")
                     # メッセージ表示後に写真撮影を開始（1秒後）
-                    self.after(1000, self.capture_image)
+                    self.capture_after_id = self.after(CAPTURE_DELAY_MS, self.capture_image)
 
-            # OpenCV の BGR から RGB に変換
-            frame_rgb = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
-            img = Image.fromarray(frame_rgb)
+            self.show_display_buffer()
 
-            # フレームのサイズに合わせて画像をリサイズ
-            img = img.resize((self.frame_width, self.frame_height), Image.ANTIALIAS)
-
-            # Pillow を使用して画像を Tkinter 用に変換
-            imgtk = ImageTk.PhotoImage(image=img)
-            self.image_label.imgtk = imgtk  # 参照を保持
-            self.image_label.configure(image=imgtk)
+            if self.render_fps_counter.tick():
+                self.render_fps = self.render_fps_counter.fps
+                logging.debug(f"カメラ取得FPS: {self.camera_handler.capture_fps:.1f}, 描画FPS: {self.render_fps:.1f}")
 
         except Exception as e:
             logging.error(f"フレームの更新中にエラーが発生しました: {e}")
 
-        # 次のフレーム更新をスケジュール
-        self.after(30, self.update_frame)  # 約33fps
+        # 次のフレーム更新をスケジュール（新しいフレームがあれば即座に描画される）
+        self.update_after_id = self.after(10, self.update_frame)
+
+    def resize_to_display(self, frame):
+        """
+        フレームを表示サイズに縮小して表示用バッファに書き込みます。
+        表示サイズが変わった場合のみバッファと PhotoImage を作り直します。
+        """
+        width = max(1, self.frame_width)
+        height = max(1, self.frame_height)
+        if self.display_buffer is None or self.display_buffer.shape[:2] != (height, width):
+            self.display_buffer = np.empty((height, width, 3), dtype=np.uint8)
+            self.display_rgb = np.empty((height, width, 3), dtype=np.uint8)
+            self.display_image = ImageTk.PhotoImage('RGB', (width, height))
+            self.image_label.configure(image=self.display_image)
+            logging.debug(f"表示用バッファを作成しました: {width}x{height}")
+
+        # ライブプレビューなので高速な補間を使用
+        cv2.resize(frame, (width, height), dst=self.display_buffer, interpolation=cv2.INTER_LINEAR)
+        return self.display_buffer
+
+    def show_display_buffer(self):
+        """表示用バッファの内容を使い回している PhotoImage に反映します。"""
+        cv2.cvtColor(self.display_buffer, cv2.COLOR_BGR2RGB, dst=self.display_rgb)
+        self.display_image.paste(Image.fromarray(self.display_rgb))
 
     def capture_image(self):
+        self.capture_after_id = None
+        self.awaiting_capture = False
+        if self.camera_handler.burst is not None:
+            self.show_burst_result()
+            return
+
         try:
-            ret, frame = self.camera_handler.cap.read()
-            if ret:
+            # 新たにカメラから読み込まず、リングバッファから最も良い笑顔のフレームを選ぶ
+            frame = self.camera_handler.select_best_frame(self.trigger_time)
+            if frame is not None:
                 timestamp = get_timestamp()
                 filename = f"{timestamp}.jpg"
                 save_path = os.path.join(self.camera_handler.photo_directory, filename)
-                cv2.imwrite(save_path, frame)
-                logging.info(f"画像が保存されました: {save_path}")
+                # エンコードと書き込みはバックグラウンドで行い、プレビューはメモリ上のフレームを使う
+                self.camera_handler.save_photo(frame, save_path)
 
                 # 撮影された画像のプレビュー表示（オプション）
                 self.preview_captured_image(frame)
@@ -237,11 +409,29 @@ class SmileDetectionFrame(tk.Frame):
             self.after(2000, lambda: self.status_label.config(text="笑顔を検出しています..."))
         finally:
             # 3秒後に笑顔検出を再開
-            self.after(3000, self.resume_detection)
+            self.resume_after_id = self.after(3000, self.resume_detection)
+
+    def show_burst_result(self):
+        """連写の結果をプレビュー表示します。連写の保存はバックグラウンドで行われます。"""
+        try:
+            frame = self.camera_handler.burst.get_best_frame()
+            if frame is None:
+                # 評価が終わっていない場合はリングバッファの候補を表示する
+                frame = self.camera_handler.select_best_frame(self.trigger_time)
+            if frame is not None:
+                self.preview_captured_image(frame)
+            self.status_label.config(text="撮影完了！3秒間お待ちください。")
+        except Exception as e:
+            logging.error(f"連写結果の表示中にエラーが発生しました: {e}")
+        finally:
+            self.resume_after_id = self.after(3000, self.resume_detection)
 
     def resume_detection(self):
         """笑顔検出を再開します"""
+        self.resume_after_id = None
         self.is_capturing = False
+        # 撮影前のフレームに対する検出結果で再び撮影しないようにする
+        self.detection_resume_time = time.time()
         self.status_label.config(text="笑顔を検出しています...")
 
     def preview_captured_image(self, frame):
@@ -253,7 +443,7 @@ class SmileDetectionFrame(tk.Frame):
             # OpenCV の BGR から RGB に変換
             frame_rgb = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
             img = Image.fromarray(frame_rgb)
-            img = img.resize((400, 300), Image.ANTIALIAS)  # プレビュー用にリサイズ
+            img = img.resize((400, 300), Image.LANCZOS)  # プレビュー用にリサイズ
             imgtk = ImageTk.PhotoImage(image=img)
 
             label = ttk.Label(window, image=imgtk)
@@ -266,9 +456,11 @@ class SmileDetectionFrame(tk.Frame):
             logging.error(f"プレビュー表示中にエラーが発生しました: {e}")
 
     def destroy(self):
-        self.stop_preview = True
-        self.camera_handler.release_camera()
-        logging.info("カメラをリリースしました。")
+        # 次に撮影モードに戻ったときにすぐ再開できるよう、カメラは開いたままにする
+        self.pause()
+        if self._owns_camera_session:
+            self.camera_session.close()
+            logging.info("カメラをリリースしました。")
         super().destroy()
 
 def main():
@@ -312,12 +504,26 @@ def main():
 
     # カメラハンドラーのインスタンスを作成
     camera_config = config.get('camera', {})
+    detection_config = config.get('detection', {})
+    burst_config = config.get('burst', {})
     try:
         camera_handler = SmileDetectionCameraHandler(
             camera_index=camera_config.get('index', 0),
             countdown_time=camera_config.get('countdown_time', 3),
             preview_time=camera_config.get('preview_time', 3),
-            photo_directory=photo_directory
+            photo_directory=photo_directory,
+            detection_executor=detection_config.get('executor', 'thread'),
+            detection_width=detection_config.get('width'),
+            smile_roi_width=detection_config.get('smile_roi_width'),
+            tracking_frames=detection_config.get('tracking_frames', 0),
+            tracking_margin=detection_config.get('tracking_margin', 0.5),
+            preroll_seconds=camera_config.get('preroll_seconds', 1.0),
+            frame_buffer_max_mb=camera_config.get('frame_buffer_max_mb', 128),
+            camera_fps=camera_config.get('fps', 30),
+            jpeg_quality=camera_config.get('jpeg_quality', 95),
+            write_queue_size=camera_config.get('write_queue_size', 8),
+            burst_frames=burst_config.get('frames', 0) if burst_config.get('enabled', False) else 0,
+            burst_keep=burst_config.get('keep', 3)
         )
     except Exception as e:
         logging.error(f"カメラハンドラーの初期化に失敗しました: {e}")
@@ -0,0 +1,101 @@
+# text_overlay.py: 文字列を一度だけラスタライズしてキャッシュし、フレームに高速に重ねるモジュール
+
+import threading
+from collections import OrderedDict
+
+import numpy as np
+from PIL import Image, ImageDraw
+
+
+class TextSprite:
+    """
+    ラスタライズ済みの文字列。アルファブレンドに必要な値を事前計算して保持します。
+    """
+    def __init__(self, mask, offset, color):
+        """
+        :param mask: 文字の形状を表すアルファマスク（uint8, 高さ x 幅）
+        :param offset: 描画位置からマスク左上までのオフセット (dx, dy)
+        :param color: 文字の色（BGR）
+        """
+        alpha = mask.astype(np.uint16)[:, :, np.newaxis]
+        self.offset = offset
+        self.height, self.width = mask.shape
+        self.inverse_alpha = 255 - alpha
+        self.color_term = alpha * np.array(color, dtype=np.uint16)
+
+    def blend(self, img, position):
+        """
+        スプライトを画像（BGR, uint8）の指定位置に直接アルファブレンドします。
+        画像の外にはみ出した部分は描画しません。
+        """
+        x = position[0] + self.offset[0]
+        y = position[1] + self.offset[1]
+        img_height, img_width = img.shape[:2]
+
+        x0, y0 = max(x, 0), max(y, 0)
+        x1, y1 = min(x + self.width, img_width), min(y + self.height, img_height)
+        if x0 >= x1 or y0 >= y1:
+            return
+
+        sx0, sy0 = x0 - x, y0 - y
+        sx1, sy1 = sx0 + (x1 - x0), sy0 + (y1 - y0)
+        roi = img[y0:y1, x0:x1]
+        blended = roi * self.inverse_alpha[sy0:sy1, sx0:sx1] + self.color_term[sy0:sy1, sx0:sx1]
+        roi[:] = (blended + 127) // 255
+
+
+class TextOverlayCache:
+    """
+    (文字列, フォント, 色) ごとに TextSprite をキャッシュします。
+    描画コストはフレームサイズではなく文字列の大きさに比例します。
+    """
+    def __init__(self, max_entries=64):
+        self.max_entries = max_entries
+        self._sprites = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get_sprite(self, text, font, color, anchor='la'):
+        key = (text, font, tuple(color), anchor)
+        with self._lock:
+            sprite = self._sprites.get(key)
+            if sprite is not None:
+                self._sprites.move_to_end(key)
+                return sprite
+
+        sprite = self._rasterize(text, font, color, anchor)
+        with self._lock:
+            self._sprites[key] = sprite
+            while len(self._sprites) > self.max_entries:
+                self._sprites.popitem(last=False)
+        return sprite
+
+    @staticmethod
+    def _rasterize(text, font, color, anchor):
+        left, top, right, bottom = font.getbbox(text)
+        mask_image = Image.new('L', (max(1, right - left), max(1, bottom - top)), 0)
+        ImageDraw.Draw(mask_image).text((-left, -top), text, font=font, fill=255)
+        # 描画位置からの距離は anchor を基準にする（ビットマップフォントでは anchor は無視され左上が基準になる）
+        anchor_left, anchor_top = font.getbbox(text, anchor=anchor)[:2]
+        return TextSprite(np.array(mask_image), (anchor_left, anchor_top), color)
+
+    def draw(self, img, text, position, font, color=(0, 255, 0), anchor='la'):
+        """
+        画像に文字列を直接描画します。
+
+        :param img: OpenCV形式の画像（BGR）。この画像自体が変更されます
+        :param position: テキストの位置（x, y）。Pillow の ImageDraw.text と同じ基準
+        :param color: テキストの色（BGR）
+        :param anchor: position の基準（Pillow の anchor と同じ。'ls' で cv2.putText と同じ左端・ベースライン）
+        :return: 描画後の画像（img と同じオブジェクト）
+        """
+        self.get_sprite(text, font, color, anchor).blend(img, position)
+        return img
+
+
+# アプリケーション全体で共有するキャッシュ
+_default_cache = TextOverlayCache()
+
+
+def draw_text(img, text, position, font, color=(0, 255, 0), anchor='la'):
+    """共有キャッシュを使用して画像に文字列を直接描画します。"""
+    return _default_cache.draw(img, text, position, font, color, anchor)
@@ -0,0 +1,198 @@
+# tracing.py: ログの非同期書き込み・モジュールごとのログレベル・サンプリングカウンターを提供するモジュール
+
+import atexit
+import logging
+import logging.handlers
+import os
+import queue
+import threading
+import time
+
+LOG_FORMAT = '%(asctime)s %(levelname)s:%(module)s:%(message)s'
+
+_listener = None
+_counters = {}
+_counters_lock = threading.Lock()
+_counter_interval = 60.0
+
+
+def _parse_level(level):
+    """'DEBUG' などの文字列またはレベルの数値を、ログレベルの数値に変換します。"""
+    if isinstance(level, int):
+        return level
+    value = logging.getLevelName(str(level).upper())
+    if not isinstance(value, int):
+        raise ValueError(f"不正なログレベルです: {level}")
+    return value
+
+
+class ModuleLevelFilter(logging.Filter):
+    """
+    ログを出力したモジュール（ファイル名）ごとにログレベルを適用するフィルター。
+    このリポジトリではルートロガーに直接ログを出力しているため、ロガー名ではなく record.module で判定します。
+    """
+    def __init__(self, default_level=logging.INFO, module_levels=None):
+        super().__init__()
+        self.default_level = _parse_level(default_level)
+        self.module_levels = {name: _parse_level(level) for name, level in (module_levels or {}).items()}
+
+    @property
+    def min_level(self):
+        """いずれかのモジュールで出力されるログの最小レベル。"""
+        return min([self.default_level] + list(self.module_levels.values()))
+
+    def filter(self, record):
+        return record.levelno >= self.module_levels.get(record.module, self.default_level)
+
+
+def setup_tracing(script_dir, config=None, log_file='application.log'):
+    """
+    ログ設定を初期化します。
+    ログは logs フォルダにサイズでローテーションしながら保存され、ファイルへの書き込みは
+    QueueListener のスレッドで行われるため、呼び出し元のスレッドがディスク I/O で止まることはありません。
+
+    :param script_dir: logs フォルダを作成するディレクトリ
+    :param config: config.yaml の logging セクション（level, modules, max_bytes, backup_count, counter_interval）
+    :param log_file: ログファイル名
+    :return: 開始した QueueListener
+    """
+    global _listener, _counter_interval
+    config = config or {}
+
+    log_directory = os.path.join(script_dir, 'logs')
+    os.makedirs(log_directory, exist_ok=True)
+
+    file_handler = logging.handlers.RotatingFileHandler(
+        os.path.join(log_directory, log_file),
+        maxBytes=int(config.get('max_bytes', 1024 * 1024)),
+        backupCount=int(config.get('backup_count', 3)),
+        encoding='utf-8'
+    )
+    file_handler.setFormatter(logging.Formatter(LOG_FORMAT))
+
+    # フィルターはキューに入れる前に適用し、出力しないログでキューとスレッドを使わないようにする
+    level_filter = ModuleLevelFilter(config.get('level', 'INFO'), config.get('modules'))
+    queue_handler = logging.handlers.QueueHandler(queue.SimpleQueue())
+    queue_handler.addFilter(level_filter)
+
+    shutdown_tracing()
+    root = logging.getLogger()
+    for handler in list(root.handlers):
+        root.removeHandler(handler)
+        handler.close()
+    root.addHandler(queue_handler)
+    root.setLevel(level_filter.min_level)
+
+    _counter_interval = float(config.get('counter_interval', 60.0))
+    _listener = logging.handlers.QueueListener(queue_handler.queue, file_handler, respect_handler_level=True)
+    _listener.start()
+    return _listener
+
+
+def shutdown_tracing():
+    """キューに残っているログを書き込んでから、書き込みスレッドを停止します。"""
+    global _listener
+    listener = _listener
+    _listener = None
+    if listener is not None:
+        flush_counters()
+        listener.stop()
+        for handler in listener.handlers:
+            handler.close()
+
+
+atexit.register(shutdown_tracing)
+
+
+class TraceCounter:
+    """
+    頻繁に発生する処理をログ 1 行ずつではなく、回数と所要時間の集計として記録するカウンター。
+    interval 秒ごとに 1 回だけ集計結果を level のログとして出力します。
+    """
+    def __init__(self, name, interval=None, level=logging.INFO):
+        self.name = name
+        self.interval = interval
+        self.level = level
+        self._lock = threading.Lock()
+        self._reset(time.monotonic())
+
+    def _reset(self, now):
+        self._window_start = now
+        self.count = 0
+        self.total_seconds = 0.0
+        self.max_seconds = 0.0
+
+    def add(self, seconds=None):
+        """1 回分を記録します。seconds を指定した場合は所要時間も集計します。"""
+        now = time.monotonic()
+        with self._lock:
+            self.count += 1
+            if seconds is not None:
+                self.total_seconds += seconds
+                self.max_seconds = max(self.max_seconds, seconds)
+            interval = _counter_interval if self.interval is None else self.interval
+            if now - self._window_start < interval:
+                return
+            message = self._summary(now)
+            self._reset(now)
+        logging.log(self.level, message)
+
+    def flush(self):
+        """集計中の内容があれば出力します。"""
+        now = time.monotonic()
+        with self._lock:
+            if self.count == 0:
+                return
+            message = self._summary(now)
+            self._reset(now)
+        logging.log(self.level, message)
+
+    def _summary(self, now):
+        message = f"{self.name}: {self.count} 回 / {now - self._window_start:.0f} 秒"
+        if self.total_seconds:
+            average_ms = self.total_seconds / self.count * 1000
+            message += f" (平均 {average_ms:.1f} ms, 最大 {self.max_seconds * 1000:.1f} ms)"
+        return message
+
+
+def get_counter(name, interval=None, level=logging.INFO):
+    """名前に対応する TraceCounter を返します（同じ名前であれば同じインスタンスを返す）。"""
+    with _counters_lock:
+        counter = _counters.get(name)
+        if counter is None:
+            counter = _counters[name] = TraceCounter(name, interval, level)
+        return counter
+
+
+def flush_counters():
+    """すべてのカウンターの集計中の内容を出力します。"""
+    with _counters_lock:
+        counters = list(_counters.values())
+    for counter in counters:
+        counter.flush()
+
+
+class StartupTimer:
+    """
+    起動処理の各段階が完了した時刻を記録し、まとめてログに出力します。
+    段階はスレッドをまたいで記録できるため、開始からの経過時間で記録します。
+    """
+    def __init__(self):
+        self._start = time.monotonic()
+        self._lock = threading.Lock()
+        self.marks = []  # (段階の名前, 開始からの経過秒数)
+
+    def mark(self, name):
+        """段階の完了を記録し、開始からの経過秒数を返します。"""
+        elapsed = time.monotonic() - self._start
+        with self._lock:
+            self.marks.append((name, elapsed))
+        return elapsed
+
+    def report(self):
+        """記録した段階を経過時間順にログに出力します。"""
+        with self._lock:
+            marks = sorted(self.marks, key=lambda mark: mark[1])
+        summary = ", ".join(f"{name} {elapsed * 1000:.0f} ms" for name, elapsed in marks)
+        logging.info(f"起動時間: {summary}")
+        return summary
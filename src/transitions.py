@@ -0,0 +1,192 @@
+# transitions.py: スライドショーの切り替え効果（クロスフェード・ケン・バーンズ）の中間フレームを作成するモジュール
+
+import cv2
+import logging
+import threading
+import numpy as np
+
+TRANSITION_NONE = 'none'
+TRANSITION_CROSSFADE = 'crossfade'
+TRANSITION_KENBURNS = 'kenburns'
+TRANSITION_MODES = (TRANSITION_NONE, TRANSITION_CROSSFADE, TRANSITION_KENBURNS)
+
+
+def _to_rgb_array(img):
+    """PIL.Image を RGB の NumPy 配列に変換します。"""
+    if img.mode != 'RGB':
+        img = img.convert('RGB')
+    return np.asarray(img)
+
+
+def _place_center(canvas, image):
+    """image を canvas の中央に配置します（余白は黒）。"""
+    canvas.fill(0)
+    canvas_height, canvas_width = canvas.shape[:2]
+    height, width = image.shape[:2]
+    top = (canvas_height - height) // 2
+    left = (canvas_width - width) // 2
+    canvas[top:top + height, left:left + width] = image
+
+
+def _zoom_center(src, scale, dst):
+    """src の中央を 1/scale の範囲で切り出し、dst のサイズに拡大して dst に書き込みます。"""
+    height, width = src.shape[:2]
+    crop_width = max(1, int(round(width / scale)))
+    crop_height = max(1, int(round(height / scale)))
+    left = (width - crop_width) // 2
+    top = (height - crop_height) // 2
+    cv2.resize(src[top:top + crop_height, left:left + crop_width], (width, height), dst=dst,
+               interpolation=cv2.INTER_LINEAR)
+
+
+class TransitionRenderer:
+    """
+    2 枚のスライドの間の中間フレームをバックグラウンドスレッドで作成します。
+
+    中間フレームは 2 枚を中央に配置した領域（両方の外接矩形）の大きさで、事前に確保したバッファに
+    1 枚ずつ書き込まれます。表示側は frames_ready() で作成済みの枚数を確認しながら get_frame() で取り出します。
+    表示が間に合わなかった場合は record_result() で次回のフレーム数を減らします。
+    """
+    def __init__(self, mode=TRANSITION_CROSSFADE, frame_count=24, min_frame_count=4, zoom=0.08):
+        if mode not in TRANSITION_MODES:
+            raise ValueError(f"未対応の切り替え効果です: {mode}")
+        self.mode = mode
+        self.max_frame_count = max(1, frame_count)
+        self.min_frame_count = max(1, min(min_frame_count, self.max_frame_count))
+        self.frame_count = self.max_frame_count  # 次の切り替えで作成するフレーム数（表示の状況に合わせて変わる）
+        self.zoom = zoom  # ケン・バーンズで新しいスライドを拡大し始める倍率（1 + zoom）
+
+        self._condition = threading.Condition()
+        self._thread = None
+        self._stopped = False
+        self._job = None  # (ジョブ番号, 前のスライド, 次のスライド, フレーム数)
+        self._job_id = 0
+        self._ready_job = 0  # 作成中または作成済みのジョブ番号
+        self._ready_count = 0
+
+        # 再利用するバッファ
+        self._frames = None
+        self._from_canvas = None
+        self._to_canvas = None
+        self._zoomed = None
+
+    @property
+    def enabled(self):
+        return self.mode != TRANSITION_NONE
+
+    def start(self):
+        """フレーム作成スレッドを開始します。"""
+        with self._condition:
+            if self._thread is not None and self._thread.is_alive():
+                return
+            self._stopped = False
+            self._thread = threading.Thread(target=self._run, name="TransitionRenderer", daemon=True)
+            self._thread.start()
+
+    def stop(self):
+        """フレーム作成スレッドを停止します。"""
+        with self._condition:
+            self._stopped = True
+            self._job = None
+            thread = self._thread
+            self._thread = None
+            self._condition.notify_all()
+        if thread is not None:
+            thread.join(timeout=2.0)
+
+    def submit(self, from_img, to_img):
+        """
+        中間フレームの作成を開始します。作成中の前の切り替えは中止されます。
+
+        :return: frames_ready() と get_frame() に渡すジョブ番号
+        """
+        with self._condition:
+            self._job_id += 1
+            self._job = (self._job_id, from_img, to_img, self.frame_count)
+            self._condition.notify_all()
+            return self._job_id
+
+    def frames_ready(self, job_id):
+        """作成済みのフレーム数を返します。"""
+        with self._condition:
+            return self._ready_count if self._ready_job == job_id else 0
+
+    def get_frame(self, job_id, index):
+        """
+        作成済みのフレームを返します（バッファを直接参照するため、次の submit() までに使用してください）。
+        作成されていない場合は None を返します。
+        """
+        with self._condition:
+            if self._ready_job != job_id or index >= self._ready_count:
+                return None
+            return self._frames[index]
+
+    def record_result(self, shown, planned):
+        """
+        表示できたフレーム数を記録し、次回のフレーム数を調整します。
+        表示が間に合わなかった場合は表示できた枚数まで減らし、すべて表示できた場合は少しずつ元に戻します。
+        """
+        if shown < planned * 0.9:
+            self.frame_count = max(self.min_frame_count, shown)
+            logging.debug(f"切り替え効果の表示が間に合わないため、フレーム数を減らします: {planned} -> {self.frame_count}")
+        elif shown >= planned and self.frame_count < self.max_frame_count:
+            self.frame_count += 1
+
+    def _run(self):
+        while True:
+            with self._condition:
+                while self._job is None and not self._stopped:
+                    self._condition.wait()
+                if self._stopped:
+                    return
+                job_id, from_img, to_img, frame_count = self._job
+                self._job = None
+                self._ready_job = job_id
+                self._ready_count = 0
+
+            try:
+                self._render(job_id, from_img, to_img, frame_count)
+            except Exception as e:
+                logging.error(f"切り替え効果の作成中にエラーが発生しました: {e}")
+
+    def _allocate(self, frame_count, shape):
+        # 中間フレームは画面サイズで 1 枚数 MB になるため、確保し直すのは次の場合だけにする
+        # - 足りない場合: フレーム数は 1 枚ずつ元に戻るため、毎回確保し直さないよう最大のフレーム数で確保する
+        # - 半分以下しか使わない場合: 表示が間に合わずフレーム数が大きく減ったときはその分のメモリを返す
+        capacity = self._frames.shape[0] if self._frames is not None and self._frames.shape[1:] == shape else 0
+        size = None
+        if frame_count > capacity:
+            size = max(frame_count, self.max_frame_count)
+        elif frame_count * 2 <= capacity:
+            size = frame_count
+        if size is not None:
+            self._frames = None  # 新しいバッファを確保する前に古いバッファを解放する
+            self._frames = np.empty((size,) + shape, dtype=np.uint8)
+        if self._from_canvas is None or self._from_canvas.shape != shape:
+            self._from_canvas = np.empty(shape, dtype=np.uint8)
+            self._to_canvas = np.empty(shape, dtype=np.uint8)
+            self._zoomed = np.empty(shape, dtype=np.uint8)
+
+    def _render(self, job_id, from_img, to_img, frame_count):
+        from_array = _to_rgb_array(from_img)
+        to_array = _to_rgb_array(to_img)
+        shape = (max(from_array.shape[0], to_array.shape[0]), max(from_array.shape[1], to_array.shape[1]), 3)
+
+        with self._condition:
+            self._allocate(frame_count, shape)
+        _place_center(self._from_canvas, from_array)
+        _place_center(self._to_canvas, to_array)
+
+        for index in range(frame_count):
+            with self._condition:
+                if self._stopped or self._job is not None:
+                    return  # 次の切り替えが要求されたため中止する
+            # 最後のフレームが次のスライドと一致するようにする
+            progress = (index + 1) / frame_count
+            target = self._to_canvas
+            if self.mode == TRANSITION_KENBURNS and progress < 1.0:
+                _zoom_center(self._to_canvas, 1.0 + self.zoom * (1.0 - progress), self._zoomed)
+                target = self._zoomed
+            cv2.addWeighted(self._from_canvas, 1.0 - progress, target, progress, 0.0, dst=self._frames[index])
+            with self._condition:
+                self._ready_count = index + 1
@@ -6,11 +6,37 @@ import re
 from screeninfo import get_monitors
 import logging
 import datetime
+import time
 
 def get_timestamp():
     """現在の日時を取得して、ファイル名に使用できる形式にフォーマットします。"""
     return datetime.datetime.now().strftime("%Y%m%d_%H%M%S")
 
+class FpsCounter:
+    """
+    一定時間ごとにフレームレートを集計する簡易カウンター。
+    スレッドごとに 1 つのインスタンスを使用してください。
+    """
+    def __init__(self, window=1.0):
+        self.window = window  # 集計間隔（秒）
+        self.fps = 0.0
+        self._count = 0
+        self._window_start = time.monotonic()
+
+    def tick(self):
+        """
+        フレームを 1 つ数えます。集計間隔が経過した場合は FPS を更新して True を返します。
+        """
+        self._count += 1
+        now = time.monotonic()
+        elapsed = now - self._window_start
+        if elapsed < self.window:
+            return False
+        self.fps = self._count / elapsed
+        self._count = 0
+        self._window_start = now
+        return True
+
 def get_screen_sizes():
     """
     画面サイズを取得し、ログに記録します。
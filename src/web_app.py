@@ -1 +1,418 @@
 # web_app.py: Webアプリケーションの構築およびルーティングを定義するモジュール
+
+import base64
+import contextlib
+import datetime
+import json
+import atexit
+import logging
+import os
+import tempfile
+import threading
+from flask import (Flask, Request, Response, abort, current_app, jsonify, redirect, render_template, request,
+                   send_file, send_from_directory, url_for)
+from werkzeug.datastructures import ContentRange
+from werkzeug.utils import secure_filename
+
+from photo_index import PhotoIndex, is_photo_file
+from photo_ingest import PhotoIngester
+from rendition_cache import RenditionCache
+from slide_loader import load_slide
+from utils import load_config
+from zip_stream import ZipStream
+
+src_dir = os.path.dirname(os.path.abspath(__file__))
+template_dir = os.path.join(os.path.dirname(src_dir), 'templates')
+
+# バージョン付きの URL（?v=更新時刻）で要求されたサムネイルは内容が変わらないため、長期間キャッシュさせる
+IMMUTABLE_CACHE_CONTROL = 'public, max-age=31536000, immutable'
+# バージョンなしの URL は毎回 ETag で確認させる
+REVALIDATE_CACHE_CONTROL = 'no-cache'
+
+# 一覧 API で 1 回に返す写真の最大数
+MAX_PAGE_SIZE = 200
+# ZIP に格納する写真をインデックスから読み込むときの 1 回の件数
+ARCHIVE_BATCH_SIZE = 500
+# wsgi.file_wrapper に渡すブロックサイズ（sendfile を使わないサーバーで読み込む単位）
+FILE_WRAPPER_BLOCK_SIZE = 64 * 1024
+# アップロード中のファイルを保存する写真ディレクトリ内のディレクトリ（リンクで公開できるよう同じファイルシステムに置く）
+UPLOAD_DIRECTORY_NAME = '.uploads'
+
+
+class UploadRequest(Request):
+    """
+    multipart で送信されたファイルを、メモリや /tmp を経由せずにアップロード用ディレクトリへ直接書き込む Request。
+    リクエストの終了時に取り込みを予約されなかったファイルは削除されます。
+    """
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.upload_paths = []
+
+    def _get_file_stream(self, total_content_length, content_type, filename=None, content_length=None):
+        file = tempfile.NamedTemporaryFile('wb+', dir=current_app.config['UPLOAD_DIRECTORY'], prefix='upload-',
+                                           suffix='.tmp', delete=False)
+        self.upload_paths.append(file.name)
+        return file
+
+
+def encode_cursor(photo):
+    """写真の (撮影日時, ファイル名) を URL に埋め込めるページ送りのカーソルに変換します。"""
+    key = json.dumps([photo['captured_at'], photo['name']], ensure_ascii=False)
+    return base64.urlsafe_b64encode(key.encode('utf-8')).decode('ascii').rstrip('=')
+
+
+def decode_cursor(cursor):
+    """カーソルを (撮影日時, ファイル名) に戻します。不正なカーソルの場合は ValueError を送出します。"""
+    try:
+        key = json.loads(base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4)).decode('utf-8'))
+    except (ValueError, UnicodeDecodeError) as e:
+        raise ValueError(f"不正なカーソルです: {cursor}") from e
+    if not (isinstance(key, list) and len(key) == 2 and all(isinstance(value, str) for value in key)):
+        raise ValueError(f"不正なカーソルです: {cursor}")
+    return tuple(key)
+
+
+def parse_date_range(start, end):
+    """
+    'YYYY-MM-DD' 形式の開始日・終了日（どちらも含む）を、PhotoIndex.list_page に渡す日時の範囲に変換します。
+    """
+    start_at = end_at = None
+    if start:
+        start_at = datetime.date.fromisoformat(start).strftime('%Y-%m-%d 00:00:00')
+    if end:
+        end_at = (datetime.date.fromisoformat(end) + datetime.timedelta(days=1)).strftime('%Y-%m-%d 00:00:00')
+    return start_at, end_at
+
+
+class RangeFile:
+    """
+    ファイルの現在位置から length バイトだけを読み込めるファイルオブジェクト。
+    fileno() はそのまま公開するため、sendfile に対応したサーバーは Content-Length の分だけを送信し、
+    それ以外のサーバーでも read() が範囲外のデータを返すことはありません。
+    """
+    def __init__(self, file, length):
+        self._file = file
+        self._remaining = length
+
+    def read(self, size=-1):
+        if size is None or size < 0 or size > self._remaining:
+            size = self._remaining
+        data = self._file.read(size) if size > 0 else b''
+        self._remaining -= len(data)
+        return data
+
+    def fileno(self):
+        return self._file.fileno()
+
+    def tell(self):
+        return self._file.tell()
+
+    def close(self):
+        self._file.close()
+
+
+class KeyedLock:
+    """
+    キーごとに別のロックを取得するためのロック。
+    同じキーの処理だけを直列にし、異なるキーの処理は並行して行えます。
+    使用中のキーだけを保持するため、キーの数が増え続けてもメモリは増えません。
+    """
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._locks = {}  # キー -> [ロック, 使用中のスレッド数]
+
+    @contextlib.contextmanager
+    def __call__(self, key):
+        with self._lock:
+            entry = self._locks.setdefault(key, [threading.Lock(), 0])
+            entry[1] += 1
+        try:
+            with entry[0]:
+                yield
+        finally:
+            with self._lock:
+                entry[1] -= 1
+                if entry[1] == 0:
+                    del self._locks[key]
+
+    def __len__(self):
+        with self._lock:
+            return len(self._locks)
+
+
+def use_native_file_wrapper(response, path):
+    """
+    Range に応じた部分レスポンス（206）の本文を、サーバーの wsgi.file_wrapper で送信するように置き換えます。
+
+    werkzeug は部分レスポンスの本文を Python で読み込んで切り出すため、sendfile を使えません。
+    ファイルを開始位置まで seek し、範囲の長さに制限してから wsgi.file_wrapper に渡すと、
+    gunicorn などのサーバーは Content-Length の分だけを sendfile で送信します（PEP 3333）。
+    X-Sendfile を使う場合は本文を送らないため、何もしません。
+    """
+    file_wrapper = request.environ.get('wsgi.file_wrapper')
+    content_range = response.content_range
+    if (current_app.config['USE_X_SENDFILE'] or file_wrapper is None or response.status_code != 206
+            or content_range.start is None):
+        return response
+    file = open(path, 'rb')
+    file.seek(content_range.start)
+    response.response.close()
+    response.response = file_wrapper(RangeFile(file, content_range.stop - content_range.start),
+                                     FILE_WRAPPER_BLOCK_SIZE)
+    return response
+
+
+def create_app(photo_directory, thumbnail_directory, photo_index=None, thumbnail_size=320,
+               thumbnail_cache_max_mb=128, page_size=50, use_x_sendfile=False, max_upload_mb=100,
+               ingest_queue_size=32, rendition_cache=None, rendition_size=None):
+    """
+    写真の一覧・サムネイル・アップロード・ダウンロードを提供する Flask アプリケーションを作成します。
+
+    サムネイルは RenditionCache でディスクにキャッシュされ（キーは元の写真の更新時刻を含む）、
+    ETag と Last-Modified による条件付きリクエスト（304）に対応します。
+
+    :param photo_directory: 写真ディレクトリのパス
+    :param thumbnail_directory: サムネイルを保存するディレクトリのパス
+    :param photo_index: PhotoIndex。指定しない場合はメモリ上にインデックスを作成する
+    :param thumbnail_size: サムネイルの最大の幅・高さ（ピクセル）
+    :param thumbnail_cache_max_mb: サムネイルのキャッシュの上限（MB）
+    :param page_size: ダッシュボードと一覧 API で 1 回に返す写真の数
+    :param use_x_sendfile: True の場合、写真の送信を X-Sendfile ヘッダーでフロントのウェブサーバーに任せる
+    :param max_upload_mb: 1 回のアップロードの上限（MB）。超えた場合は受信中に 413 を返す
+    :param ingest_queue_size: 取り込み待ちにできるアップロードされた写真の最大数
+    :param rendition_cache: スライドショーの RenditionCache。指定した場合はアップロード時に縮小版を作成する
+    :param rendition_size: スライドショーの画面サイズ (幅, 高さ)
+    """
+    app = Flask(__name__, template_folder=template_dir)
+    app.request_class = UploadRequest
+    app.config['PHOTO_DIRECTORY'] = photo_directory
+    app.config['USE_X_SENDFILE'] = use_x_sendfile
+    app.config['MAX_CONTENT_LENGTH'] = max_upload_mb * 1024 * 1024
+    app.config['UPLOAD_DIRECTORY'] = os.path.join(photo_directory, UPLOAD_DIRECTORY_NAME)
+    if photo_index is None:
+        photo_index = PhotoIndex(photo_directory)
+        photo_index.refresh()
+    thumbnail_cache = RenditionCache(thumbnail_directory, max_bytes=thumbnail_cache_max_mb * 1024 * 1024, quality=85)
+    thumbnail_dimensions = (thumbnail_size, thumbnail_size)
+    thumbnail_lock = KeyedLock()
+
+    # アップロードされた写真は検証・向きの補正・縮小版の作成をバックグラウンドで行ってから公開する
+    ingester = PhotoIngester(photo_directory, app.config['UPLOAD_DIRECTORY'], photo_index,
+                             renditions=[(thumbnail_cache, thumbnail_dimensions), (rendition_cache, rendition_size)],
+                             max_queue_size=ingest_queue_size)
+    ingester.cleanup_uploads()
+    ingester.start()
+    app.extensions['photo_ingester'] = ingester
+
+    @app.teardown_request
+    def remove_unclaimed_uploads(exc):
+        for path in getattr(request, 'upload_paths', []):
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+
+    def photo_path(filename):
+        """URL のファイル名を写真のパスに変換します。写真ディレクトリ外や写真以外のファイルは 404 にします。"""
+        if filename != os.path.basename(filename) or not is_photo_file(filename):
+            abort(404)
+        path = os.path.join(photo_directory, filename)
+        if not os.path.isfile(path):
+            abort(404)
+        return path
+
+    def photo_summary(photo):
+        """一覧 API とダッシュボードで返す写真の情報。"""
+        return {
+            'name': photo['name'],
+            'captured_at': photo['captured_at'],
+            'width': photo['width'],
+            'height': photo['height'],
+            'size': photo['size'],
+            'thumbnail_url': url_for('thumbnail', filename=photo['name'], v=photo['mtime_ns']),
+            'download_url': url_for('download_photo', filename=photo['name']),
+        }
+
+    def list_page(limit, cursor=None, descending=True, start=None, end=None):
+        """撮影日時順に 1 ページ分の写真と、次のページのカーソル（最後のページの場合は None）を返します。"""
+        # 1 件多く読み込み、次のページがあるかどうかを判定する
+        photos = photo_index.list_page(limit + 1, after=decode_cursor(cursor) if cursor else None,
+                                       descending=descending, start=start, end=end)
+        next_cursor = encode_cursor(photos[limit - 1]) if len(photos) > limit else None
+        return [photo_summary(photo) for photo in photos[:limit]], next_cursor
+
+    @app.route('/')
+    def dashboard():
+        photos, next_cursor = list_page(page_size)
+        return render_template('dashboard.html', photos=photos, next_cursor=next_cursor)
+
+    @app.route('/api/photos')
+    def api_photos():
+        try:
+            limit = min(max(int(request.args.get('limit', page_size)), 1), MAX_PAGE_SIZE)
+            order = request.args.get('order', 'desc')
+            if order not in ('asc', 'desc'):
+                raise ValueError(f"不正な並び順です: {order}")
+            start, end = parse_date_range(request.args.get('from'), request.args.get('to'))
+            photos, next_cursor = list_page(limit, request.args.get('cursor'), order == 'desc', start, end)
+        except ValueError as e:
+            return jsonify(error=str(e)), 400
+        return jsonify(photos=photos, next_cursor=next_cursor)
+
+    def iter_photos_in_range(start, end):
+        """撮影日時の範囲内の写真を古い順にすべて返します（インデックスから少しずつ読み込む）。"""
+        after = None
+        while True:
+            photos = photo_index.list_page(ARCHIVE_BATCH_SIZE, after=after, descending=False, start=start, end=end)
+            yield from photos
+            if len(photos) < ARCHIVE_BATCH_SIZE:
+                return
+            after = (photos[-1]['captured_at'], photos[-1]['name'])
+
+    @app.route('/archive.zip')
+    def download_archive():
+        names = request.args.getlist('name')
+        if names:
+            paths = [photo_path(name) for name in names]
+        else:
+            try:
+                start, end = parse_date_range(request.args.get('from'), request.args.get('to'))
+            except ValueError as e:
+                return jsonify(error=str(e)), 400
+            paths = [photo['path'] for photo in iter_photos_in_range(start, end)]
+        archive = ZipStream(paths)
+
+        headers = {
+            'Accept-Ranges': 'bytes',
+            'Content-Disposition': 'attachment; filename=photos.zip',
+        }
+        status = 200
+        start, stop = 0, archive.content_length
+        # If-Range の ETag が一致しない（写真が変わった）場合は Range を無視して全体を返す
+        byte_range = request.range
+        if byte_range is not None and ('If-Range' not in request.headers or request.if_range.etag == archive.etag):
+            bounds = byte_range.range_for_length(archive.content_length)
+            if bounds is None:
+                headers['Content-Range'] = ContentRange('bytes', None, None, archive.content_length).to_header()
+                return Response(status=416, headers=headers)
+            start, stop = bounds
+            headers['Content-Range'] = ContentRange('bytes', start, stop, archive.content_length).to_header()
+            status = 206
+        headers['Content-Length'] = str(stop - start)
+        logging.info(f"ZIP のダウンロードを開始します: {len(archive.entries)} 枚, {start}-{stop}/{archive.content_length} バイト")
+
+        response = Response(archive.iter_bytes(start, stop), status=status, headers=headers,
+                            mimetype='application/zip', direct_passthrough=True)
+        response.set_etag(archive.etag)
+        return response
+
+    @app.route('/upload', methods=['POST'])
+    def upload_photo():
+        # ファイルは受信しながら UploadRequest によってアップロード用ディレクトリに書き込まれている。
+        # 取り込みはバックグラウンドで行い、受信が終わった時点で応答する
+        accepted = 0
+        for file in request.files.getlist('photo'):
+            filename = secure_filename(file.filename or '')
+            upload_path = file.stream.name
+            file.stream.close()
+            if not filename or not is_photo_file(filename):
+                logging.warning(f"写真ではないファイルがアップロードされました: {file.filename}")
+                continue
+            if not ingester.submit(upload_path, filename):
+                abort(503)
+            request.upload_paths.remove(upload_path)
+            accepted += 1
+            logging.info(f"写真がアップロードされました: {filename}")
+        if accepted == 0:
+            abort(400)
+        return redirect(url_for('dashboard'))
+
+    @app.route('/download/<filename>')
+    def download_photo(filename):
+        # 写真を Python で読み込まず、wsgi.file_wrapper（sendfile）または X-Sendfile で送信する。
+        # Range・If-Range・If-None-Match は werkzeug が処理し、正しい Content-Length と Content-Range を返す
+        path = photo_path(filename)
+        response = send_from_directory(photo_directory, filename, as_attachment=True, conditional=True)
+        return use_native_file_wrapper(response, path)
+
+    @app.route('/thumbnail/<filename>')
+    def thumbnail(filename):
+        path = photo_path(filename)
+        stat = os.stat(path)
+        cache_path = thumbnail_cache.cache_path(path, thumbnail_dimensions)
+        if cache_path is None:
+            abort(404)
+        if not os.path.exists(cache_path):
+            # 同じサムネイルを同時に作成しないようにする（別の写真のサムネイルは並行して作成する）
+            with thumbnail_lock(cache_path):
+                if not os.path.exists(cache_path):
+                    try:
+                        load_slide(path, thumbnail_dimensions, thumbnail_cache)
+                    except (OSError, ValueError) as e:
+                        logging.error(f"サムネイルの作成に失敗しました: {filename}: {e}")
+                        abort(404)
+
+        # キャッシュのファイル名はパス・更新時刻・サイズのハッシュなので、そのまま強い ETag として使える
+        etag = os.path.splitext(os.path.basename(cache_path))[0]
+        response = send_file(cache_path, mimetype='image/jpeg', etag=etag,
+                             last_modified=stat.st_mtime, conditional=True)
+        if request.args.get('v') == str(stat.st_mtime_ns):
+            response.headers['Cache-Control'] = IMMUTABLE_CACHE_CONTROL
+        else:
+            response.headers['Cache-Control'] = REVALIDATE_CACHE_CONTROL
+        return response
+
+    return app
+
+
+def create_app_from_config():
+    """
+    config.yaml の設定でアプリケーションを作成します。
+    gunicorn などの WSGI サーバーから起動する場合に使用します（例: gunicorn 'web_app:create_app_from_config()'）。
+    """
+    config = load_config('config.yaml')
+    slideshow_config = config['slideshow']
+    flask_config = config.get('flask', {})
+
+    photo_directory = os.path.join(src_dir, slideshow_config['photos_directory'])
+    os.makedirs(photo_directory, exist_ok=True)
+    thumbnail_directory = os.path.join(src_dir, flask_config.get('thumbnail_directory', 'thumbnails'))
+
+    # スライドショーと同じインデックスを使い、リクエストごとのディレクトリの走査を避ける
+    index_path = os.path.join(src_dir, slideshow_config.get('index_path', 'photo_index.sqlite3'))
+    photo_index = PhotoIndex(photo_directory, index_path, poll_interval=slideshow_config.get('index_poll_interval', 10))
+    photo_index.start_watching()
+    atexit.register(photo_index.close)
+
+    # アップロードされた写真のスライドショー用の縮小版も作成する。
+    # Web アプリケーションはディスプレイのないプロセスでも動くため、画面サイズは問い合わせずに設定から読み込む
+    rendition_cache = rendition_size = None
+    rendition_cache_directory = slideshow_config.get('rendition_cache_directory')
+    if rendition_cache_directory and slideshow_config.get('rendition_size'):
+        width, height = slideshow_config['rendition_size']
+        rendition_size = (int(width), int(height))
+        rendition_cache = RenditionCache(os.path.join(src_dir, rendition_cache_directory),
+                                         max_bytes=slideshow_config.get('rendition_cache_max_mb', 512) * 1024 * 1024)
+
+    app = create_app(photo_directory, thumbnail_directory, photo_index,
+                     thumbnail_size=int(flask_config.get('thumbnail_size', 320)),
+                     thumbnail_cache_max_mb=int(flask_config.get('thumbnail_cache_max_mb', 128)),
+                     page_size=int(flask_config.get('page_size', 50)),
+                     use_x_sendfile=str(flask_config.get('use_x_sendfile')).lower() == 'true',
+                     max_upload_mb=int(flask_config.get('max_upload_mb', 100)),
+                     ingest_queue_size=int(flask_config.get('ingest_queue_size', 32)),
+                     rendition_cache=rendition_cache, rendition_size=rendition_size)
+    app.config['FLASK_SETTINGS'] = flask_config
+    return app
+
+
+def main():
+    app = create_app_from_config()
+    flask_config = app.config['FLASK_SETTINGS']
+    app.run(host=flask_config.get('host') or '0.0.0.0',
+            port=int(flask_config.get('port') or 5000),
+            debug=str(flask_config.get('debug')).lower() == 'true')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,262 @@
+# zip_stream.py: 複数の写真を無圧縮の ZIP として少しずつ書き出すモジュール
+
+import hashlib
+import logging
+import os
+import struct
+import threading
+import time
+import zlib
+from collections import OrderedDict
+
+CHUNK_SIZE = 64 * 1024
+
+ZIP64_LIMIT = 0xFFFFFFFF  # これ以上のサイズ・位置は ZIP64 の拡張フィールドに記録する
+ZIP_COUNT_LIMIT = 0xFFFF
+
+LOCAL_HEADER = struct.Struct('<IHHHHHIIIHH')
+DATA_DESCRIPTOR = struct.Struct('<IIII')
+DATA_DESCRIPTOR64 = struct.Struct('<IIQQ')
+CENTRAL_HEADER = struct.Struct('<IHHHHHHIIIHHHHHII')
+END_RECORD = struct.Struct('<IHHHHIIH')
+END_RECORD64 = struct.Struct('<IQHHIIQQQQ')
+END_LOCATOR64 = struct.Struct('<IIQI')
+
+LOCAL_HEADER_SIGNATURE = 0x04034b50
+DATA_DESCRIPTOR_SIGNATURE = 0x08074b50
+CENTRAL_HEADER_SIGNATURE = 0x02014b50
+END_RECORD_SIGNATURE = 0x06054b50
+END_RECORD64_SIGNATURE = 0x06064b50
+END_LOCATOR64_SIGNATURE = 0x07064b50
+
+VERSION = 20
+VERSION64 = 45
+# ビット 3: CRC とサイズをデータの後ろ（データディスクリプタ）に記録する, ビット 11: ファイル名は UTF-8
+FLAGS = 0x0808
+EXTERNAL_ATTR = 0o100644 << 16
+
+# 中断されたダウンロードを再開するときにファイルを読み直さずに済むよう、CRC を記録しておく
+# （作成中のアーカイブの CRC は各エントリが保持するため、この上限を超える枚数でも読み直しは起きない）
+_crc_cache = OrderedDict()
+_crc_cache_lock = threading.Lock()
+CRC_CACHE_SIZE = 4096
+
+
+def _dos_datetime(timestamp):
+    """更新時刻を ZIP の (時刻, 日付) に変換します。"""
+    t = time.localtime(timestamp)
+    if t.tm_year < 1980:
+        return 0, (1 << 5) | 1
+    return ((t.tm_hour << 11) | (t.tm_min << 5) | (t.tm_sec // 2),
+            ((t.tm_year - 1980) << 9) | (t.tm_mon << 5) | t.tm_mday)
+
+
+class _Entry:
+    """ZIP に格納する 1 枚の写真。"""
+    def __init__(self, path, name, size, mtime_ns, offset):
+        self.path = path
+        self.name = name.encode('utf-8')
+        self.size = size
+        self.mtime_ns = mtime_ns
+        self.offset = offset  # ローカルヘッダーの位置
+        self.time, self.date = _dos_datetime(mtime_ns / 1e9)
+        self.zip64 = size >= ZIP64_LIMIT
+        # データの後ろのディスクリプタとセントラルディレクトリの両方で使うため、ストリームの間は保持する
+        self.crc = None
+
+    @property
+    def cache_key(self):
+        return self.path, self.size, self.mtime_ns
+
+    def known_crc(self):
+        """計算済みの CRC を返します。まだ計算していない場合は前回のダウンロードで記録したものを探します。"""
+        if self.crc is None:
+            self.crc = _get_cached_crc(self.cache_key)
+        return self.crc
+
+    def set_crc(self, crc):
+        self.crc = crc
+        _set_cached_crc(self.cache_key, crc)
+
+    def local_header(self):
+        extra = struct.pack('<HHQQ', 1, 16, 0, 0) if self.zip64 else b''
+        size_field = ZIP64_LIMIT if self.zip64 else 0
+        return LOCAL_HEADER.pack(
+            LOCAL_HEADER_SIGNATURE, VERSION64 if self.zip64 else VERSION, FLAGS, 0, self.time, self.date,
+            0, size_field, size_field, len(self.name), len(extra)
+        ) + self.name + extra
+
+    def descriptor_length(self):
+        return DATA_DESCRIPTOR64.size if self.zip64 else DATA_DESCRIPTOR.size
+
+    def descriptor(self, crc):
+        if self.zip64:
+            return DATA_DESCRIPTOR64.pack(DATA_DESCRIPTOR_SIGNATURE, crc, self.size, self.size)
+        return DATA_DESCRIPTOR.pack(DATA_DESCRIPTOR_SIGNATURE, crc, self.size, self.size)
+
+    def _central_extra(self):
+        values = []
+        if self.zip64:
+            values += [self.size, self.size]
+        if self.offset >= ZIP64_LIMIT:
+            values.append(self.offset)
+        if not values:
+            return b''
+        return struct.pack(f'<HH{len(values)}Q', 1, 8 * len(values), *values)
+
+    def central_header_length(self):
+        return CENTRAL_HEADER.size + len(self.name) + len(self._central_extra())
+
+    def central_header(self, crc):
+        extra = self._central_extra()
+        version = VERSION64 if extra else VERSION
+        size_field = ZIP64_LIMIT if self.zip64 else self.size
+        return CENTRAL_HEADER.pack(
+            CENTRAL_HEADER_SIGNATURE, version, version, FLAGS, 0, self.time, self.date,
+            crc, size_field, size_field, len(self.name), len(extra), 0, 0, 0, EXTERNAL_ATTR,
+            min(self.offset, ZIP64_LIMIT)
+        ) + self.name + extra
+
+
+class ZipStream:
+    """
+    写真を無圧縮（STORED）の ZIP として先頭から順に書き出します。
+
+    JPEG は圧縮してもほとんど小さくならないため、無圧縮で格納することで全体のサイズを事前に計算でき、
+    Content-Length と Range による再開に対応できます。アーカイブ全体をメモリやディスクに作成せず、
+    写真を CHUNK_SIZE ずつ読み込みながら出力するため、写真の枚数やサイズによらずメモリ使用量は一定です。
+    4 GB を超える写真やアーカイブは ZIP64 形式で記録します。
+    """
+    def __init__(self, paths):
+        """
+        :param paths: 格納する写真のパスのリスト（存在しない写真は除外される）
+        """
+        self.entries = []
+        names = set()
+        offset = 0
+        for path in paths:
+            name = os.path.basename(path)
+            if name in names:
+                continue
+            try:
+                stat = os.stat(path)
+            except OSError:
+                logging.warning(f"ZIP に追加する写真が見つかりません: {path}")
+                continue
+            names.add(name)
+            entry = _Entry(path, name, stat.st_size, stat.st_mtime_ns, offset)
+            self.entries.append(entry)
+            offset += len(entry.local_header()) + entry.size + entry.descriptor_length()
+
+        self.central_directory_offset = offset
+        self.central_directory_size = sum(entry.central_header_length() for entry in self.entries)
+        self._end = self._end_records()
+        self.content_length = offset + self.central_directory_size + len(self._end)
+
+    @property
+    def etag(self):
+        """格納する写真（名前・サイズ・更新時刻）から求めた ETag。写真が変わると別の値になります。"""
+        digest = hashlib.sha1()
+        for entry in self.entries:
+            digest.update(b'%s|%d|%d\n' % (entry.name, entry.size, entry.mtime_ns))
+        return digest.hexdigest()
+
+    def _end_records(self):
+        count = len(self.entries)
+        records = b''
+        if (count >= ZIP_COUNT_LIMIT or self.central_directory_size >= ZIP64_LIMIT
+                or self.central_directory_offset >= ZIP64_LIMIT):
+            end64_offset = self.central_directory_offset + self.central_directory_size
+            records += END_RECORD64.pack(
+                END_RECORD64_SIGNATURE, END_RECORD64.size - 12, VERSION64, VERSION64, 0, 0,
+                count, count, self.central_directory_size, self.central_directory_offset
+            )
+            records += END_LOCATOR64.pack(END_LOCATOR64_SIGNATURE, 0, end64_offset, 1)
+        records += END_RECORD.pack(
+            END_RECORD_SIGNATURE, 0, 0, min(count, ZIP_COUNT_LIMIT), min(count, ZIP_COUNT_LIMIT),
+            min(self.central_directory_size, ZIP64_LIMIT), min(self.central_directory_offset, ZIP64_LIMIT), 0
+        )
+        return records
+
+    def _segments(self):
+        """アーカイブを構成する (位置, 長さ, 種類, エントリ) を先頭から順に返します。"""
+        for entry in self.entries:
+            header_length = len(entry.local_header())
+            yield entry.offset, header_length, 'local', entry
+            yield entry.offset + header_length, entry.size, 'data', entry
+            yield entry.offset + header_length + entry.size, entry.descriptor_length(), 'descriptor', entry
+        offset = self.central_directory_offset
+        for entry in self.entries:
+            length = entry.central_header_length()
+            yield offset, length, 'central', entry
+            offset += length
+        yield offset, len(self._end), 'end', None
+
+    def iter_bytes(self, start=0, stop=None):
+        """
+        アーカイブの start バイト目から stop バイト目の手前までを、少しずつ bytes で返すジェネレーター。
+        """
+        stop = self.content_length if stop is None else min(stop, self.content_length)
+        for offset, length, kind, entry in self._segments():
+            if offset + length <= start:
+                continue
+            if offset >= stop:
+                return
+            begin = max(start - offset, 0)
+            end = min(stop - offset, length)
+            if kind == 'data':
+                yield from self._read_data(entry, begin, end)
+                continue
+            if kind == 'local':
+                data = entry.local_header()
+            elif kind == 'descriptor':
+                data = entry.descriptor(self._crc(entry))
+            elif kind == 'central':
+                data = entry.central_header(self._crc(entry))
+            else:
+                data = self._end
+            yield data[begin:end]
+
+    def _read_data(self, entry, begin, end):
+        """写真の begin バイト目から end バイト目の手前までを読み込みます。先頭から読む場合は CRC も計算します。"""
+        crc = entry.known_crc()
+        # CRC が分からない場合は先頭から読み、読み飛ばす部分も CRC の計算に使う
+        position = begin if crc is not None else 0
+        running_crc = 0
+        with open(entry.path, 'rb') as f:
+            f.seek(position)
+            while position < end:
+                chunk = f.read(min(CHUNK_SIZE, end - position))
+                if not chunk:
+                    raise OSError(f"ZIP の作成中に写真のサイズが変わりました: {entry.path}")
+                if crc is None:
+                    running_crc = zlib.crc32(chunk, running_crc)
+                if position + len(chunk) > begin:
+                    yield chunk[max(begin - position, 0):]
+                position += len(chunk)
+        if crc is None and end == entry.size:
+            entry.set_crc(running_crc)
+
+    def _crc(self, entry):
+        crc = entry.known_crc()
+        if crc is None:
+            crc = 0
+            for chunk in self._read_data(entry, 0, entry.size):
+                crc = zlib.crc32(chunk, crc)
+        return crc
+
+
+def _get_cached_crc(key):
+    with _crc_cache_lock:
+        crc = _crc_cache.get(key)
+        if crc is not None:
+            _crc_cache.move_to_end(key)
+        return crc
+
+
+def _set_cached_crc(key, crc):
+    with _crc_cache_lock:
+        _crc_cache[key] = crc
+        _crc_cache.move_to_end(key)
+        while len(_crc_cache) > CRC_CACHE_SIZE:
+            _crc_cache.popitem(last=False)
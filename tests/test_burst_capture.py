@@ -0,0 +1,120 @@
+# tests/test_burst_capture.py
+
+import sys
+import os
+import time
+import unittest
+import numpy as np
+
+# srcディレクトリをPythonのパスに追加
+current_dir = os.path.dirname(os.path.abspath(__file__))
+parent_dir = os.path.abspath(os.path.join(current_dir, '..'))
+src_dir = os.path.join(parent_dir, 'src')
+sys.path.insert(0, src_dir)
+
+from burst_capture import BurstCapture, sharpness
+
+
+class FakeCameraHandler:
+    """フレームリスナーと保存先を記録するだけのカメラハンドラー"""
+    def __init__(self):
+        self.listeners = []
+        self.saved = []
+
+    def add_frame_listener(self, listener):
+        self.listeners.append(listener)
+
+    def remove_frame_listener(self, listener):
+        if listener in self.listeners:
+            self.listeners.remove(listener)
+
+    def emit(self, frame_id, frame):
+        for listener in list(self.listeners):
+            listener(frame_id, float(frame_id), frame)
+
+    def save_photo(self, frame, save_path):
+        self.saved.append((save_path, frame))
+        return True
+
+
+def make_frame(sharp):
+    frame = np.full((32, 32, 3), 128, dtype=np.uint8)
+    if sharp:
+        frame[::2, ::2] = 255  # 細かい模様で鮮鋭度を上げる
+    return frame
+
+
+def wait_until_idle(burst, timeout=2.0):
+    deadline = time.time() + timeout
+    while burst.busy and time.time() < deadline:
+        time.sleep(0.01)
+
+
+class TestBurstCapture(unittest.TestCase):
+    def test_sharpness(self):
+        self.assertGreater(sharpness(make_frame(True)), sharpness(make_frame(False)))
+
+    def test_keeps_top_frames(self):
+        handler = FakeCameraHandler()
+        burst = BurstCapture(handler, frame_count=4, keep_count=2)
+        self.assertTrue(burst.start('/photos/20240101_000000'))
+        self.assertFalse(burst.start('/photos/other'))  # 処理中は開始できない
+
+        for frame_id, sharp in enumerate([False, True, False, True, True], start=1):
+            handler.emit(frame_id, make_frame(sharp))
+        wait_until_idle(burst)
+
+        self.assertEqual(handler.listeners, [])  # 規定枚数を取り込んだらリスナーを解除する
+        self.assertEqual([path for path, _ in handler.saved],
+                         ['/photos/20240101_000000_1.jpg', '/photos/20240101_000000_2.jpg'])
+        for _, frame in handler.saved:
+            self.assertEqual(sharpness(frame), sharpness(make_frame(True)))
+        self.assertIsNotNone(burst.get_best_frame())
+
+    def test_smile_score_takes_priority(self):
+        handler = FakeCameraHandler()
+        frames = [make_frame(True), make_frame(False), make_frame(True)]
+        smiling = frames[1]
+        # 鮮鋭度の低いフレームだけが笑顔と判定される
+        burst = BurstCapture(handler, frame_count=3, keep_count=1,
+                             smile_scorer=lambda frame: 1.0 if frame[0, 0, 0] == 128 else 0.0)
+        burst.start('/photos/burst')
+        for frame_id, frame in enumerate(frames, start=1):
+            handler.emit(frame_id, frame)
+        wait_until_idle(burst)
+
+        self.assertEqual(len(handler.saved), 1)
+        self.assertTrue((handler.saved[0][1] == smiling).all())
+
+    def test_cancel(self):
+        handler = FakeCameraHandler()
+        burst = BurstCapture(handler, frame_count=5, keep_count=1)
+        burst.start('/photos/burst')
+        handler.emit(1, make_frame(True))
+        burst.cancel()
+        self.assertFalse(burst.busy)
+        self.assertEqual(handler.listeners, [])
+
+    def test_callback_after_cancel_is_ignored(self):
+        # cancel() の時点でキャプチャスレッドが実行中だったコールバックを再現する
+        handler = FakeCameraHandler()
+        burst = BurstCapture(handler, frame_count=2, keep_count=1)
+        burst.start('/photos/cancelled')
+        stale_listener = handler.listeners[0]
+        stale_listener(1, 1.0, make_frame(True))
+        burst.cancel()
+        stale_listener(2, 2.0, make_frame(True))
+        self.assertFalse(burst.busy)
+
+        # 次の連写にも古いコールバックのフレームは混ざらない
+        burst.start('/photos/next')
+        stale_listener(3, 3.0, make_frame(True))
+        for frame_id in (4, 5):
+            handler.emit(frame_id, make_frame(False))
+        wait_until_idle(burst)
+        self.assertEqual([path for path, _ in handler.saved], ['/photos/next_1.jpg'])
+        self.assertEqual(sharpness(handler.saved[0][1]), sharpness(make_frame(False)))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -8,6 +8,7 @@ from unittest import mock
 import cv2
 import numpy as np  # NumPyをインポート
 import threading  # threading.Event を使用
+import time
 
 # srcディレクトリをPythonのパスに追加
 current_dir = os.path.dirname(os.path.abspath(__file__))
@@ -92,5 +93,73 @@ class TestCameraHandler(unittest.TestCase):
         camera.initialize_camera()
         self.assertTrue(os.path.exists(self.test_photo_dir))
 
+    @mock.patch('photo_capture.get_screen_sizes', return_value=(1920, 1080))
+    @mock.patch('cv2.VideoCapture')
+    def test_capture_thread_keeps_latest_frame(self, mock_video_capture, mock_get_screen_sizes):
+        # キャプチャスレッドが最新フレームのみを保持することを確認
+        mock_cap = mock.Mock()
+        mock_cap.isOpened.return_value = True
+        frames = [np.full((4, 4, 3), i % 256, dtype=np.uint8) for i in range(1000)]
+        frame_iter = iter(frames)
+
+        def read():
+            try:
+                return True, next(frame_iter)
+            except StopIteration:
+                return False, None
+        mock_cap.read.side_effect = read
+        mock_video_capture.return_value = mock_cap
+
+        camera = CameraHandler(photo_directory=self.test_photo_dir)
+        self.assertTrue(camera.initialize_camera())
+        self.assertTrue(camera.start_capture_thread())
+        try:
+            deadline = time.time() + 2.0
+            while camera.get_latest_frame()[0] < len(frames) and time.time() < deadline:
+                time.sleep(0.01)
+            frame_id, frame_time, frame = camera.get_latest_frame()
+            self.assertEqual(frame_id, len(frames))
+            self.assertGreater(frame_time, 0.0)
+            self.assertIs(frame, frames[-1])
+        finally:
+            camera.release_camera()
+        self.assertIsNone(camera.cap)
+
+    @mock.patch('photo_capture.get_screen_sizes', return_value=(1920, 1080))
+    @mock.patch('cv2.VideoCapture')
+    def test_release_waits_for_blocked_read(self, mock_video_capture, mock_get_screen_sizes):
+        # read() の途中で停止が間に合わない場合、デバイスは read() が戻ってから解放されることを確認
+        mock_cap = mock.Mock()
+        mock_cap.isOpened.return_value = True
+        reading = threading.Event()
+        unblock = threading.Event()
+
+        def read():
+            reading.set()
+            unblock.wait(5.0)
+            return False, None
+        mock_cap.read.side_effect = read
+        mock_video_capture.return_value = mock_cap
+
+        camera = CameraHandler(photo_directory=self.test_photo_dir)
+        self.assertTrue(camera.initialize_camera())
+        self.assertTrue(camera.start_capture_thread())
+        thread = camera._capture_thread
+        self.assertTrue(reading.wait(2.0))
+        camera.release_camera()
+        self.assertIsNone(camera.cap)
+        mock_cap.release.assert_not_called()
+
+        unblock.set()
+        thread.join(2.0)
+        self.assertFalse(thread.is_alive())
+        mock_cap.release.assert_called_once()
+
+    @mock.patch('photo_capture.get_screen_sizes', return_value=(1920, 1080))
+    def test_capture_thread_requires_camera(self, mock_get_screen_sizes):
+        # カメラ未初期化の場合はキャプチャスレッドを開始しないことを確認
+        camera = CameraHandler(photo_directory=self.test_photo_dir)
+        self.assertFalse(camera.start_capture_thread())
+
 if __name__ == '__main__':
     unittest.main()
@@ -0,0 +1,105 @@
+# tests/test_camera_session.py
+
+import sys
+import os
+import time
+import tempfile
+import unittest
+from unittest import mock
+import numpy as np
+
+# srcディレクトリをPythonのパスに追加
+current_dir = os.path.dirname(os.path.abspath(__file__))
+parent_dir = os.path.abspath(os.path.join(current_dir, '..'))
+src_dir = os.path.join(parent_dir, 'src')
+sys.path.insert(0, src_dir)
+
+from photo_capture import CameraHandler
+from camera_session import CameraSession
+
+
+def wait_for(predicate, timeout=2.0):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        if predicate():
+            return True
+        time.sleep(0.01)
+    return predicate()
+
+
+def create_mock_cap():
+    mock_cap = mock.Mock()
+    mock_cap.isOpened.return_value = True
+    frame = np.zeros((4, 4, 3), dtype=np.uint8)
+
+    def read():
+        time.sleep(0.001)
+        return True, frame
+
+    def grab():
+        time.sleep(0.001)
+        return True
+    mock_cap.read.side_effect = read
+    mock_cap.grab.side_effect = grab
+    return mock_cap
+
+
+@mock.patch('photo_capture.get_screen_sizes', return_value=(1920, 1080))
+@mock.patch('cv2.VideoCapture')
+class TestCameraSession(unittest.TestCase):
+    def setUp(self):
+        self.temp_dir = tempfile.TemporaryDirectory()
+
+    def tearDown(self):
+        self.temp_dir.cleanup()
+
+    def test_release_keeps_camera_open(self, mock_video_capture, mock_get_screen_sizes):
+        mock_video_capture.side_effect = lambda *args: create_mock_cap()
+        camera = CameraHandler(photo_directory=self.temp_dir.name)
+        session = CameraSession(camera)
+        try:
+            self.assertTrue(session.acquire())
+            self.assertTrue(wait_for(lambda: camera.get_latest_frame()[2] is not None))
+
+            session.release()
+            self.assertTrue(camera.capture_idle)
+            self.assertTrue(camera.is_camera_open())
+            self.assertIsNone(camera.get_latest_frame()[2])
+            # アイドル中はフレームを読み捨てるだけで、最新フレームを更新しない
+            self.assertTrue(wait_for(lambda: camera.cap.grab.call_count > 0))
+            self.assertIsNone(camera.get_latest_frame()[2])
+
+            # 再度使用するときはデバイスを開き直さない
+            self.assertTrue(session.acquire())
+            self.assertEqual(mock_video_capture.call_count, 1)
+            self.assertTrue(wait_for(lambda: camera.get_latest_frame()[2] is not None))
+        finally:
+            session.close()
+        self.assertIsNone(camera.cap)
+
+    def test_idle_timeout_closes_device(self, mock_video_capture, mock_get_screen_sizes):
+        mock_video_capture.side_effect = lambda *args: create_mock_cap()
+        camera = CameraHandler(photo_directory=self.temp_dir.name)
+        session = CameraSession(camera, idle_timeout=0.05)
+        try:
+            self.assertTrue(session.acquire())
+            session.release()
+            self.assertTrue(wait_for(lambda: camera.cap is None))
+
+            # 閉じた後に使用する場合は開き直す
+            self.assertTrue(session.acquire())
+            self.assertEqual(mock_video_capture.call_count, 2)
+        finally:
+            session.close()
+
+    def test_acquire_fails_without_camera(self, mock_video_capture, mock_get_screen_sizes):
+        mock_cap = mock.Mock()
+        mock_cap.isOpened.return_value = False
+        mock_video_capture.return_value = mock_cap
+        session = CameraSession(CameraHandler(photo_directory=self.temp_dir.name))
+        self.assertFalse(session.acquire())
+        self.assertFalse(session.active)
+
+
+if __name__ == '__main__':
+    unittest.main()
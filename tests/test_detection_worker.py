@@ -0,0 +1,153 @@
+# tests/test_detection_worker.py
+
+import sys
+import os
+import time
+import threading
+import unittest
+from unittest import mock
+import numpy as np
+
+# srcディレクトリをPythonのパスに追加
+current_dir = os.path.dirname(os.path.abspath(__file__))
+parent_dir = os.path.abspath(os.path.join(current_dir, '..'))
+src_dir = os.path.join(parent_dir, 'src')
+sys.path.insert(0, src_dir)
+
+from detection_worker import DetectionWorker, DetectionResult, detect_faces_and_smiles
+
+
+def wait_for_result(worker, frame_id, timeout=2.0):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        result = worker.get_latest_result()
+        if result is not None and result.frame_id >= frame_id:
+            return result
+        time.sleep(0.01)
+    return worker.get_latest_result()
+
+
+class TestDetectFacesAndSmiles(unittest.TestCase):
+    def test_smile_rects_are_in_frame_coordinates(self):
+        # 笑顔の矩形が顔の ROI ではなくフレーム座標で返されることを確認
+        face_cascade = mock.Mock()
+        face_cascade.detectMultiScale.return_value = [(10, 20, 50, 50)]
+        smile_cascade = mock.Mock()
+        smile_cascade.detectMultiScale.return_value = [(5, 30, 20, 10)]
+
+        frame = np.zeros((120, 160, 3), dtype=np.uint8)
+        faces, smiles = detect_faces_and_smiles(frame, face_cascade, smile_cascade)
+
+        self.assertEqual(faces, [(10, 20, 50, 50)])
+        self.assertEqual(smiles, [[(15, 50, 20, 10)]])
+
+    def test_downscaled_detection_maps_back_to_frame(self):
+        # 縮小画像で検出した矩形が元の解像度の座標に変換されることを確認
+        face_cascade = mock.Mock()
+        face_cascade.detectMultiScale.return_value = [(40, 30, 80, 80)]
+        smile_cascade = mock.Mock()
+        smile_cascade.detectMultiScale.return_value = [(10, 50, 40, 20)]
+
+        frame = np.zeros((960, 1280, 3), dtype=np.uint8)
+        faces, smiles = detect_faces_and_smiles(
+            frame, face_cascade, smile_cascade, detection_width=320, smile_roi_width=80
+        )
+
+        # 顔検出は幅 320 の画像で行われる
+        gray = face_cascade.detectMultiScale.call_args[0][0]
+        self.assertEqual(gray.shape, (240, 320))
+        self.assertEqual(faces, [(160, 120, 320, 320)])
+
+        # 笑顔検出は幅 80 に縮小された顔領域で行われる
+        roi_gray = smile_cascade.detectMultiScale.call_args[0][0]
+        self.assertEqual(roi_gray.shape, (80, 80))
+        self.assertEqual(smiles, [[(200, 320, 160, 80)]])
+
+    def test_smile_detected_property(self):
+        self.assertFalse(DetectionResult(1, 0.0, [(0, 0, 1, 1)], [[]]).smile_detected)
+        self.assertTrue(DetectionResult(1, 0.0, [(0, 0, 1, 1)], [[(0, 0, 1, 1)]]).smile_detected)
+
+
+class TestDetectionWorker(unittest.TestCase):
+    def setUp(self):
+        self.face_cascade = mock.Mock()
+        self.face_cascade.detectMultiScale.return_value = [(0, 0, 10, 10)]
+        self.smile_cascade = mock.Mock()
+        self.smile_cascade.detectMultiScale.return_value = []
+        self.worker = DetectionWorker(self.face_cascade, self.smile_cascade, '/nonexistent')
+
+    def tearDown(self):
+        self.worker.shutdown()
+
+    def test_publishes_latest_result_with_timestamp(self):
+        frame = np.zeros((20, 20, 3), dtype=np.uint8)
+        self.assertTrue(self.worker.submit(1, 123.0, frame))
+
+        result = wait_for_result(self.worker, 1)
+        self.assertIsNotNone(result)
+        self.assertEqual(result.frame_id, 1)
+        self.assertEqual(result.timestamp, 123.0)
+        self.assertEqual(result.faces, [(0, 0, 10, 10)])
+        self.assertFalse(result.smile_detected)
+
+    def test_drops_frames_while_busy(self):
+        # 検出中に投入されたフレームは破棄されることを確認
+        release = threading.Event()
+
+        def slow_detect(*args, **kwargs):
+            release.wait(2.0)
+            return []
+        self.face_cascade.detectMultiScale.side_effect = slow_detect
+
+        frame = np.zeros((20, 20, 3), dtype=np.uint8)
+        self.assertTrue(self.worker.submit(1, 1.0, frame))
+        self.assertFalse(self.worker.submit(2, 2.0, frame))
+        release.set()
+
+        result = wait_for_result(self.worker, 1)
+        self.assertEqual(result.frame_id, 1)
+
+    def test_tracking_searches_around_previous_face(self):
+        # 顔を見つけた後は周辺領域のみを検索し、指定回数後に全体検索に戻ることを確認
+        worker = DetectionWorker(self.face_cascade, self.smile_cascade, '/nonexistent',
+                                 tracking_frames=2, tracking_margin=0.5)
+        self.face_cascade.detectMultiScale.return_value = [(40, 40, 20, 20)]
+        frame = np.zeros((200, 200, 3), dtype=np.uint8)
+        try:
+            scans = []
+            for frame_id in range(1, 5):
+                self.assertTrue(worker.submit(frame_id, float(frame_id), frame))
+                result = wait_for_result(worker, frame_id)
+                scans.append(result.full_scan)
+                gray = self.face_cascade.detectMultiScale.call_args[0][0]
+                if not result.full_scan:
+                    # 周辺領域 (30, 30, 40, 40) のみが検索される
+                    self.assertEqual(gray.shape, (40, 40))
+        finally:
+            worker.shutdown()
+
+        self.assertEqual(scans, [True, False, False, True])
+        self.assertEqual(worker.full_scan_count, 2)
+        self.assertEqual(worker.tracked_scan_count, 2)
+
+    def test_tracking_falls_back_to_full_scan_on_loss(self):
+        worker = DetectionWorker(self.face_cascade, self.smile_cascade, '/nonexistent', tracking_frames=10)
+        frame = np.zeros((200, 200, 3), dtype=np.uint8)
+        try:
+            worker.submit(1, 1.0, frame)
+            wait_for_result(worker, 1)
+            self.face_cascade.detectMultiScale.return_value = []
+            worker.submit(2, 2.0, frame)
+            self.assertFalse(wait_for_result(worker, 2).full_scan)
+            worker.submit(3, 3.0, frame)
+            self.assertTrue(wait_for_result(worker, 3).full_scan)
+        finally:
+            worker.shutdown()
+
+    def test_invalid_executor_type(self):
+        with self.assertRaises(ValueError):
+            DetectionWorker(self.face_cascade, self.smile_cascade, '/nonexistent', executor_type='gpu')
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,81 @@
+# tests/test_display_geometry.py
+
+import sys
+import os
+import unittest
+from unittest import mock
+
+# srcディレクトリをPythonのパスに追加
+current_dir = os.path.dirname(os.path.abspath(__file__))
+parent_dir = os.path.abspath(os.path.join(current_dir, '..'))
+src_dir = os.path.join(parent_dir, 'src')
+sys.path.insert(0, src_dir)
+
+from display_geometry import DisplayGeometry
+
+
+class TestDisplayGeometry(unittest.TestCase):
+    def test_size_is_resolved_once(self):
+        resolver = mock.Mock(return_value=(1920, 1080))
+        geometry = DisplayGeometry(resolver)
+        self.assertEqual(geometry.get_size(), (1920, 1080))
+        self.assertEqual(geometry.get_size(), (1920, 1080))
+        resolver.assert_called_once()
+
+        # 取得済みの場合は別の resolver も使わない
+        other = mock.Mock(return_value=(800, 480))
+        self.assertEqual(geometry.get_size(other), (1920, 1080))
+        other.assert_not_called()
+
+    def test_listeners_are_notified_on_change(self):
+        geometry = DisplayGeometry(lambda: (1920, 1080))
+        geometry.get_size()
+        listener = mock.Mock()
+        geometry.add_listener(listener)
+
+        self.assertFalse(geometry.set_size((1920, 1080)))
+        listener.assert_not_called()
+        self.assertTrue(geometry.set_size((1280, 720)))
+        listener.assert_called_once_with((1280, 720))
+        self.assertEqual(geometry.get_size(), (1280, 720))
+
+        geometry.remove_listener(listener)
+        geometry.set_size((800, 480))
+        listener.assert_called_once()
+
+    def test_watch_checks_screen_size_on_configure(self):
+        geometry = DisplayGeometry(lambda: (1920, 1080))
+        top_level = mock.Mock()
+        top_level.winfo_screenwidth.return_value = 1280
+        top_level.winfo_screenheight.return_value = 720
+        geometry.watch(top_level)
+        geometry.watch(top_level)  # 同じウィンドウは一度だけ監視する
+        top_level.bind.assert_called_once()
+        on_configure = top_level.bind.call_args[0][1]
+
+        # 子ウィジェットのイベントは無視する
+        on_configure(mock.Mock(widget=mock.Mock()))
+        top_level.winfo_screenwidth.assert_not_called()
+
+        on_configure(mock.Mock(widget=top_level))
+        self.assertEqual(geometry.get_size(), (1280, 720))
+
+    def test_size_from_window_is_not_reported_as_change(self):
+        # キオスクは最初のサイズも監視と同じウィンドウから取得する
+        screeninfo = mock.Mock(return_value=(1920, 1080))
+        geometry = DisplayGeometry(screeninfo)
+        top_level = mock.Mock()
+        top_level.winfo_screenwidth.return_value = 1280
+        top_level.winfo_screenheight.return_value = 720
+        geometry.get_size(lambda: (top_level.winfo_screenwidth(), top_level.winfo_screenheight()))
+        geometry.watch(top_level)
+        listener = mock.Mock()
+        geometry.add_listener(listener)
+
+        top_level.bind.call_args[0][1](mock.Mock(widget=top_level))
+        listener.assert_not_called()
+        screeninfo.assert_not_called()
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,93 @@
+# tests/test_frame_buffer.py
+
+import sys
+import os
+import unittest
+import numpy as np
+
+# srcディレクトリをPythonのパスに追加
+current_dir = os.path.dirname(os.path.abspath(__file__))
+parent_dir = os.path.abspath(os.path.join(current_dir, '..'))
+src_dir = os.path.join(parent_dir, 'src')
+sys.path.insert(0, src_dir)
+
+from frame_buffer import FrameRingBuffer
+from detection_worker import DetectionResult, smile_score
+
+
+def make_frame(value):
+    return np.full((4, 6, 3), value, dtype=np.uint8)
+
+
+class TestFrameRingBuffer(unittest.TestCase):
+    def test_overwrites_oldest_frames(self):
+        buffer = FrameRingBuffer(3)
+        for i in range(1, 6):
+            buffer.push(i, float(i), make_frame(i))
+        self.assertEqual(len(buffer), 3)
+
+        # 上書きされたフレームにはスコアを設定できない
+        self.assertFalse(buffer.set_score(1, 1.0))
+        self.assertTrue(buffer.set_score(5, 1.0))
+
+    def test_frames_are_copied(self):
+        buffer = FrameRingBuffer(2)
+        frame = make_frame(10)
+        buffer.push(1, 1.0, frame)
+        frame[:] = 99  # 元のフレームを変更してもバッファには影響しない
+        _, _, stored, _ = buffer.best_frame(0.0, 2.0)
+        self.assertTrue((stored == 10).all())
+
+    def test_best_frame_prefers_highest_score_in_window(self):
+        buffer = FrameRingBuffer(10)
+        for i in range(1, 8):
+            buffer.push(i, float(i), make_frame(i))
+        buffer.set_score(2, 5.0)  # 範囲外
+        buffer.set_score(4, 1.5)
+        buffer.set_score(5, 1.2)
+
+        frame_id, timestamp, frame, score = buffer.best_frame(3.0, 6.0)
+        self.assertEqual(frame_id, 4)
+        self.assertEqual(timestamp, 4.0)
+        self.assertTrue((frame == 4).all())
+        self.assertEqual(score, 1.5)
+
+    def test_best_frame_without_scores_uses_reference_time(self):
+        buffer = FrameRingBuffer(10)
+        for i in range(1, 8):
+            buffer.push(i, float(i), make_frame(i))
+        frame_id, _, _, _ = buffer.best_frame(2.0, 7.0, reference_time=3.2)
+        self.assertEqual(frame_id, 3)
+        self.assertIsNone(buffer.best_frame(10.0, 11.0))
+
+    def test_reallocates_on_frame_size_change(self):
+        buffer = FrameRingBuffer(2)
+        buffer.push(1, 1.0, make_frame(1))
+        buffer.push(2, 2.0, np.zeros((8, 8, 3), dtype=np.uint8))
+        self.assertEqual(len(buffer), 1)
+
+    def test_max_bytes_limits_slots(self):
+        frame = np.zeros((10, 10, 3), dtype=np.uint8)  # 300 バイト
+        buffer = FrameRingBuffer(10, max_bytes=1000)
+        for frame_id in range(5):
+            buffer.push(frame_id, float(frame_id), frame)
+        self.assertEqual(len(buffer), 3)
+        self.assertEqual(buffer.nbytes, 900)
+        self.assertEqual(buffer.best_frame(0.0, 10.0, reference_time=0.0)[0], 2)
+
+    def test_invalid_capacity(self):
+        with self.assertRaises(ValueError):
+            FrameRingBuffer(0)
+
+
+class TestSmileScore(unittest.TestCase):
+    def test_score(self):
+        self.assertEqual(smile_score(DetectionResult(1, 0.0, [(0, 0, 10, 10)], [[]])), 0.0)
+        small = smile_score(DetectionResult(1, 0.0, [(0, 0, 10, 10)], [[(0, 0, 2, 2)]]))
+        large = smile_score(DetectionResult(1, 0.0, [(0, 0, 10, 10)], [[(0, 0, 5, 4)]]))
+        self.assertGreater(small, 0.0)
+        self.assertGreater(large, small)
+
+
+if __name__ == '__main__':
+    unittest.main()
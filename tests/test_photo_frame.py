@@ -60,11 +60,12 @@ class TestPhotoFrame(unittest.TestCase):
         app = pf.PhotoFrame()
 
         # show_photo が画像を読み込み、リサイズ、表示できることを確認
-        with patch.object(app.canvas, 'create_image') as mock_create_image, \
+        with patch.object(app.canvas, 'itemconfigure') as mock_itemconfigure, \
              patch.object(app.canvas, "delete") as mock_delete:
+            app.photo_image = None
             app.show_photo()
-            mock_create_image.assert_called()  # 画像が描画されたことを確認
-            mock_delete.assert_called_with("all")  # 既存画像が削除されたことを確認
+            mock_itemconfigure.assert_called()  # 既存のキャンバスアイテムの画像が差し替えられたことを確認
+            mock_delete.assert_not_called()  # キャンバスのアイテムを作り直さないことを確認
 
     def test_no_photos(self):
         # 画像のないディレクトリを指定した場合のテスト
@@ -88,5 +89,36 @@ class TestPhotoFrame(unittest.TestCase):
             # show_photo()がエラーで停止せず、次の画像の表示に進むことを確認
             self.assertEqual(app.current, 1 % len(app.photos))
 
+class TestDisplayImage(unittest.TestCase):
+    """display_image の PhotoImage の再利用（Tk のウィンドウを作成せずに確認する）"""
+
+    def setUp(self):
+        self.frame = MagicMock()
+        self.frame.photo_image = None
+        self.frame.photo_image_mode = None
+
+    def _display(self, img):
+        with patch.object(pf.ImageTk, 'PhotoImage') as mock_photo_image:
+            mock_photo_image.side_effect = lambda image: MagicMock(
+                width=MagicMock(return_value=image.width), height=MagicMock(return_value=image.height))
+            pf.PhotoFrame.display_image(self.frame, img)
+            return mock_photo_image
+
+    def test_reuses_photo_image_with_same_size_and_mode(self):
+        self._display(Image.new('RGB', (10, 10)))
+        photo = self.frame.photo_image
+        mock_photo_image = self._display(Image.new('RGB', (10, 10)))
+        mock_photo_image.assert_not_called()
+        photo.paste.assert_called_once()
+
+    def test_recreates_photo_image_when_mode_changes(self):
+        self._display(Image.new('L', (10, 10)))
+        photo = self.frame.photo_image
+        mock_photo_image = self._display(Image.new('RGB', (10, 10)))
+        mock_photo_image.assert_called_once()
+        photo.paste.assert_not_called()
+        self.assertEqual(self.frame.photo_image_mode, 'RGB')
+
+
 if __name__ == '__main__':
     unittest.main()
\ No newline at end of file
@@ -0,0 +1,146 @@
+# tests/test_photo_index.py
+
+import sys
+import os
+import time
+import tempfile
+import unittest
+from PIL import Image
+
+# srcディレクトリをPythonのパスに追加
+current_dir = os.path.dirname(os.path.abspath(__file__))
+parent_dir = os.path.abspath(os.path.join(current_dir, '..'))
+src_dir = os.path.join(parent_dir, 'src')
+sys.path.insert(0, src_dir)
+
+from photo_index import PhotoIndex, is_photo_file, read_photo_info
+
+
+def wait_for(predicate, timeout=3.0):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        if predicate():
+            return True
+        time.sleep(0.01)
+    return predicate()
+
+
+def create_test_image(path, width=80, height=60, taken_at=None):
+    img = Image.new('RGB', (width, height), 'red')
+    if taken_at:
+        exif = Image.Exif()
+        exif[0x0132] = taken_at
+        img.save(path, exif=exif)
+    else:
+        img.save(path)
+
+
+class TestPhotoIndex(unittest.TestCase):
+    def setUp(self):
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.photo_dir = os.path.join(self.temp_dir.name, 'photos')
+        os.makedirs(self.photo_dir)
+        self.database_path = os.path.join(self.temp_dir.name, 'index.sqlite3')
+
+    def tearDown(self):
+        self.temp_dir.cleanup()
+
+    def test_is_photo_file(self):
+        self.assertTrue(is_photo_file('a.JPG'))
+        self.assertFalse(is_photo_file('.a.jpg.tmp'))
+        self.assertFalse(is_photo_file('.hidden.jpg'))
+        self.assertFalse(is_photo_file('notes.txt'))
+
+    def test_read_photo_info(self):
+        path = os.path.join(self.photo_dir, 'a.jpg')
+        create_test_image(path, taken_at='2024:05:01 12:34:56')
+        self.assertEqual(read_photo_info(path), (80, 60, '2024-05-01 12:34:56'))
+
+    def test_refresh_is_incremental(self):
+        create_test_image(os.path.join(self.photo_dir, 'b.jpg'))
+        create_test_image(os.path.join(self.photo_dir, 'a.png'))
+        index = PhotoIndex(self.photo_dir, self.database_path)
+        self.assertEqual(index.refresh(), 2)
+        self.assertEqual(index.list_photos(), [os.path.join(self.photo_dir, n) for n in ('a.png', 'b.jpg')])
+        self.assertEqual(index.get_photo(os.path.join(self.photo_dir, 'b.jpg'))['width'], 80)
+
+        # 変更がなければ何も読み直さない
+        version = index.version
+        self.assertEqual(index.refresh(), 0)
+        self.assertEqual(index.version, version)
+
+        os.remove(os.path.join(self.photo_dir, 'a.png'))
+        self.assertEqual(index.refresh(), 1)
+        self.assertEqual(len(index), 1)
+        index.close()
+
+    def test_persisted_between_runs(self):
+        create_test_image(os.path.join(self.photo_dir, 'a.jpg'))
+        index = PhotoIndex(self.photo_dir, self.database_path)
+        index.refresh()
+        index.close()
+
+        # 走査しなくても前回の内容を使用できる
+        index = PhotoIndex(self.photo_dir, self.database_path)
+        self.assertEqual(index.list_photos(), [os.path.join(self.photo_dir, 'a.jpg')])
+        self.assertEqual(index.refresh(), 0)
+        index.close()
+
+    def test_list_page_by_captured_at(self):
+        create_test_image(os.path.join(self.photo_dir, 'a.jpg'), taken_at='2024:05:03 10:00:00')
+        create_test_image(os.path.join(self.photo_dir, 'b.jpg'), taken_at='2024:05:01 10:00:00')
+        create_test_image(os.path.join(self.photo_dir, 'c.jpg'), taken_at='2024:05:02 10:00:00')
+        index = PhotoIndex(self.photo_dir)
+        index.refresh()
+
+        first = index.list_page(2)
+        self.assertEqual([photo['name'] for photo in first], ['a.jpg', 'c.jpg'])
+        last = first[-1]
+        rest = index.list_page(2, after=(last['captured_at'], last['name']))
+        self.assertEqual([photo['name'] for photo in rest], ['b.jpg'])
+
+        ascending = index.list_page(10, descending=False, start='2024-05-02 00:00:00', end='2024-05-03 00:00:00')
+        self.assertEqual([photo['name'] for photo in ascending], ['c.jpg'])
+        index.close()
+
+    def test_migrates_database_without_captured_at(self):
+        import sqlite3
+        create_test_image(os.path.join(self.photo_dir, 'a.jpg'))
+        connection = sqlite3.connect(self.database_path)
+        connection.execute("CREATE TABLE photos (name TEXT PRIMARY KEY, size INTEGER NOT NULL, "
+                           "mtime_ns INTEGER NOT NULL, width INTEGER, height INTEGER, taken_at TEXT)")
+        connection.execute("INSERT INTO photos VALUES ('a.jpg', 1, 0, 80, 60, '2024-05-01 12:34:56')")
+        connection.commit()
+        connection.close()
+
+        index = PhotoIndex(self.photo_dir, self.database_path)
+        self.assertEqual(index.list_page(1)[0]['captured_at'], '2024-05-01 12:34:56')
+        index.close()
+
+    def test_missing_directory(self):
+        index = PhotoIndex(os.path.join(self.temp_dir.name, 'missing'))
+        self.assertEqual(index.refresh(), 0)
+        self.assertEqual(index.list_photos(), [])
+        index.close()
+
+    def _check_watching(self, use_inotify):
+        index = PhotoIndex(self.photo_dir, poll_interval=0.05)
+        index.start_watching(use_inotify=use_inotify)
+        try:
+            path = os.path.join(self.photo_dir, 'new.jpg')
+            create_test_image(path)
+            self.assertTrue(wait_for(lambda: index.list_photos() == [path]))
+            os.remove(path)
+            self.assertTrue(wait_for(lambda: index.list_photos() == []))
+        finally:
+            index.close()
+
+    def test_watching_with_inotify(self):
+        self._check_watching(use_inotify=True)
+
+    def test_watching_with_polling(self):
+        self._check_watching(use_inotify=False)
+
+
+if __name__ == '__main__':
+    unittest.main()
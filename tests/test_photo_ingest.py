@@ -0,0 +1,137 @@
+# tests/test_photo_ingest.py
+
+import sys
+import os
+import tempfile
+import time
+import unittest
+from unittest import mock
+from PIL import Image
+
+# srcディレクトリをPythonのパスに追加
+current_dir = os.path.dirname(os.path.abspath(__file__))
+parent_dir = os.path.abspath(os.path.join(current_dir, '..'))
+src_dir = os.path.join(parent_dir, 'src')
+sys.path.insert(0, src_dir)
+
+from photo_index import PhotoIndex
+from photo_ingest import PhotoIngester
+from rendition_cache import RenditionCache
+
+
+def wait_for(predicate, timeout=3.0):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        if predicate():
+            return True
+        time.sleep(0.01)
+    return predicate()
+
+
+class TestPhotoIngester(unittest.TestCase):
+    def setUp(self):
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.photo_directory = os.path.join(self.temp_dir.name, 'photos')
+        self.upload_directory = os.path.join(self.photo_directory, '.uploads')
+        os.makedirs(self.photo_directory)
+        self.cache = RenditionCache(os.path.join(self.temp_dir.name, 'renditions'))
+        self.photo_index = PhotoIndex(self.photo_directory)
+        self.ingester = PhotoIngester(self.photo_directory, self.upload_directory, self.photo_index,
+                                      renditions=[(self.cache, (100, 100))])
+
+    def tearDown(self):
+        self.ingester.stop()
+        self.photo_index.close()
+        self.temp_dir.cleanup()
+
+    def _upload(self, img, name='upload.tmp', **options):
+        path = os.path.join(self.upload_directory, name)
+        img.save(path, 'JPEG', **options)
+        return path
+
+    def test_publishes_photo_with_rendition(self):
+        upload_path = self._upload(Image.new('RGB', (400, 200), 'red'))
+        self.assertTrue(self.ingester.submit(upload_path, 'photo.jpg'))
+        self.ingester.join()
+
+        path = os.path.join(self.photo_directory, 'photo.jpg')
+        self.assertTrue(os.path.exists(path))
+        self.assertFalse(os.path.exists(upload_path))
+        self.assertTrue(self.cache.contains(path, (100, 100)))
+        self.assertEqual(self.photo_index.list_photos(), [path])
+
+    def test_watcher_sees_published_photo(self):
+        # スライドショー側（別プロセス）のインデックスはディレクトリの監視だけで写真を知る
+        kiosk_index = PhotoIndex(self.photo_directory)
+        kiosk_index.start_watching(use_inotify=True)
+        try:
+            time.sleep(0.1)  # 起動時の走査を終わらせてから取り込む
+            ingester = PhotoIngester(self.photo_directory, self.upload_directory)
+            ingester.submit(self._upload(Image.new('RGB', (40, 40), 'red')), 'photo.jpg')
+            ingester.join()
+            ingester.stop()
+            path = os.path.join(self.photo_directory, 'photo.jpg')
+            self.assertTrue(wait_for(lambda: kiosk_index.list_photos() == [path]))
+        finally:
+            kiosk_index.close()
+
+    def test_normalizes_orientation(self):
+        exif = Image.Exif()
+        exif[0x0112] = 6  # 90 度回転して表示する写真
+        upload_path = self._upload(Image.new('RGB', (400, 200), 'red'), exif=exif)
+        self.ingester.submit(upload_path, 'photo.jpg')
+        self.ingester.join()
+
+        with Image.open(os.path.join(self.photo_directory, 'photo.jpg')) as img:
+            self.assertEqual(img.size, (200, 400))
+            self.assertEqual(img.getexif().get(0x0112, 1), 1)
+
+    def test_does_not_overwrite_existing_photo(self):
+        Image.new('RGB', (10, 10), 'blue').save(os.path.join(self.photo_directory, 'photo.jpg'))
+        self.ingester.submit(self._upload(Image.new('RGB', (40, 40), 'red')), 'photo.jpg')
+        self.ingester.join()
+        self.assertTrue(os.path.exists(os.path.join(self.photo_directory, 'photo_1.jpg')))
+        with Image.open(os.path.join(self.photo_directory, 'photo.jpg')) as img:
+            self.assertEqual(img.size, (10, 10))
+
+    def test_does_not_overwrite_photo_created_while_publishing(self):
+        # 名前を決めてから公開するまでの間に同じ名前の写真（カメラの撮影など）が作られた場合
+        path = os.path.join(self.photo_directory, 'photo.jpg')
+        real_link = os.link
+
+        def link(source, destination):
+            if destination == path and not os.path.exists(path):
+                Image.new('RGB', (10, 10), 'blue').save(path)
+            return real_link(source, destination)
+
+        with mock.patch('photo_ingest.os.link', side_effect=link):
+            self.ingester.submit(self._upload(Image.new('RGB', (40, 40), 'red')), 'photo.jpg')
+            self.ingester.join()
+        with Image.open(path) as img:
+            self.assertEqual(img.size, (10, 10))
+        published = os.path.join(self.photo_directory, 'photo_1.jpg')
+        self.assertTrue(os.path.exists(published))
+        # 縮小版は公開したパスにだけ作成される
+        self.assertTrue(self.cache.contains(published, (100, 100)))
+        self.assertFalse(self.cache.contains(path, (100, 100)))
+
+    def test_rejects_invalid_image(self):
+        upload_path = os.path.join(self.upload_directory, 'upload.tmp')
+        with open(upload_path, 'wb') as f:
+            f.write(b'not an image')
+        self.ingester.submit(upload_path, 'photo.jpg')
+        self.ingester.join()
+        self.assertEqual(self.ingester.rejected_count, 1)
+        self.assertEqual(os.listdir(self.photo_directory), ['.uploads'])
+        self.assertEqual(os.listdir(self.upload_directory), [])
+
+    def test_queue_full(self):
+        ingester = PhotoIngester(self.photo_directory, self.upload_directory, max_queue_size=1)
+        ingester.start = lambda: None  # 取り込みを行わずにキューを一杯にする
+        self.assertTrue(ingester.submit('a.tmp', 'a.jpg'))
+        self.assertFalse(ingester.submit('b.tmp', 'b.jpg'))
+        self.assertEqual(ingester.get_stats()['dropped'], 1)
+
+
+if __name__ == '__main__':
+    unittest.main()
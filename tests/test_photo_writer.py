@@ -0,0 +1,77 @@
+# tests/test_photo_writer.py
+
+import sys
+import os
+import unittest
+import tempfile
+import threading
+from unittest import mock
+import cv2
+import numpy as np
+
+# srcディレクトリをPythonのパスに追加
+current_dir = os.path.dirname(os.path.abspath(__file__))
+parent_dir = os.path.abspath(os.path.join(current_dir, '..'))
+src_dir = os.path.join(parent_dir, 'src')
+sys.path.insert(0, src_dir)
+
+from photo_writer import PhotoWriter, write_file_atomically
+
+
+class TestPhotoWriter(unittest.TestCase):
+    def setUp(self):
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.writer = PhotoWriter(jpeg_quality=80, max_queue_size=2)
+
+    def tearDown(self):
+        self.writer.stop()
+        self.temp_dir.cleanup()
+
+    def test_writes_jpeg_in_background(self):
+        saved = []
+        self.writer.add_listener(saved.append)
+        frame = np.full((48, 64, 3), 128, dtype=np.uint8)
+        save_path = os.path.join(self.temp_dir.name, 'photo.jpg')
+
+        self.assertTrue(self.writer.submit(frame, save_path))
+        self.writer.stop()  # キューが空になるまで待つ
+
+        self.assertEqual(saved, [save_path])
+        self.assertEqual(cv2.imread(save_path).shape, (48, 64, 3))
+        # 一時ファイルが残っていないことを確認
+        self.assertEqual(os.listdir(self.temp_dir.name), ['photo.jpg'])
+        self.assertEqual(self.writer.get_stats()['written'], 1)
+
+    def test_drops_when_queue_is_full(self):
+        release = threading.Event()
+        original_write = self.writer._write
+
+        def blocked_write(frame, save_path):
+            release.wait(2.0)
+            original_write(frame, save_path)
+
+        frame = np.zeros((8, 8, 3), dtype=np.uint8)
+        with mock.patch.object(self.writer, '_write', side_effect=blocked_write):
+            results = [
+                self.writer.submit(frame, os.path.join(self.temp_dir.name, f"{i}.jpg"))
+                for i in range(5)
+            ]
+            release.set()
+            self.writer.stop()
+
+        self.assertIn(False, results)
+        stats = self.writer.get_stats()
+        self.assertEqual(stats['dropped'], results.count(False))
+        self.assertEqual(stats['written'], results.count(True))
+        self.assertLessEqual(stats['max_queue_depth'], 2)
+
+    def test_atomic_write_cleans_up_on_failure(self):
+        save_path = os.path.join(self.temp_dir.name, 'photo.jpg')
+        with mock.patch('photo_writer.os.replace', side_effect=OSError("rename failed")):
+            with self.assertRaises(OSError):
+                write_file_atomically(save_path, b'data')
+        self.assertEqual(os.listdir(self.temp_dir.name), [])
+
+
+if __name__ == '__main__':
+    unittest.main()
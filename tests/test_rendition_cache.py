@@ -0,0 +1,99 @@
+# tests/test_rendition_cache.py
+
+import sys
+import os
+import time
+import tempfile
+import unittest
+from unittest import mock
+from PIL import Image
+
+# srcディレクトリをPythonのパスに追加
+current_dir = os.path.dirname(os.path.abspath(__file__))
+parent_dir = os.path.abspath(os.path.join(current_dir, '..'))
+src_dir = os.path.join(parent_dir, 'src')
+sys.path.insert(0, src_dir)
+
+from rendition_cache import RenditionCache
+from slide_loader import SlidePrefetcher, load_slide
+
+
+def wait_for(predicate, timeout=2.0):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        if predicate():
+            return True
+        time.sleep(0.01)
+    return predicate()
+
+
+class TestRenditionCache(unittest.TestCase):
+    def setUp(self):
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.photo_path = os.path.join(self.temp_dir.name, 'photo.jpg')
+        Image.new('RGB', (800, 600), 'red').save(self.photo_path)
+        self.cache = RenditionCache(os.path.join(self.temp_dir.name, 'renditions'))
+
+    def tearDown(self):
+        self.temp_dir.cleanup()
+
+    def test_store_and_load(self):
+        self.assertIsNone(self.cache.load(self.photo_path, (400, 400)))
+        self.cache.store(self.photo_path, (400, 400), Image.new('RGB', (400, 300), 'red'))
+
+        self.assertTrue(self.cache.contains(self.photo_path, (400, 400)))
+        self.assertFalse(self.cache.contains(self.photo_path, (200, 200)))
+        self.assertEqual(self.cache.load(self.photo_path, (400, 400)).size, (400, 300))
+
+    def test_key_changes_when_source_is_modified(self):
+        self.cache.store(self.photo_path, (400, 400), Image.new('RGB', (400, 300), 'red'))
+        Image.new('RGB', (600, 600), 'blue').save(self.photo_path)
+        stat = os.stat(self.photo_path)
+        os.utime(self.photo_path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1000000))
+
+        self.assertFalse(self.cache.contains(self.photo_path, (400, 400)))
+
+    def test_missing_source(self):
+        self.assertIsNone(self.cache.cache_path(os.path.join(self.temp_dir.name, 'missing.jpg'), (400, 400)))
+
+    def test_evicts_least_recently_used(self):
+        rendition = Image.new('RGB', (400, 300), 'red')
+        paths = []
+        for i in range(3):
+            path = os.path.join(self.temp_dir.name, f'photo{i}.jpg')
+            Image.new('RGB', (800, 600), 'red').save(path)
+            self.cache.store(path, (400, 400), rendition)
+            # 最終使用時刻の順序をはっきりさせる
+            os.utime(self.cache.cache_path(path, (400, 400)), (i, i))
+            paths.append(path)
+
+        entry_size = os.path.getsize(self.cache.cache_path(paths[0], (400, 400)))
+        self.cache.max_bytes = entry_size * 3
+        self.cache.store(self.photo_path, (400, 400), rendition)
+
+        self.assertFalse(self.cache.contains(paths[0], (400, 400)))
+        self.assertTrue(self.cache.contains(paths[2], (400, 400)))
+        self.assertTrue(self.cache.contains(self.photo_path, (400, 400)))
+
+    def test_load_slide_uses_cache(self):
+        first = load_slide(self.photo_path, (400, 400), self.cache)
+        self.assertTrue(self.cache.contains(self.photo_path, (400, 400)))
+
+        with mock.patch.object(self.cache, 'store') as store:
+            second = load_slide(self.photo_path, (400, 400), self.cache)
+        # キャッシュから読み込んだ場合は再度保存しない
+        store.assert_not_called()
+        self.assertEqual(first.size, second.size)
+
+    def test_prefetcher_warm_up(self):
+        prefetcher = SlidePrefetcher((400, 400), rendition_cache=self.cache)
+        prefetcher.start()
+        try:
+            prefetcher.warm_up([self.photo_path])
+            self.assertTrue(wait_for(lambda: self.cache.contains(self.photo_path, (400, 400))))
+        finally:
+            prefetcher.stop()
+
+
+if __name__ == '__main__':
+    unittest.main()
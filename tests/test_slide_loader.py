@@ -0,0 +1,115 @@
+# tests/test_slide_loader.py
+
+import sys
+import os
+import time
+import tempfile
+import unittest
+from unittest import mock
+from PIL import Image
+
+# srcディレクトリをPythonのパスに追加
+current_dir = os.path.dirname(os.path.abspath(__file__))
+parent_dir = os.path.abspath(os.path.join(current_dir, '..'))
+src_dir = os.path.join(parent_dir, 'src')
+sys.path.insert(0, src_dir)
+
+from slide_loader import SlidePrefetcher, fit_size, load_slide
+
+
+def wait_for(predicate, timeout=2.0):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        if predicate():
+            return True
+        time.sleep(0.01)
+    return predicate()
+
+
+class TestLoadSlide(unittest.TestCase):
+    def test_fit_size(self):
+        self.assertEqual(fit_size((4000, 3000), (1920, 1080)), (1440, 1080))
+        self.assertEqual(fit_size((1000, 200), (1920, 1080)), (1920, 384))
+
+    def test_load_slide(self):
+        with tempfile.TemporaryDirectory() as temp_dir:
+            path = os.path.join(temp_dir, 'photo.jpg')
+            Image.new('RGB', (800, 600), 'red').save(path)
+            img = load_slide(path, (400, 400))
+            self.assertEqual(img.size, (400, 300))
+
+
+    def test_large_jpeg_is_decoded_at_reduced_scale(self):
+        # 大きな JPEG は縮小された解像度でデコードされることを確認
+        with tempfile.TemporaryDirectory() as temp_dir:
+            path = os.path.join(temp_dir, 'large.jpg')
+            Image.new('RGB', (4000, 3000), 'blue').save(path)
+
+            decoded_sizes = []
+            original_resize = Image.Image.resize
+
+            def recording_resize(img, size, *args, **kwargs):
+                decoded_sizes.append(img.size)
+                return original_resize(img, size, *args, **kwargs)
+
+            with mock.patch.object(Image.Image, 'resize', autospec=True, side_effect=recording_resize):
+                img = load_slide(path, (800, 600))
+
+            self.assertEqual(img.size, (800, 600))
+            self.assertEqual(decoded_sizes, [(1000, 750)])  # 1/4 スケールでデコード
+
+    def test_png_is_loaded_without_draft(self):
+        with tempfile.TemporaryDirectory() as temp_dir:
+            path = os.path.join(temp_dir, 'photo.png')
+            Image.new('RGB', (800, 600), 'green').save(path)
+            self.assertEqual(load_slide(path, (400, 400)).size, (400, 300))
+
+
+class TestSlidePrefetcher(unittest.TestCase):
+    def setUp(self):
+        self.loaded = []
+
+        def loader(path, screen_size):
+            self.loaded.append(path)
+            if path == 'broken':
+                raise IOError("broken image")
+            return Image.new('RGB', screen_size)
+        self.prefetcher = SlidePrefetcher((10, 10), depth=2, max_bytes=10 * 10 * 3 * 2, loader=loader)
+        self.prefetcher.start()
+
+    def tearDown(self):
+        self.prefetcher.stop()
+
+    def test_prefetches_upcoming_photos(self):
+        self.prefetcher.prefetch(['a', 'b', 'c'])
+        self.assertTrue(wait_for(lambda: self.loaded == ['a', 'b']))  # depth 枚だけ読み込む
+
+        img = self.prefetcher.take('a')
+        self.assertEqual(img.size, (10, 10))
+        self.assertIsNone(self.prefetcher.take('a'))  # 取り出した写真はキャッシュから消える
+
+        self.prefetcher.prefetch(['b', 'c'])
+        self.assertTrue(wait_for(lambda: 'c' in self.loaded))
+        self.assertEqual(self.loaded.count('b'), 1)  # 読み込み済みの写真は再読み込みしない
+
+    def test_take_before_ready_returns_none(self):
+        self.assertIsNone(self.prefetcher.take('x'))
+
+    def test_respects_memory_limit(self):
+        self.prefetcher.max_bytes = 10 * 10 * 3  # 1 枚分
+        self.prefetcher.prefetch(['a', 'b'])
+        self.assertTrue(wait_for(lambda: self.loaded == ['a']))
+        time.sleep(0.05)
+        self.assertEqual(self.loaded, ['a'])
+
+        self.prefetcher.take('a')  # メモリが空いたら次を読み込む
+        self.assertTrue(wait_for(lambda: self.loaded == ['a', 'b']))
+
+    def test_broken_photo_is_skipped(self):
+        self.prefetcher.prefetch(['broken', 'a'])
+        self.assertTrue(wait_for(lambda: self.loaded == ['broken', 'a']))
+        self.assertIsNone(self.prefetcher.take('broken'))
+
+
+if __name__ == '__main__':
+    unittest.main()
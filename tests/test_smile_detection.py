@@ -0,0 +1,41 @@
+# tests/test_smile_detection.py
+
+import sys
+import os
+import unittest
+from unittest.mock import MagicMock
+
+# srcディレクトリをPythonのパスに追加
+current_dir = os.path.dirname(os.path.abspath(__file__))
+parent_dir = os.path.abspath(os.path.join(current_dir, '..'))
+src_dir = os.path.join(parent_dir, 'src')
+sys.path.insert(0, src_dir)
+
+import smile_detection as sd
+
+
+class TestSmileDetectionFramePause(unittest.TestCase):
+    """pause と撮影後の再開タイマー（Tk のウィンドウを作成せずに確認する）"""
+
+    def setUp(self):
+        self.frame = MagicMock()
+        self.frame.paused = False
+        self.frame.update_after_id = None
+        self.frame.capture_after_id = None
+        self.frame.after.return_value = 'after#1'
+
+    def test_pause_cancels_resume_detection(self):
+        self.frame.camera_handler.burst = None
+        self.frame.camera_handler.select_best_frame.return_value = None
+        sd.SmileDetectionFrame.capture_image(self.frame)
+        self.frame.after.assert_any_call(3000, self.frame.resume_detection)
+        self.assertEqual(self.frame.resume_after_id, 'after#1')
+
+        sd.SmileDetectionFrame.pause(self.frame)
+        self.frame.after_cancel.assert_any_call('after#1')
+        self.assertIsNone(self.frame.resume_after_id)
+        self.assertFalse(self.frame.is_capturing)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,77 @@
+# tests/test_text_overlay.py
+
+import sys
+import os
+import unittest
+import numpy as np
+from PIL import Image, ImageDraw, ImageFont
+
+# srcディレクトリをPythonのパスに追加
+current_dir = os.path.dirname(os.path.abspath(__file__))
+parent_dir = os.path.abspath(os.path.join(current_dir, '..'))
+src_dir = os.path.join(parent_dir, 'src')
+sys.path.insert(0, src_dir)
+
+from text_overlay import TextOverlayCache
+
+
+class TestTextOverlayCache(unittest.TestCase):
+    def setUp(self):
+        self.font = ImageFont.load_default()
+        self.cache = TextOverlayCache(max_entries=2)
+
+    def test_matches_pillow_rendering(self):
+        # Pillow でフレーム全体に描画した結果とほぼ一致することを確認
+        img = np.full((60, 120, 3), 40, dtype=np.uint8)
+        expected = Image.fromarray(img.copy())
+        ImageDraw.Draw(expected).text((10, 20), "Smile 123", font=self.font, fill=(0, 255, 0))
+        expected = np.array(expected)
+
+        result = self.cache.draw(img, "Smile 123", (10, 20), self.font, color=(0, 255, 0))
+
+        self.assertIs(result, img)  # 画像に直接描画される
+        diff = np.abs(result.astype(np.int16) - expected.astype(np.int16))
+        self.assertLessEqual(int(diff.max()), 1)
+        self.assertTrue((diff.sum(axis=2) == 0).mean() > 0.99)
+
+    def test_baseline_anchor_matches_pillow(self):
+        font = ImageFont.load_default(size=32)
+        img = np.zeros((80, 120, 3), dtype=np.uint8)
+        expected = Image.fromarray(img.copy())
+        ImageDraw.Draw(expected).text((10, 60), "3", font=font, fill=(255, 0, 0), anchor='ls')
+        expected = np.array(expected)
+
+        result = self.cache.draw(img, "3", (10, 60), font, color=(255, 0, 0), anchor='ls')
+
+        diff = np.abs(result.astype(np.int16) - expected.astype(np.int16))
+        self.assertLessEqual(int(diff.max()), 1)
+        # 文字はベースラインより上に描画される
+        changed = np.argwhere(result.any(axis=2))
+        self.assertTrue((changed[:, 0] <= 60).all())
+
+    def test_only_text_region_changes(self):
+        img = np.zeros((100, 200, 3), dtype=np.uint8)
+        self.cache.draw(img, "3", (150, 70), self.font, color=(255, 0, 0))
+        changed = np.argwhere(img.any(axis=2))
+        self.assertGreater(len(changed), 0)
+        self.assertTrue((changed[:, 0] >= 70).all())
+        self.assertTrue((changed[:, 1] >= 150).all())
+
+    def test_clips_outside_frame(self):
+        # 画像の外にはみ出す位置でもエラーにならないことを確認
+        img = np.zeros((20, 20, 3), dtype=np.uint8)
+        self.cache.draw(img, "Clipped", (-5, -8), self.font)
+        self.cache.draw(img, "Clipped", (500, 500), self.font)
+
+    def test_sprites_are_cached(self):
+        sprite1 = self.cache.get_sprite("a", self.font, (0, 255, 0))
+        self.assertIs(self.cache.get_sprite("a", self.font, (0, 255, 0)), sprite1)
+        self.assertIsNot(self.cache.get_sprite("a", self.font, (255, 0, 0)), sprite1)
+
+        # 上限を超えると古いものから破棄される
+        self.cache.get_sprite("b", self.font, (0, 255, 0))
+        self.assertIsNot(self.cache.get_sprite("a", self.font, (0, 255, 0)), sprite1)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,107 @@
+# tests/test_tracing.py
+
+import sys
+import os
+import logging
+import tempfile
+import unittest
+
+# srcディレクトリをPythonのパスに追加
+current_dir = os.path.dirname(os.path.abspath(__file__))
+parent_dir = os.path.abspath(os.path.join(current_dir, '..'))
+src_dir = os.path.join(parent_dir, 'src')
+sys.path.insert(0, src_dir)
+
+import tracing
+from tracing import ModuleLevelFilter, StartupTimer, TraceCounter, setup_tracing, shutdown_tracing
+
+
+def make_record(module, level):
+    record = logging.LogRecord('root', level, f'{module}.py', 1, 'message', None, None)
+    return record
+
+
+class TestModuleLevelFilter(unittest.TestCase):
+    def test_module_levels(self):
+        level_filter = ModuleLevelFilter('INFO', {'photoframe_tkinter': 'DEBUG', 'smile_detection': 'warning'})
+        self.assertEqual(level_filter.min_level, logging.DEBUG)
+        self.assertTrue(level_filter.filter(make_record('photoframe_tkinter', logging.DEBUG)))
+        self.assertFalse(level_filter.filter(make_record('smile_detection', logging.INFO)))
+        self.assertFalse(level_filter.filter(make_record('main', logging.DEBUG)))
+        self.assertTrue(level_filter.filter(make_record('main', logging.INFO)))
+
+    def test_invalid_level(self):
+        with self.assertRaises(ValueError):
+            ModuleLevelFilter('VERBOSE')
+
+
+class TestTraceCounter(unittest.TestCase):
+    def test_logs_summary_once_per_interval(self):
+        counter = TraceCounter('スライド表示', interval=3600)
+        with self.assertLogs(level='INFO') as logs:
+            counter.add(0.002)
+            counter.add(0.004)
+            logging.info('dummy')
+        self.assertEqual(logs.output, ['INFO:root:dummy'])
+
+        with self.assertLogs(level='INFO') as logs:
+            counter.flush()
+        self.assertIn('スライド表示: 2 回', logs.output[0])
+        self.assertIn('平均 3.0 ms, 最大 4.0 ms', logs.output[0])
+        self.assertEqual(counter.count, 0)
+
+    def test_interval_zero_logs_every_time(self):
+        counter = TraceCounter('test', interval=0)
+        with self.assertLogs(level='INFO') as logs:
+            counter.add()
+        self.assertIn('test: 1 回', logs.output[0])
+
+
+class TestSetupTracing(unittest.TestCase):
+    def setUp(self):
+        self.root = logging.getLogger()
+        self.saved_handlers = list(self.root.handlers)
+        self.saved_level = self.root.level
+        self.temp_dir = tempfile.TemporaryDirectory()
+
+    def tearDown(self):
+        shutdown_tracing()
+        for handler in list(self.root.handlers):
+            self.root.removeHandler(handler)
+        for handler in self.saved_handlers:
+            self.root.addHandler(handler)
+        self.root.setLevel(self.saved_level)
+        self.temp_dir.cleanup()
+
+    def test_writes_filtered_logs_in_background(self):
+        setup_tracing(self.temp_dir.name, {'level': 'WARNING', 'modules': {'test_tracing': 'DEBUG'}}, log_file='test.log')
+        self.assertEqual(self.root.level, logging.DEBUG)
+        logging.debug('デバッグ')
+        tracing.get_counter('カウンター', interval=3600).add()
+        shutdown_tracing()  # キューに残っているログとカウンターを書き出す
+
+        with open(os.path.join(self.temp_dir.name, 'logs', 'test.log'), encoding='utf-8') as file:
+            content = file.read()
+        self.assertIn('DEBUG:test_tracing:デバッグ', content)
+        # カウンターは tracing モジュールから出力され、既定のレベル（WARNING）で除外される
+        self.assertNotIn('カウンター', content)
+
+
+class TestStartupTimer(unittest.TestCase):
+    def test_report_is_ordered_by_elapsed_time(self):
+        timer = StartupTimer()
+        timer.marks.append(('モジュールの読み込み', 0.3))
+        timer.marks.append(('ウィンドウの表示', 0.1))
+        with self.assertLogs(level='INFO') as logs:
+            summary = timer.report()
+        self.assertEqual(summary, 'ウィンドウの表示 100 ms, モジュールの読み込み 300 ms')
+        self.assertIn('起動時間: ', logs.output[0])
+
+    def test_mark_returns_elapsed_seconds(self):
+        timer = StartupTimer()
+        self.assertGreaterEqual(timer.mark('設定の読み込み'), 0.0)
+        self.assertEqual(timer.marks[0][0], '設定の読み込み')
+
+
+if __name__ == '__main__':
+    unittest.main()
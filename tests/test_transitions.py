@@ -0,0 +1,106 @@
+# tests/test_transitions.py
+
+import sys
+import os
+import time
+import unittest
+import numpy as np
+from PIL import Image
+
+# srcディレクトリをPythonのパスに追加
+current_dir = os.path.dirname(os.path.abspath(__file__))
+parent_dir = os.path.abspath(os.path.join(current_dir, '..'))
+src_dir = os.path.join(parent_dir, 'src')
+sys.path.insert(0, src_dir)
+
+from transitions import TransitionRenderer, TRANSITION_CROSSFADE, TRANSITION_KENBURNS
+
+
+def wait_for(predicate, timeout=2.0):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        if predicate():
+            return True
+        time.sleep(0.01)
+    return predicate()
+
+
+class TestTransitionRenderer(unittest.TestCase):
+    def setUp(self):
+        self.black = Image.new('RGB', (40, 20), (0, 0, 0))
+        self.white = Image.new('RGB', (20, 30), (255, 255, 255))
+
+    def _render(self, mode, frame_count=4):
+        renderer = TransitionRenderer(mode, frame_count=frame_count)
+        renderer.start()
+        self.addCleanup(renderer.stop)
+        job_id = renderer.submit(self.black, self.white)
+        self.assertTrue(wait_for(lambda: renderer.frames_ready(job_id) == frame_count))
+        return renderer, job_id
+
+    def test_crossfade(self):
+        renderer, job_id = self._render(TRANSITION_CROSSFADE)
+        # 2 枚の外接矩形の大きさで作成される
+        self.assertEqual(renderer.get_frame(job_id, 0).shape, (30, 40, 3))
+        # 中央の画素は次第に白くなり、最後のフレームは次のスライドと一致する
+        centers = [int(renderer.get_frame(job_id, i)[15, 20, 0]) for i in range(4)]
+        self.assertEqual(centers, sorted(centers))
+        last = renderer.get_frame(job_id, 3)
+        self.assertEqual(int(last[15, 20, 0]), 255)
+        self.assertEqual(int(last[0, 0, 0]), 0)  # 次のスライドの外側は黒
+        self.assertIsNone(renderer.get_frame(job_id, 4))
+
+    def test_kenburns_last_frame_matches_next_slide(self):
+        renderer, job_id = self._render(TRANSITION_KENBURNS)
+        expected = np.zeros((30, 40, 3), dtype=np.uint8)
+        expected[:, 10:30] = 255
+        np.testing.assert_array_equal(renderer.get_frame(job_id, 3), expected)
+
+    def test_buffers_are_reused(self):
+        renderer, job_id = self._render(TRANSITION_CROSSFADE)
+        buffer = renderer._frames
+        job_id = renderer.submit(self.white, self.black)
+        self.assertTrue(wait_for(lambda: renderer.frames_ready(job_id) == 4))
+        self.assertIs(renderer._frames, buffer)
+
+    def _render_next(self, renderer, frame_count):
+        renderer.frame_count = frame_count
+        job_id = renderer.submit(self.white, self.black)
+        self.assertTrue(wait_for(lambda: renderer.frames_ready(job_id) == frame_count))
+
+    def test_buffer_is_not_reallocated_while_frame_count_recovers(self):
+        renderer, job_id = self._render(TRANSITION_CROSSFADE, frame_count=8)
+        buffer = renderer._frames
+        self.assertEqual(buffer.shape[0], 8)
+        # 少し減っただけの場合と、1 枚ずつ元に戻る間は同じバッファを使う
+        for frame_count in (6, 7, 8):
+            self._render_next(renderer, frame_count)
+            self.assertIs(renderer._frames, buffer)
+
+    def test_buffer_shrinks_when_frame_count_drops_by_half(self):
+        renderer, job_id = self._render(TRANSITION_CROSSFADE, frame_count=8)
+        self._render_next(renderer, 3)
+        self.assertEqual(renderer._frames.shape[0], 3)
+        # 足りなくなったときは最大のフレーム数で確保し、その後は確保し直さない
+        self._render_next(renderer, 4)
+        buffer = renderer._frames
+        self.assertEqual(buffer.shape[0], 8)
+        self._render_next(renderer, 5)
+        self.assertIs(renderer._frames, buffer)
+
+    def test_record_result_adapts_frame_count(self):
+        renderer = TransitionRenderer(TRANSITION_CROSSFADE, frame_count=24, min_frame_count=4)
+        renderer.record_result(10, 24)
+        self.assertEqual(renderer.frame_count, 10)
+        renderer.record_result(1, 10)
+        self.assertEqual(renderer.frame_count, 4)
+        renderer.record_result(4, 4)
+        self.assertEqual(renderer.frame_count, 5)
+
+    def test_invalid_mode(self):
+        with self.assertRaises(ValueError):
+            TransitionRenderer('wipe')
+
+
+if __name__ == '__main__':
+    unittest.main()
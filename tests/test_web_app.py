@@ -0,0 +1,265 @@
+# tests/test_web_app.py
+
+import sys
+import os
+import io
+import tempfile
+import threading
+import unittest
+import zipfile
+from PIL import Image
+from werkzeug.wsgi import FileWrapper
+
+# srcディレクトリをPythonのパスに追加
+current_dir = os.path.dirname(os.path.abspath(__file__))
+parent_dir = os.path.abspath(os.path.join(current_dir, '..'))
+src_dir = os.path.join(parent_dir, 'src')
+sys.path.insert(0, src_dir)
+
+from photo_index import PhotoIndex
+from web_app import create_app, KeyedLock, IMMUTABLE_CACHE_CONTROL
+
+
+def create_test_image(path, taken_at):
+    exif = Image.Exif()
+    exif[0x0132] = taken_at
+    Image.new('RGB', (40, 30), 'blue').save(path, exif=exif)
+
+
+class TestKeyedLock(unittest.TestCase):
+    def test_different_keys_do_not_block(self):
+        lock = KeyedLock()
+        acquired = threading.Event()
+
+        def hold_other_key():
+            with lock('b'):
+                acquired.set()
+
+        with lock('a'):
+            thread = threading.Thread(target=hold_other_key)
+            thread.start()
+            self.assertTrue(acquired.wait(2.0))
+            thread.join()
+
+    def test_same_key_is_serialized(self):
+        lock = KeyedLock()
+        acquired = threading.Event()
+
+        def hold_same_key():
+            with lock('a'):
+                acquired.set()
+
+        with lock('a'):
+            thread = threading.Thread(target=hold_same_key)
+            thread.start()
+            self.assertFalse(acquired.wait(0.1))
+        thread.join()
+        self.assertTrue(acquired.is_set())
+        # 使い終わったキーは残らない
+        self.assertEqual(len(lock), 0)
+
+
+class TestWebApp(unittest.TestCase):
+    def setUp(self):
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.photo_directory = os.path.join(self.temp_dir.name, 'photos')
+        os.makedirs(self.photo_directory)
+        self.photo_path = os.path.join(self.photo_directory, 'photo.jpg')
+        Image.new('RGB', (1600, 1200), 'red').save(self.photo_path)
+        self.photo_index = PhotoIndex(self.photo_directory)
+        self.photo_index.refresh()
+        self.app = create_app(self.photo_directory, os.path.join(self.temp_dir.name, 'thumbnails'),
+                              self.photo_index, thumbnail_size=160)
+        self.client = self.app.test_client()
+
+    def tearDown(self):
+        self.app.extensions['photo_ingester'].stop()
+        self.photo_index.close()
+        self.temp_dir.cleanup()
+
+    def test_dashboard_links_thumbnails(self):
+        response = self.client.get('/')
+        self.assertEqual(response.status_code, 200)
+        version = os.stat(self.photo_path).st_mtime_ns
+        self.assertIn(f'/thumbnail/photo.jpg?v={version}', response.get_data(as_text=True))
+
+    def test_thumbnail_is_small_jpeg(self):
+        response = self.client.get('/thumbnail/photo.jpg')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.mimetype, 'image/jpeg')
+        self.assertIsNotNone(response.headers.get('ETag'))
+        self.assertIsNotNone(response.headers.get('Last-Modified'))
+        self.assertEqual(response.headers['Cache-Control'], 'no-cache')
+        with Image.open(io.BytesIO(response.data)) as img:
+            self.assertEqual(img.size, (160, 120))
+
+    def test_thumbnail_not_modified(self):
+        etag = self.client.get('/thumbnail/photo.jpg').headers['ETag']
+        response = self.client.get('/thumbnail/photo.jpg', headers={'If-None-Match': etag})
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response.data, b'')
+
+    def test_versioned_thumbnail_is_immutable(self):
+        version = os.stat(self.photo_path).st_mtime_ns
+        response = self.client.get(f'/thumbnail/photo.jpg?v={version}')
+        self.assertEqual(response.headers['Cache-Control'], IMMUTABLE_CACHE_CONTROL)
+
+    def test_thumbnail_changes_with_photo(self):
+        etag = self.client.get('/thumbnail/photo.jpg').headers['ETag']
+        Image.new('RGB', (800, 600), 'blue').save(self.photo_path)
+        os.utime(self.photo_path, ns=(0, os.stat(self.photo_path).st_mtime_ns + 10 ** 9))
+        response = self.client.get('/thumbnail/photo.jpg', headers={'If-None-Match': etag})
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response.headers['ETag'], etag)
+
+    def test_download_photo(self):
+        response = self.client.get('/download/photo.jpg')
+        self.assertEqual(response.status_code, 200)
+        with open(self.photo_path, 'rb') as f:
+            self.assertEqual(response.data, f.read())
+        response.close()
+
+    def test_download_range(self):
+        with open(self.photo_path, 'rb') as f:
+            data = f.read()
+        response = self.client.get('/download/photo.jpg', headers={'Range': 'bytes=10-19'})
+        self.assertEqual(response.status_code, 206)
+        self.assertEqual(response.data, data[10:20])
+        self.assertEqual(response.headers['Content-Length'], '10')
+        self.assertEqual(response.headers['Content-Range'], f'bytes 10-19/{len(data)}')
+        response.close()
+
+    def test_download_range_uses_file_wrapper(self):
+        wrapped = []
+
+        def file_wrapper(file, block_size):
+            wrapped.append(file.tell())
+            return iter(lambda: file.read(block_size), b'')
+
+        response = self.client.get('/download/photo.jpg', headers={'Range': 'bytes=100-'},
+                                   environ_overrides={'wsgi.file_wrapper': file_wrapper})
+        self.assertEqual(response.status_code, 206)
+        # サーバーには開始位置に seek したファイルが渡される
+        self.assertEqual(wrapped[-1], 100)
+        response.close()
+
+    def test_download_range_with_file_wrapper_is_limited(self):
+        with open(self.photo_path, 'rb') as f:
+            data = f.read()
+        response = self.client.get('/download/photo.jpg', headers={'Range': 'bytes=10-19'},
+                                   environ_overrides={'wsgi.file_wrapper': FileWrapper})
+        self.assertEqual(response.status_code, 206)
+        self.assertEqual(response.headers['Content-Length'], '10')
+        self.assertEqual(response.data, data[10:20])
+        response.close()
+
+    def test_download_range_with_x_sendfile(self):
+        self.app.config['USE_X_SENDFILE'] = True
+        response = self.client.get('/download/photo.jpg', headers={'Range': 'bytes=10-19'},
+                                   environ_overrides={'wsgi.file_wrapper': FileWrapper})
+        self.assertIn('X-Sendfile', response.headers)
+        self.assertEqual(response.data, b'')
+
+    def test_download_with_x_sendfile(self):
+        self.app.config['USE_X_SENDFILE'] = True
+        response = self.client.get('/download/photo.jpg')
+        self.assertEqual(response.headers['X-Sendfile'], os.path.abspath(self.photo_path))
+        self.assertEqual(response.data, b'')
+
+    def test_download_not_modified(self):
+        etag = self.client.get('/download/photo.jpg').headers['ETag']
+        response = self.client.get('/download/photo.jpg', headers={'If-None-Match': etag})
+        self.assertEqual(response.status_code, 304)
+
+    def test_rejects_paths_outside_directory(self):
+        self.assertEqual(self.client.get('/download/..%2Fsecret.jpg').status_code, 404)
+        self.assertEqual(self.client.get('/thumbnail/missing.jpg').status_code, 404)
+        self.assertEqual(self.client.get('/download/notes.txt').status_code, 404)
+
+    def test_api_photos_pagination(self):
+        for day in range(1, 6):
+            create_test_image(os.path.join(self.photo_directory, f'day{day}.jpg'), f'2024:05:0{day} 12:00:00')
+        self.photo_index.refresh()
+
+        names = []
+        cursor = None
+        while True:
+            response = self.client.get('/api/photos', query_string={'limit': 2, 'cursor': cursor or ''})
+            self.assertEqual(response.status_code, 200)
+            page = response.get_json()
+            self.assertLessEqual(len(page['photos']), 2)
+            names.extend(photo['name'] for photo in page['photos'])
+            cursor = page['next_cursor']
+            if cursor is None:
+                break
+        # EXIF のない photo.jpg は更新時刻（現在）で並ぶため最も新しい
+        self.assertEqual(names, ['photo.jpg', 'day5.jpg', 'day4.jpg', 'day3.jpg', 'day2.jpg', 'day1.jpg'])
+
+    def test_api_photos_date_range(self):
+        for day in range(1, 6):
+            create_test_image(os.path.join(self.photo_directory, f'day{day}.jpg'), f'2024:05:0{day} 12:00:00')
+        self.photo_index.refresh()
+        response = self.client.get('/api/photos?from=2024-05-02&to=2024-05-03&order=asc')
+        self.assertEqual([photo['name'] for photo in response.get_json()['photos']], ['day2.jpg', 'day3.jpg'])
+
+    def test_api_photos_rejects_bad_parameters(self):
+        self.assertEqual(self.client.get('/api/photos?cursor=!!!').status_code, 400)
+        self.assertEqual(self.client.get('/api/photos?from=yesterday').status_code, 400)
+        self.assertEqual(self.client.get('/api/photos?order=random').status_code, 400)
+
+    def test_archive_by_date_range(self):
+        for day in range(1, 4):
+            create_test_image(os.path.join(self.photo_directory, f'day{day}.jpg'), f'2024:05:0{day} 12:00:00')
+        self.photo_index.refresh()
+        response = self.client.get('/archive.zip?from=2024-05-02&to=2024-05-03')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.headers['Accept-Ranges'], 'bytes')
+        self.assertEqual(int(response.headers['Content-Length']), len(response.data))
+        with zipfile.ZipFile(io.BytesIO(response.data)) as zf:
+            self.assertEqual(zf.namelist(), ['day2.jpg', 'day3.jpg'])
+
+    def test_archive_range_resume(self):
+        full = self.client.get('/archive.zip?name=photo.jpg')
+        etag = full.headers['ETag']
+        response = self.client.get('/archive.zip?name=photo.jpg', headers={'Range': 'bytes=100-', 'If-Range': etag})
+        self.assertEqual(response.status_code, 206)
+        self.assertEqual(response.data, full.data[100:])
+        self.assertEqual(response.headers['Content-Range'], f'bytes 100-{len(full.data) - 1}/{len(full.data)}')
+
+        # 写真が変わった場合は全体を返す
+        response = self.client.get('/archive.zip?name=photo.jpg', headers={'Range': 'bytes=100-', 'If-Range': '"old"'})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data, full.data)
+
+        response = self.client.get('/archive.zip?name=photo.jpg', headers={'Range': f'bytes={len(full.data)}-'})
+        self.assertEqual(response.status_code, 416)
+
+    def _upload(self, *files):
+        data = {'photo': [(io.BytesIO(content), name) for name, content in files]}
+        return self.client.post('/upload', data=data, content_type='multipart/form-data')
+
+    def test_upload_photo(self):
+        data = io.BytesIO()
+        Image.new('RGB', (100, 100), 'green').save(data, 'JPEG')
+        response = self._upload(('new photo.jpg', data.getvalue()), ('other.jpg', data.getvalue()))
+        self.assertEqual(response.status_code, 302)
+
+        # 取り込みはバックグラウンドで行われる
+        self.app.extensions['photo_ingester'].join()
+        self.assertTrue(os.path.exists(os.path.join(self.photo_directory, 'new_photo.jpg')))
+        self.assertEqual(len(self.photo_index), 3)
+        self.assertEqual(os.listdir(os.path.join(self.photo_directory, '.uploads')), [])
+
+    def test_upload_rejects_non_photo(self):
+        response = self._upload(('notes.txt', b'hello'))
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(os.listdir(os.path.join(self.photo_directory, '.uploads')), [])
+
+    def test_upload_too_large(self):
+        self.app.config['MAX_CONTENT_LENGTH'] = 1024
+        response = self._upload(('big.jpg', os.urandom(4096)))
+        self.assertEqual(response.status_code, 413)
+        self.assertEqual(os.listdir(os.path.join(self.photo_directory, '.uploads')), [])
+
+if __name__ == '__main__':
+    unittest.main()
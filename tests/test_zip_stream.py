@@ -0,0 +1,95 @@
+# tests/test_zip_stream.py
+
+import sys
+import os
+import io
+import tempfile
+import unittest
+import zipfile
+from unittest import mock
+
+# srcディレクトリをPythonのパスに追加
+current_dir = os.path.dirname(os.path.abspath(__file__))
+parent_dir = os.path.abspath(os.path.join(current_dir, '..'))
+src_dir = os.path.join(parent_dir, 'src')
+sys.path.insert(0, src_dir)
+
+import zip_stream
+from zip_stream import ZipStream
+
+
+class TestZipStream(unittest.TestCase):
+    def setUp(self):
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.contents = {
+            'a.jpg': os.urandom(200 * 1024),
+            '写真.jpg': b'photo',
+            'empty.jpg': b'',
+        }
+        self.paths = []
+        for name, data in self.contents.items():
+            path = os.path.join(self.temp_dir.name, name)
+            with open(path, 'wb') as f:
+                f.write(data)
+            self.paths.append(path)
+        zip_stream._crc_cache.clear()
+
+    def tearDown(self):
+        self.temp_dir.cleanup()
+
+    def test_archive_is_valid_stored_zip(self):
+        archive = ZipStream(self.paths)
+        data = b''.join(archive.iter_bytes())
+        self.assertEqual(len(data), archive.content_length)
+        with zipfile.ZipFile(io.BytesIO(data)) as zf:
+            self.assertIsNone(zf.testzip())
+            for info in zf.infolist():
+                self.assertEqual(info.compress_type, zipfile.ZIP_STORED)
+                self.assertEqual(zf.read(info), self.contents[info.filename])
+
+    def test_ranges_match_full_archive(self):
+        archive = ZipStream(self.paths)
+        data = b''.join(archive.iter_bytes())
+        for start, stop in [(0, 10), (40, 150 * 1024), (150 * 1024, None), (len(data) - 5, None)]:
+            # 再開時に CRC の記録がなくても同じ内容になる
+            zip_stream._crc_cache.clear()
+            resumed = ZipStream(self.paths)
+            self.assertEqual(b''.join(resumed.iter_bytes(start, stop)), data[start:stop])
+
+    def test_photos_are_read_once_when_crc_cache_is_small(self):
+        opened = []
+
+        def counting_open(path, *args, **kwargs):
+            opened.append(os.path.basename(path))
+            return open(path, *args, **kwargs)
+
+        archive = ZipStream(self.paths)
+        # 写真の枚数が CRC の記録の上限を超えても、セントラルディレクトリのために読み直さない
+        with mock.patch.object(zip_stream, 'CRC_CACHE_SIZE', 1), \
+                mock.patch('zip_stream.open', counting_open, create=True):
+            data = b''.join(archive.iter_bytes())
+        self.assertEqual(sorted(opened), sorted(self.contents))
+        with zipfile.ZipFile(io.BytesIO(data)) as zf:
+            self.assertIsNone(zf.testzip())
+
+    def test_missing_photos_are_skipped(self):
+        archive = ZipStream(self.paths + [os.path.join(self.temp_dir.name, 'missing.jpg')])
+        self.assertEqual(len(archive.entries), 3)
+
+    def test_etag_changes_with_photos(self):
+        etag = ZipStream(self.paths).etag
+        self.assertEqual(ZipStream(self.paths).etag, etag)
+        with open(self.paths[1], 'ab') as f:
+            f.write(b'!')
+        self.assertNotEqual(ZipStream(self.paths).etag, etag)
+
+    def test_changed_photo_stops_stream(self):
+        archive = ZipStream(self.paths)
+        with open(self.paths[0], 'wb') as f:
+            f.write(b'short')
+        with self.assertRaises(OSError):
+            b''.join(archive.iter_bytes())
+
+
+if __name__ == '__main__':
+    unittest.main()